@@ -0,0 +1,73 @@
+import argparse
+import json
+import sys
+import tempfile
+
+from selfquantifier.benchmarks.inventory import (
+    check_against_baselines,
+    default_regression_tolerance,
+    load_baselines,
+    run_inventory_benchmarks,
+    save_baselines,
+)
+from selfquantifier.benchmarks.synthetic_folder import generate_selfquantifier_folder
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m selfquantifier.benchmarks",
+        description=(
+            "Benchmark the input and edits inventory on a synthetic selfquantifier "
+            "folder"
+        ),
+    )
+    parser.add_argument("--files", type=int, default=2000)
+    parser.add_argument("--file-size", type=int, default=8 * 1024)
+    parser.add_argument("--depth", type=int, default=2)
+    parser.add_argument("--fanout", type=int, default=4)
+    parser.add_argument("--large-files", type=int, default=2)
+    parser.add_argument("--large-file-size", type=int, default=4 * 1024 * 1024)
+    parser.add_argument("--edit-commits", type=int, default=20)
+    parser.add_argument("--archived-edits", type=int, default=15)
+    parser.add_argument("--tolerance", type=float, default=default_regression_tolerance)
+    parser.add_argument(
+        "--update-baselines",
+        action="store_true",
+        help="store the results as the new baselines instead of checking them",
+    )
+    args = parser.parse_args(argv)
+    config = {
+        "files": args.files,
+        "file_size": args.file_size,
+        "depth": args.depth,
+        "fanout": args.fanout,
+        "large_files": args.large_files,
+        "large_file_size": args.large_file_size,
+        "edit_commits": args.edit_commits,
+        "archived_edits": args.archived_edits,
+    }
+
+    with tempfile.TemporaryDirectory() as selfquantifier_folder_path:
+        with tempfile.TemporaryDirectory() as index_folder_path:
+            generate_selfquantifier_folder(selfquantifier_folder_path, **config)
+            results = run_inventory_benchmarks(
+                selfquantifier_folder_path, index_folder_path
+            )
+    print(json.dumps(results, indent=2))
+
+    if args.update_baselines:
+        save_baselines(config, results)
+        print("Baselines updated")
+        return 0
+    baselines = load_baselines()
+    if baselines["config"] != config:
+        print("Warning: Not checking against baselines recorded with another config")
+        return 0
+    regressions = check_against_baselines(results, baselines, args.tolerance)
+    for regression in regressions:
+        print("Regression: %s" % regression)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,152 @@
+import json
+import os
+import time
+
+from selfquantifier.benchmarks.synthetic_folder import input_subfolders
+
+baselines_file_path = os.path.join(os.path.dirname(__file__), "baselines.json")
+
+# machines differ a lot, so only a drop to below half of the baseline fails the check
+default_regression_tolerance = 0.5
+
+
+def inventory_totals(files):
+    # files are either a list of records or a files dataframe
+    if hasattr(files, "to_dict"):
+        files = files.to_dict("records")
+    return {
+        "files": len(files),
+        "bytes": sum(file["File metadata"]["size"] for file in files),
+    }
+
+
+def measure(function):
+    start = time.perf_counter()
+    totals = function()
+    seconds = max(time.perf_counter() - start, 1e-9)
+    return {
+        "seconds": round(seconds, 4),
+        "files": totals["files"],
+        "bytes": totals["bytes"],
+        "files_per_second": round(totals["files"] / seconds, 1),
+        "bytes_per_second": round(totals["bytes"] / seconds, 1),
+    }
+
+
+def forget_default_file_fingerprint_index(selfquantifier_input_folder_path):
+    from selfquantifier.file_fingerprints import (
+        _file_fingerprint_indexes,
+        file_fingerprint_index_file_name,
+        selfquantifier_cache_folder_path,
+    )
+
+    index_file_path = os.path.join(
+        selfquantifier_cache_folder_path(selfquantifier_input_folder_path),
+        file_fingerprint_index_file_name,
+    )
+    if os.path.isfile(index_file_path):
+        os.remove(index_file_path)
+    _file_fingerprint_indexes.pop(index_file_path, None)
+
+
+def run_inventory_benchmarks(selfquantifier_folder_path, index_folder_path):
+    # cold runs start without any fingerprints, warm runs load the fingerprints
+    # persisted by the cold run. the os page cache is not dropped in between
+    from selfquantifier.file_fingerprints import FileFingerprintIndex
+    from selfquantifier.utils import (
+        list_files_in_clerk_input_subfolder,
+        list_files_in_folder,
+    )
+
+    input_folder_path = os.path.join(selfquantifier_folder_path, "Input")
+    index_file_path = os.path.join(index_folder_path, "file-fingerprints.json")
+    if os.path.isfile(index_file_path):
+        os.remove(index_file_path)
+
+    def list_input_folder():
+        return inventory_totals(
+            list_files_in_folder(
+                input_folder_path,
+                file_fingerprint_index=FileFingerprintIndex(index_file_path),
+            )
+        )
+
+    def list_input_subfolders():
+        totals = {"files": 0, "bytes": 0}
+        for subfolder in input_subfolders:
+            subfolder_totals = inventory_totals(
+                list_clerk_input_subfolder(os.path.join(input_folder_path, subfolder))
+            )
+            totals["files"] += subfolder_totals["files"]
+            totals["bytes"] += subfolder_totals["bytes"]
+        return totals
+
+    def list_clerk_input_subfolder(folder_path):
+        if not os.path.isdir(folder_path):
+            return []
+        return list_files_in_clerk_input_subfolder(
+            folder_path, selfquantifier_input_folder_path=input_folder_path
+        )
+
+    results = {
+        "list_files_in_folder (cold)": measure(list_input_folder),
+        "list_files_in_folder (warm)": measure(list_input_folder),
+    }
+    forget_default_file_fingerprint_index(input_folder_path)
+    results["list_files_in_clerk_input_subfolder (cold)"] = measure(
+        list_input_subfolders
+    )
+    results["list_files_in_clerk_input_subfolder (warm)"] = measure(
+        list_input_subfolders
+    )
+
+    if os.path.isdir(os.path.join(selfquantifier_folder_path, "Edits")):
+        results["list_edit_files_in_edits_folder"] = measure_edits_folder_listing(
+            selfquantifier_folder_path
+        )
+    return results
+
+
+def measure_edits_folder_listing(selfquantifier_folder_path):
+    from selfquantifier.nb_helpers import init_notebook_and_return_helpers
+
+    working_directory = os.getcwd()
+    try:
+        helpers = init_notebook_and_return_helpers(selfquantifier_folder_path)
+    finally:
+        os.chdir(working_directory)
+    return measure(
+        lambda: inventory_totals(helpers["list_edit_files_in_edits_folder"]())
+    )
+
+
+def load_baselines(file_path=baselines_file_path):
+    with open(file_path) as f:
+        return json.load(f)
+
+
+def save_baselines(config, results, file_path=baselines_file_path):
+    with open(file_path, "w") as f:
+        json.dump({"config": config, "results": results}, f, indent=2, sort_keys=True)
+        f.write("\n")
+
+
+def check_against_baselines(results, baselines, tolerance=default_regression_tolerance):
+    regressions = []
+    for scenario, baseline in baselines["results"].items():
+        if scenario not in results:
+            continue
+        for metric in ["files_per_second", "bytes_per_second"]:
+            minimum = baseline[metric] * (1 - tolerance)
+            if results[scenario][metric] < minimum:
+                regressions.append(
+                    "%s: %s %s is below %s (baseline %s)"
+                    % (
+                        scenario,
+                        metric,
+                        results[scenario][metric],
+                        round(minimum, 1),
+                        baseline[metric],
+                    )
+                )
+    return regressions
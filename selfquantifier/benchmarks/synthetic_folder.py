@@ -0,0 +1,127 @@
+import os
+import random
+
+input_subfolders = ["Transactions", "Time Tracking", "Location History", "Receipts"]
+
+
+def random_bytes(rng, size):
+    return rng.getrandbits(8 * size).to_bytes(size, "little")
+
+
+def synthetic_file_contents(rng, size):
+    # csv-like lines so that the files look like the exports found in real input folders
+    line = "2020-01-01;-12,34;NAID-FI-EUR-FI3814703500919488;;;S MARKET FOO;;EUR\n"
+    contents = (line * (size // len(line) + 1))[:size].encode()
+    # a random tail makes the contents (and thus the digests) unique per file
+    tail_size = min(size, 16)
+    return contents[: size - tail_size] + random_bytes(rng, tail_size)
+
+
+def write_input_subfolder(rng, folder_path, files, file_size, depth, fanout):
+    folder_paths = [folder_path]
+    for level in range(depth):
+        folder_paths = [
+            os.path.join(parent, "Folder %s-%s" % (level, number))
+            for parent in folder_paths
+            for number in range(fanout)
+        ]
+    written_bytes = 0
+    for file_number in range(files):
+        file_folder_path = folder_paths[file_number % len(folder_paths)]
+        os.makedirs(file_folder_path, exist_ok=True)
+        size = rng.randint(file_size // 2, file_size * 3 // 2)
+        with open(
+            os.path.join(file_folder_path, "export-%06d.csv" % file_number), "wb"
+        ) as f:
+            f.write(synthetic_file_contents(rng, size))
+        written_bytes += size
+    return written_bytes
+
+
+def write_edits_history(
+    rng, selfquantifier_folder_path, repo, edit_commits, archived_edits
+):
+    from datetime import datetime, timedelta
+
+    from selfquantifier.utils import short_gitsha1
+
+    edits_folder_path = os.path.join(selfquantifier_folder_path, "Edits")
+    commit_datetime = datetime(2020, 1, 1)
+    for commit_number in range(edit_commits):
+        repo.git.commit("--allow-empty", "-m", "Current files")
+        commit_datetime += timedelta(days=1)
+        commit_specific_directory = "{} ({})".format(
+            commit_datetime.strftime("%Y-%m-%d %H%M"),
+            short_gitsha1(repo, repo.head.object.hexsha),
+        )
+        edit_folder_paths = [os.path.join(edits_folder_path, commit_specific_directory)]
+        # earlier edit files that have been merged are moved into the archive
+        if commit_number < archived_edits:
+            edit_folder_paths.append(
+                os.path.join(
+                    edits_folder_path,
+                    "Archive",
+                    commit_specific_directory,
+                    "Archived %s" % commit_datetime.strftime("%Y-%m-%d %H%M%S"),
+                )
+            )
+        for edit_folder_path in edit_folder_paths:
+            os.makedirs(edit_folder_path, exist_ok=True)
+            for export_file_name in ["Transaction files.xlsx", "Transactions.xlsx"]:
+                with open(os.path.join(edit_folder_path, export_file_name), "wb") as f:
+                    f.write(random_bytes(rng, rng.randint(4 * 1024, 64 * 1024)))
+
+
+def generate_selfquantifier_folder(
+    selfquantifier_folder_path,
+    files=1000,
+    file_size=8 * 1024,
+    depth=2,
+    fanout=4,
+    large_files=0,
+    large_file_size=4 * 1024 * 1024,
+    edit_commits=0,
+    archived_edits=0,
+    versioned=True,
+    seed=0,
+):
+    # generates a selfquantifier folder with synthetic input files spread over the
+    # input subfolders, committed to the Input repository like the flows would, and
+    # optionally an Edits folder with a history of edit files referencing its commits
+    rng = random.Random(seed)
+    input_folder_path = os.path.join(selfquantifier_folder_path, "Input")
+    written_bytes = 0
+    for subfolder_number, subfolder in enumerate(input_subfolders):
+        subfolder_files = files // len(input_subfolders) + (
+            1 if subfolder_number < files % len(input_subfolders) else 0
+        )
+        written_bytes += write_input_subfolder(
+            rng,
+            os.path.join(input_folder_path, subfolder),
+            subfolder_files,
+            file_size,
+            depth,
+            fanout,
+        )
+    for file_number in range(large_files):
+        large_file_folder_path = os.path.join(input_folder_path, "Location History")
+        os.makedirs(large_file_folder_path, exist_ok=True)
+        with open(
+            os.path.join(large_file_folder_path, "takeout-%03d.json" % file_number),
+            "wb",
+        ) as f:
+            f.write(synthetic_file_contents(rng, large_file_size))
+        written_bytes += large_file_size
+    if versioned or edit_commits > 0:
+        from selfquantifier.utils import (
+            add_all_untracked_and_changed_files,
+            ensure_selfquantifier_folder_versioning,
+        )
+
+        repo = ensure_selfquantifier_folder_versioning(input_folder_path)
+        add_all_untracked_and_changed_files(repo)
+        if edit_commits > 0:
+            write_edits_history(
+                rng, selfquantifier_folder_path, repo, edit_commits, archived_edits
+            )
+    return {"files": files + large_files, "bytes": written_bytes}
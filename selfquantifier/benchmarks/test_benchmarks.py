@@ -0,0 +1,55 @@
+import os
+
+from selfquantifier.benchmarks.inventory import (
+    check_against_baselines,
+    load_baselines,
+    run_inventory_benchmarks,
+)
+from selfquantifier.benchmarks.synthetic_folder import generate_selfquantifier_folder
+
+
+def test_generate_selfquantifier_folder_and_run_inventory_benchmarks(tmp_path):
+    # type: (...) -> None
+    selfquantifier_folder_path = str(tmp_path / "selfquantifier")
+    totals = generate_selfquantifier_folder(
+        selfquantifier_folder_path,
+        files=40,
+        file_size=1024,
+        large_files=1,
+        large_file_size=2 * 1024 * 1024,
+        edit_commits=3,
+        archived_edits=2,
+    )
+    assert totals["files"] == 41
+    assert os.path.isdir(os.path.join(selfquantifier_folder_path, "Input", ".git"))
+    assert len(os.listdir(os.path.join(selfquantifier_folder_path, "Edits"))) == 4
+
+    index_folder_path = str(tmp_path / "index")
+    os.makedirs(index_folder_path)
+    results = run_inventory_benchmarks(selfquantifier_folder_path, index_folder_path)
+    for scenario in [
+        "list_files_in_folder (cold)",
+        "list_files_in_folder (warm)",
+        "list_files_in_clerk_input_subfolder (cold)",
+        "list_files_in_clerk_input_subfolder (warm)",
+    ]:
+        assert results[scenario]["files"] == 41
+        assert results[scenario]["bytes"] == totals["bytes"]
+    # the edits archive is not inventoried
+    assert results["list_edit_files_in_edits_folder"]["files"] == 6
+
+
+def test_check_against_baselines():
+    # type: () -> None
+    baselines = load_baselines()
+    assert check_against_baselines(baselines["results"], baselines) == []
+
+    results = {
+        scenario: {
+            "files_per_second": baseline["files_per_second"] / 3,
+            "bytes_per_second": baseline["bytes_per_second"],
+        }
+        for scenario, baseline in baselines["results"].items()
+    }
+    assert len(check_against_baselines(results, baselines)) == len(results)
+    assert check_against_baselines(results, baselines, tolerance=0.8) == []
@@ -0,0 +1,246 @@
+import bisect
+import json
+import os
+import subprocess
+import threading
+from collections import namedtuple
+from datetime import datetime
+
+from selfquantifier.file_fingerprints import selfquantifier_cache_folder_path
+
+commit_index_file_name = "commit-index.json"
+commit_index_format_version = 1
+
+# like "git rev-parse --short=1", abbreviated shas are at least 4 characters long
+minimum_abbreviation_length = 4
+
+# quacks like the pydriller commits that commits_by_short_gitsha1 used to return
+IndexedCommit = namedtuple("IndexedCommit", ["hash", "author_date"])
+
+
+def git(repo_path, *args):
+    return subprocess.run(
+        ["git", "-C", repo_path, *args], check=True, capture_output=True, text=True
+    ).stdout
+
+
+def git_log_commits(repo_path, revision_range):
+    # newest first, like the history is stored in the index
+    output = git(repo_path, "log", "--format=%H %aI", revision_range)
+    return [line.split(" ", 1) for line in output.splitlines() if line]
+
+
+def unique_abbreviations(shas, minimum_length):
+    # extends the abbreviations where needed so that they stay unique among the commits.
+    # git also keeps them unique among all other objects, so history references
+    # abbreviated by git may be longer and need to be matched against the full shas
+    sorted_shas = sorted(shas)
+    abbreviations = {}
+    for i, sha in enumerate(sorted_shas):
+        length = minimum_length
+        for neighbor in sorted_shas[max(i - 1, 0) : i + 2]:
+            if neighbor == sha:
+                continue
+            common_prefix_length = len(os.path.commonprefix([sha, neighbor]))
+            length = max(length, common_prefix_length + 1)
+        abbreviations[sha] = sha[:length]
+    return abbreviations
+
+
+class UnresolvedHistoryReferencesError(Exception):
+    def __init__(self, unknown):
+        self.unknown = unknown
+        super().__init__(
+            "No commit matching %s found"
+            % ", ".join('"%s"' % reference for reference in unknown)
+        )
+
+
+class CommitPrefixIndex:
+    # resolves abbreviated shas with a binary search over the sorted full shas
+    def __init__(self, commits):
+        self.commits = sorted(commits, key=lambda commit: commit.hash)
+        self.shas = [commit.hash for commit in self.commits]
+
+    def matching_commits(self, history_reference):
+        i = bisect.bisect_left(self.shas, history_reference)
+        matches = []
+        while i < len(self.shas) and self.shas[i].startswith(history_reference):
+            matches.append(self.commits[i])
+            i += 1
+        return matches
+
+    def resolve(self, history_references, errors="raise"):
+        # maps each distinct history reference to its commit. unknown references are
+        # collected and reported together, or left out with errors="coerce"
+        resolved = {}
+        unknown = []
+        for history_reference in dict.fromkeys(history_references):
+            matches = (
+                self.matching_commits(history_reference)
+                if isinstance(history_reference, str) and history_reference != ""
+                else []
+            )
+            if len(matches) == 0:
+                unknown.append(history_reference)
+            elif len(matches) == 1:
+                resolved[history_reference] = matches[0]
+            else:
+                resolved[history_reference] = oldest_commit(history_reference, matches)
+        if unknown:
+            error = UnresolvedHistoryReferencesError(unknown)
+            if errors == "raise":
+                raise error
+            elif errors == "coerce":
+                print("Warning: %s" % error)
+            else:
+                raise ValueError("errors '%s' not recognized" % errors)
+        return resolved
+
+
+def oldest_commit(history_reference, commits):
+    # abbreviations are unique when they are made, so a reference that commits added
+    # later share the prefix of refers to the oldest of them
+    oldest = min(commits, key=lambda commit: (commit.author_date, commit.hash))
+    print(
+        'Warning: Several commits matching "%s" found (%s), using the oldest one (%s)'
+        % (
+            history_reference,
+            ", ".join(commit.hash for commit in commits),
+            oldest.hash,
+        )
+    )
+    return oldest
+
+
+class IndexedCommits(dict):
+    # the commits by short gitsha1 returned by a commit index, which keep a reference
+    # to the index so that the prefix index cached on it can be reused
+    def __init__(self, commit_index, commits):
+        super().__init__(commits)
+        self.commit_index = commit_index
+
+
+class CommitIndex:
+    # the full sha and author date of every commit reachable from HEAD, persisted
+    # in the cache folder and brought up to date with a single git log call for
+    # the commits added since the index was last updated
+    def __init__(self, repo_path, index_file_path=None):
+        self.repo_path = repo_path
+        self.index_file_path = index_file_path
+        self.head = None
+        self.git_log_calls = 0
+        # [full sha, author date in iso format], newest first
+        self._commits = []
+        self._commits_by_short_gitsha1 = None
+        self._prefix_index = None
+        self._lock = threading.Lock()
+        if index_file_path and os.path.isfile(index_file_path):
+            self._load()
+
+    def _load(self):
+        try:
+            with open(self.index_file_path) as f:
+                stored = json.load(f)
+        except (OSError, ValueError):
+            return
+        if stored.get("version") != commit_index_format_version:
+            return
+        self.head = stored["head"]
+        self._commits = stored["commits"]
+
+    def _save(self):
+        if not self.index_file_path:
+            return
+        os.makedirs(os.path.dirname(self.index_file_path), exist_ok=True)
+        tmp_path = "%s.tmp" % self.index_file_path
+        with open(tmp_path, "w") as f:
+            json.dump(
+                {
+                    "version": commit_index_format_version,
+                    "head": self.head,
+                    "commits": self._commits,
+                },
+                f,
+            )
+        os.replace(tmp_path, self.index_file_path)
+
+    def _is_ancestor_of(self, sha, head):
+        return (
+            subprocess.run(
+                ["git", "-C", self.repo_path, "merge-base", "--is-ancestor", sha, head],
+                capture_output=True,
+            ).returncode
+            == 0
+        )
+
+    def update(self):
+        try:
+            head = git(self.repo_path, "rev-parse", "--verify", "HEAD").strip()
+        except subprocess.CalledProcessError:
+            raise Exception('No commits found in "%s"' % self.repo_path)
+        with self._lock:
+            if head == self.head and self._commits_by_short_gitsha1 is not None:
+                return
+            if head != self.head:
+                self.git_log_calls += 1
+                if self.head is not None and self._is_ancestor_of(self.head, head):
+                    self._commits = [
+                        *git_log_commits(self.repo_path, "%s..%s" % (self.head, head)),
+                        *self._commits,
+                    ]
+                else:
+                    # first run, or the history was rewritten
+                    self._commits = git_log_commits(self.repo_path, head)
+                self.head = head
+                self._save()
+            abbreviations = unique_abbreviations(
+                [sha for (sha, _) in self._commits], minimum_abbreviation_length
+            )
+            self._commits_by_short_gitsha1 = IndexedCommits(
+                self,
+                {
+                    abbreviations[sha]: IndexedCommit(sha, datetime.fromisoformat(date))
+                    for (sha, date) in self._commits
+                },
+            )
+            self._prefix_index = None
+
+    def commits_by_short_gitsha1(self):
+        self.update()
+        return self._commits_by_short_gitsha1
+
+    def prefix_index(self, commits):
+        # built once per update of the commits returned by commits_by_short_gitsha1
+        with self._lock:
+            if commits is not self._commits_by_short_gitsha1:
+                return CommitPrefixIndex(commits.values())
+            if self._prefix_index is None:
+                self._prefix_index = CommitPrefixIndex(commits.values())
+            return self._prefix_index
+
+    def invalidate(self):
+        with self._lock:
+            self.head = None
+            self._commits = []
+            self._commits_by_short_gitsha1 = None
+            self._prefix_index = None
+        if self.index_file_path and os.path.isfile(self.index_file_path):
+            os.remove(self.index_file_path)
+
+    def __len__(self):
+        return len(self._commits)
+
+
+_commit_indexes = {}
+
+
+def default_commit_index(repo_path):
+    if repo_path not in _commit_indexes:
+        _commit_indexes[repo_path] = CommitIndex(
+            repo_path,
+            os.path.join(
+                selfquantifier_cache_folder_path(repo_path), commit_index_file_name
+            ),
+        )
+    return _commit_indexes[repo_path]
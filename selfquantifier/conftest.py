@@ -0,0 +1,13 @@
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def sidecar_key_path(tmp_path, monkeypatch):
+    # sidecars written by tests are signed with a throwaway key instead of the one in
+    # the home folder
+    from selfquantifier import edit_file_sidecars
+
+    key_path = str(tmp_path / "sidecar.key")
+    monkeypatch.setattr(edit_file_sidecars, "sidecar_key_path", key_path)
+    monkeypatch.setattr(edit_file_sidecars, "_sidecar_keys", {})
+    return key_path
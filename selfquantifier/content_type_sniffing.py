@@ -0,0 +1,73 @@
+import hashlib
+import re
+
+# enough to cover the header row of every supported export format
+sniff_size = 4 * 1024
+
+utf8_bom = b"\xef\xbb\xbf"
+
+
+class ContentTypeSniffer:
+    # signatures are (content type, regex) pairs matched against the start of the
+    # file, earlier signatures taking precedence. all signatures are compiled into
+    # a single regex so that each file is matched in one pass
+    def __init__(self, signatures):
+        self.signatures = list(signatures)
+        self.content_types = {
+            "s%s" % number: content_type
+            for number, (content_type, _) in enumerate(self.signatures)
+        }
+        self.regex = re.compile(
+            "|".join(
+                "(?P<s%s>%s)" % (number, regex)
+                for number, (_, regex) in enumerate(self.signatures)
+            )
+        )
+        # sniffed content types are cached per signature set in the fingerprint index
+        self.fingerprint_key = "content type (%s)" % (
+            hashlib.sha1(repr(self.signatures).encode()).hexdigest()[:10]
+        )
+
+    def sniff(self, head):
+        if head.startswith(utf8_bom):
+            head = head[len(utf8_bom) :]
+        # binary formats and other encodings only produce replacement characters,
+        # which signatures match with "."
+        m = self.regex.match(head.decode("utf-8", errors="replace"))
+        if m is None:
+            return None
+        return self.content_types[m.lastgroup]
+
+    def sniff_file(self, path, file_fingerprint_index=None, stat_result=None):
+        if file_fingerprint_index is not None and stat_result is not None:
+            # not counted in the hit and miss counters, which are about file digests
+            cached = file_fingerprint_index.cached(
+                path, stat_result, [self.fingerprint_key]
+            )
+            if cached is not None:
+                return cached[self.fingerprint_key]
+        with open(path, "rb") as f:
+            content_type = self.sniff(f.read(sniff_size))
+        if file_fingerprint_index is not None and stat_result is not None:
+            file_fingerprint_index.store(
+                path, stat_result, {self.fingerprint_key: content_type}
+            )
+        return content_type
+
+
+def fill_missing_content_types(df, sniffed_files_df):
+    # edited content types take precedence, sniffed ones only fill the gaps
+    if len(df) == 0 or "Content type" not in sniffed_files_df.columns:
+        return df
+    sniffed_content_types = dict(
+        zip(
+            zip(sniffed_files_df["File path"], sniffed_files_df["File name"]),
+            sniffed_files_df["Content type"],
+        )
+    )
+    missing = df["Content type"].isnull() | (df["Content type"] == "")
+    df.loc[missing, "Content type"] = [
+        sniffed_content_types.get(key)
+        for key in zip(df.loc[missing, "File path"], df.loc[missing, "File name"])
+    ]
+    return df
@@ -0,0 +1,203 @@
+import hashlib
+import hmac
+import os
+import pickle
+
+import pandas as pd
+
+sidecar_format_version = 4
+
+# sidecars are hidden files next to the xlsx files they are a copy of
+sidecar_ignore_rule = "*.sidecar.pkl"
+
+# sidecars are signed with a key that never leaves this machine, so that only the
+# sidecars that were written here are unpickled (the edits folder may be synced)
+sidecar_key_path = os.path.join(
+    os.path.expanduser("~"), ".selfquantifier", "sidecar.key"
+)
+_sidecar_keys = {}
+
+
+def sidecar_path(xlsx_path):
+    folder_path, file_name = os.path.split(xlsx_path)
+    return os.path.join(folder_path, ".%s.sidecar.pkl" % file_name)
+
+
+def file_sha1(file_path):
+    digest = hashlib.sha1()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def sidecar_header():
+    # sidecars written by other pandas versions may not unpickle, they are replaced
+    # once the xlsx has been parsed instead
+    return (
+        "selfquantifier sidecar %s pandas %s\n"
+        % (sidecar_format_version, pd.__version__)
+    ).encode()
+
+
+def sidecar_key():
+    if sidecar_key_path not in _sidecar_keys:
+        try:
+            with open(sidecar_key_path, "rb") as f:
+                key = f.read()
+        except FileNotFoundError:
+            key = os.urandom(32)
+            os.makedirs(os.path.dirname(sidecar_key_path), exist_ok=True)
+            fd = os.open(sidecar_key_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+            with os.fdopen(fd, "wb") as f:
+                f.write(key)
+        _sidecar_keys[sidecar_key_path] = key
+    return _sidecar_keys[sidecar_key_path]
+
+
+def sidecar_digest(payload):
+    return hmac.new(sidecar_key(), payload, hashlib.sha256).digest()
+
+
+def write_sidecar(xlsx_path, df):
+    # columns are pickled one by one so that they can be loaded selectively
+    stat_result = os.stat(xlsx_path)
+    payload = pickle.dumps(
+        {
+            "xlsx_stat": [stat_result.st_size, stat_result.st_mtime_ns],
+            "xlsx_sha1": file_sha1(xlsx_path),
+            "index": df.index,
+            "columns": [
+                (
+                    column,
+                    pickle.dumps(df.iloc[:, i], protocol=pickle.HIGHEST_PROTOCOL),
+                )
+                for i, column in enumerate(df.columns)
+            ],
+        },
+        protocol=pickle.HIGHEST_PROTOCOL,
+    )
+    tmp_path = "%s.tmp" % sidecar_path(xlsx_path)
+    with open(tmp_path, "wb") as f:
+        f.write(sidecar_header())
+        f.write(sidecar_digest(payload))
+        f.write(payload)
+    os.replace(tmp_path, sidecar_path(xlsx_path))
+
+
+def sidecar_df(sidecar, columns=None):
+    pickled_columns = [
+        pickled_column
+        for (column, pickled_column) in sidecar["columns"]
+        if columns is None or column in columns
+    ]
+    if len(pickled_columns) == 0:
+        return pd.DataFrame(index=sidecar["index"])
+    return pd.concat(
+        [pickle.loads(pickled_column) for pickled_column in pickled_columns], axis=1
+    )
+
+
+def load_sidecar(xlsx_path):
+    # the sidecar is only unpickled once its digest has been checked
+    try:
+        with open(sidecar_path(xlsx_path), "rb") as f:
+            header = f.readline()
+            digest = f.read(hashlib.sha256().digest_size)
+            payload = f.read()
+    except FileNotFoundError:
+        return None
+    if header != sidecar_header():
+        return None
+    if not hmac.compare_digest(digest, sidecar_digest(payload)):
+        print("Warning: Ignoring sidecar of %s that was not written here" % xlsx_path)
+        return None
+    return pickle.loads(payload)
+
+
+def read_sidecar(xlsx_path, columns=None):
+    # the stored dataframe, as long as the xlsx has not been changed since
+    sidecar = load_sidecar(xlsx_path)
+    if sidecar is None:
+        return None
+    stat_result = os.stat(xlsx_path)
+    if sidecar["xlsx_stat"] == [stat_result.st_size, stat_result.st_mtime_ns]:
+        return sidecar_df(sidecar, columns)
+    # touched (for instance copied or synced) but not edited
+    if sidecar["xlsx_sha1"] == file_sha1(xlsx_path):
+        df = sidecar_df(sidecar)
+        write_sidecar(xlsx_path, df)
+        return selected_columns(df, columns)
+    return None
+
+
+def read_edit_file(xlsx_path, columns=None):
+    # xlsx files are only parsed when there is no sidecar or a person edited them.
+    # with columns, only those of them that exist in the edit file are returned
+    df = read_sidecar(xlsx_path, columns)
+    if df is None:
+        df = parse_xlsx(xlsx_path)
+        write_sidecar(xlsx_path, df)
+        df = selected_columns(df, columns)
+    return df
+
+
+def selected_columns(df, columns):
+    if columns is None:
+        return df
+    return df[df.columns[df.columns.isin(columns)]]
+
+
+def parse_xlsx(xlsx_path):
+    return pd.read_excel(xlsx_path)
+
+
+def read_edit_files(xlsx_paths, columns=None, workers=None):
+    # like read_edit_file for each path, but the xlsx files that need to be parsed
+    # are parsed in a process pool. the dataframes are returned in the given order
+    from concurrent.futures import ProcessPoolExecutor
+
+    dfs = [read_sidecar(xlsx_path, columns) for xlsx_path in xlsx_paths]
+    unparsed_xlsx_paths = [
+        xlsx_path for (xlsx_path, df) in zip(xlsx_paths, dfs) if df is None
+    ]
+    if workers is None:
+        workers = min(len(unparsed_xlsx_paths), os.cpu_count() or 1)
+    if workers <= 1:
+        parsed_dfs = map(parse_xlsx, unparsed_xlsx_paths)
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            parsed_dfs = list(executor.map(parse_xlsx, unparsed_xlsx_paths))
+    parsed_dfs_by_path = {}
+    for xlsx_path, df in zip(unparsed_xlsx_paths, parsed_dfs):
+        write_sidecar(xlsx_path, df)
+        parsed_dfs_by_path[xlsx_path] = selected_columns(df, columns)
+    return [
+        df if df is not None else parsed_dfs_by_path[xlsx_path]
+        for (xlsx_path, df) in zip(xlsx_paths, dfs)
+    ]
+
+
+def store_written_edit_file(xlsx_path):
+    # parses the just written xlsx once, so that it is read from the sidecar until a
+    # person edits it
+    df = parse_xlsx(xlsx_path)
+    write_sidecar(xlsx_path, df)
+    return df
+
+
+def move_edit_file(from_path, to_path):
+    import shutil
+
+    shutil.move(from_path, to_path)
+    if os.path.isfile(sidecar_path(from_path)):
+        shutil.move(sidecar_path(from_path), sidecar_path(to_path))
+
+
+def remove_edit_file(file_path):
+    # along with its sidecar, and the folder of the edit file once it is empty
+    os.remove(file_path)
+    if os.path.isfile(sidecar_path(file_path)):
+        os.remove(sidecar_path(file_path))
+    if len(os.listdir(os.path.dirname(file_path))) == 0:
+        os.rmdir(os.path.dirname(file_path))
@@ -0,0 +1,284 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from selfquantifier.utils import (
+    add_missing_editable_columns,
+    changes_between_two_commits,
+    edit_file_join_columns,
+    head_commit_corresponding_paths,
+    id_keys,
+    normalized_joined_paths,
+)
+
+# the journal lives in a hidden folder within the edits folder
+edit_journal_folder_name = ".journal"
+
+# fields of a journal entry. path and id form the record key, path being the joined
+# file path and file name as of history_reference, and id the additional join column
+# (null for the record types that are joined on paths only)
+journal_entry_fields = ["path", "id", "column", "value", "history_reference"]
+
+# the journal is compacted into the snapshot when it has grown beyond this many entries
+journal_compaction_threshold = 10000
+
+# record types that can not be edited, see
+# merge_changes_from_previous_possibly_edited_df
+unjournaled_record_types = ["location_history_by_date"]
+
+
+def journal_value(value):
+    if value is None or (pd.api.types.is_scalar(value) and pd.isna(value)):
+        return None
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, (pd.Timestamp, pd.Timedelta)):
+        return str(value)
+    return value
+
+
+def read_journal_file(file_path):
+    try:
+        with open(file_path, encoding="utf-8") as f:
+            return [json.loads(line) for line in f if line.strip() != ""]
+    except FileNotFoundError:
+        return []
+
+
+def count_journal_file_lines(file_path):
+    # entries are written one per line, so they can be counted without parsing them
+    try:
+        with open(file_path, "rb") as f:
+            return sum(
+                chunk.count(b"\n") for chunk in iter(lambda: f.read(1 << 20), b"")
+            )
+    except FileNotFoundError:
+        return 0
+
+
+class EditJournal:
+    # cell-level edits of one record type, oldest first. a compacted snapshot holds
+    # the last value of every cell that was journaled before the last compaction
+    def __init__(self, journal_folder_path, record_type):
+        self.journal_path = os.path.join(journal_folder_path, "%s.jsonl" % record_type)
+        self.snapshot_path = os.path.join(
+            journal_folder_path, "%s.snapshot.jsonl" % record_type
+        )
+        self.record_type = record_type
+        # the number of entries in the journal file, counted on the first append
+        self._journal_entry_count = None
+
+    def entries(self):
+        return pd.DataFrame(
+            [
+                *read_journal_file(self.snapshot_path),
+                *read_journal_file(self.journal_path),
+            ],
+            columns=journal_entry_fields,
+            dtype=object,
+        )
+
+    def append(self, entries):
+        if len(entries) == 0:
+            return
+        if self._journal_entry_count is None:
+            self._journal_entry_count = count_journal_file_lines(self.journal_path)
+        os.makedirs(os.path.dirname(self.journal_path), exist_ok=True)
+        with open(self.journal_path, "a", encoding="utf-8") as f:
+            for entry in entries:
+                f.write(json.dumps(entry, ensure_ascii=False, default=str) + "\n")
+        self._journal_entry_count += len(entries)
+        if self._journal_entry_count > journal_compaction_threshold:
+            self.compact()
+
+    def compact(self):
+        # keeps the last entry per cell. the journal is only removed after the
+        # snapshot has been replaced, and replaying it on top of the snapshot is
+        # harmless, so an interrupted compaction does not lose edits
+        entries = self.entries().drop_duplicates(["path", "id", "column"], keep="last")
+        tmp_path = "%s.tmp" % self.snapshot_path
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for entry in entries.to_dict("records"):
+                entry = {field: journal_value(entry[field]) for field in entry}
+                f.write(json.dumps(entry, ensure_ascii=False, default=str) + "\n")
+        os.replace(tmp_path, self.snapshot_path)
+        if os.path.isfile(self.journal_path):
+            os.remove(self.journal_path)
+        self._journal_entry_count = 0
+        return len(entries)
+
+
+def record_keys(paths, ids):
+    if ids is None:
+        return paths
+    return paths + "\0" + id_keys(ids)
+
+
+def record_paths_and_ids(df, record_type):
+    (
+        additional_join_column,
+        file_name_column_name,
+        file_path_column_name,
+    ) = edit_file_join_columns(record_type)
+    paths = normalized_joined_paths(df, file_path_column_name, file_name_column_name)
+    ids = df[additional_join_column].astype(str) if additional_join_column else None
+    return paths, ids
+
+
+def latest_journaled_values(
+    entries, selfquantifier_input_folder_path, history_reference
+):
+    # the last journaled value per cell, keyed by the record keys as of
+    # history_reference
+    paths = entries["path"].copy()
+    for entry_history_reference in entries["history_reference"].unique():
+        if entry_history_reference == history_reference:
+            continue
+        old_to_new_paths, _, _ = changes_between_two_commits(
+            selfquantifier_input_folder_path, entry_history_reference, history_reference
+        )
+        mask = entries["history_reference"] == entry_history_reference
+        paths[mask] = head_commit_corresponding_paths(paths[mask], old_to_new_paths)
+    ids = entries["id"].astype(str) if entries["id"].notnull().any() else None
+    latest = pd.DataFrame(
+        {
+            "key": record_keys(paths, ids),
+            "column": entries["column"],
+            "value": entries["value"],
+        }
+    )
+    return latest.drop_duplicates(["key", "column"], keep="last")
+
+
+def upsert_journaled_values(df, keys, latest, editable_columns):
+    # sets the journaled values of every editable column in one go
+    df = df.copy()
+    for column, values in latest.groupby("column", sort=False):
+        if column not in editable_columns:
+            continue
+        values = values.set_index("key")["value"]
+        mask = keys.isin(values.index).to_numpy()
+        if not mask.any():
+            continue
+        df[column] = df[column].astype(object)
+        df.loc[mask, column] = values.reindex(keys[mask]).to_numpy()
+    return df
+
+
+def apply_edit_journal(
+    df,
+    record_type,
+    editable_columns,
+    edit_journal,
+    selfquantifier_input_folder_path,
+    history_reference,
+):
+    df = df.copy()
+    add_missing_editable_columns(df, editable_columns)
+    entries = edit_journal.entries()
+    if len(entries) == 0:
+        return df
+    paths, ids = record_paths_and_ids(df, record_type)
+    latest = latest_journaled_values(
+        entries, selfquantifier_input_folder_path, history_reference
+    )
+    return upsert_journaled_values(
+        df, record_keys(paths, ids), latest, editable_columns
+    )
+
+
+def changed_cells(state, edits_df, paths, ids, editable_columns, history_reference):
+    # journal entries for the cells of edits_df that differ from the state. paths
+    # and ids are the record keys of edits_df as of history_reference
+    keys = record_keys(paths, ids)
+    # rows of records that no longer exist are ignored, like when merging
+    rows = (~keys.duplicated(keep="last") & keys.isin(state.index)).to_numpy()
+    edits = edits_df[rows].set_axis(keys[rows], axis=0)
+    paths = paths[rows].to_numpy()
+    ids = ids[rows].to_numpy() if ids is not None else None
+    entries = []
+    for column in editable_columns:
+        if column not in edits.columns:
+            continue
+        new = edits[column]
+        old = state[column].reindex(edits.index)
+        differs = ~((new == old) | (new.isnull() & old.isnull()))
+        for i in np.flatnonzero(differs.to_numpy()):
+            entries.append(
+                {
+                    "path": paths[i],
+                    "id": ids[i] if ids is not None else None,
+                    "column": column,
+                    "value": journal_value(new.iloc[i]),
+                    "history_reference": history_reference,
+                }
+            )
+        state.loc[edits.index[differs.to_numpy()], column] = new[differs]
+    return entries
+
+
+def journal_edit_files(
+    current_commit_df,
+    edits_dfs,
+    record_type,
+    editable_columns,
+    edit_journal,
+    selfquantifier_input_folder_path,
+    history_reference,
+):
+    # journals the cells that the edit files (oldest first, as (related history
+    # reference, df) tuples) change, and applies the whole journal to the current df
+    df = apply_edit_journal(
+        current_commit_df,
+        record_type,
+        editable_columns,
+        edit_journal,
+        selfquantifier_input_folder_path,
+        history_reference,
+    )
+    keys = record_keys(*record_paths_and_ids(df, record_type))
+    state = df[editable_columns].set_axis(keys, axis=0)
+    state = state[~state.index.duplicated()].astype(object)
+
+    additional_join_column = edit_file_join_columns(record_type)[0]
+    entries = []
+    for edits_history_reference, edits_df in edits_dfs:
+        if additional_join_column and additional_join_column not in edits_df.columns:
+            from selfquantifier.transactions.parse import transaction_ids
+
+            edits_df = edits_df.copy()
+            edits_df[additional_join_column] = transaction_ids(edits_df)
+        paths, ids = record_paths_and_ids(edits_df, record_type)
+        if edits_history_reference != history_reference:
+            old_to_new_paths, _, _ = changes_between_two_commits(
+                selfquantifier_input_folder_path,
+                edits_history_reference,
+                history_reference,
+            )
+            paths = head_commit_corresponding_paths(paths, old_to_new_paths)
+        entry_count = len(entries)
+        entries.extend(
+            changed_cells(
+                state, edits_df, paths, ids, editable_columns, history_reference
+            )
+        )
+        print(
+            " - Journal info: %s changed cell(s) in the edits of %s"
+            % (len(entries) - entry_count, edits_history_reference)
+        )
+
+    if len(entries) == 0:
+        return df
+    edit_journal.append(entries)
+    return upsert_journaled_values(
+        df,
+        keys,
+        latest_journaled_values(
+            pd.DataFrame(entries, columns=journal_entry_fields, dtype=object),
+            selfquantifier_input_folder_path,
+            history_reference,
+        ),
+        editable_columns,
+    )
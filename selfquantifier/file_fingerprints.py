@@ -0,0 +1,561 @@
+import hashlib
+import io
+import json
+import os
+import threading
+
+file_fingerprint_index_file_name = "file-fingerprints.json"
+file_fingerprint_index_format_version = 1
+
+# digests that are always part of file metadata (False when not computed)
+file_metadata_digests = ("sha1sum", "sha256sum", "imohash")
+# digests that can be requested per run
+supported_file_digests = (*file_metadata_digests, "gitsha1")
+default_file_digests = file_metadata_digests
+# only change detection, no cryptographic hashes
+change_detection_file_digests = ("imohash",)
+# git blob hashes, taken from the input repository's index for unchanged tracked files
+git_file_digests = ("gitsha1",)
+full_hash_filesize_threshold = 1024 * 1024 * 1
+
+
+def selfquantifier_cache_folder_path(selfquantifier_input_folder_path):
+    # caches are kept within the .git folder so that they never end up being versioned
+    return os.path.join(selfquantifier_input_folder_path, ".git", "selfquantifier")
+
+
+def file_fingerprint_key(stat_result):
+    # a file is considered unchanged as long as none of these have changed
+    return (stat_result.st_size, stat_result.st_mtime_ns, stat_result.st_ino)
+
+
+class FileFingerprintIndex:
+    def __init__(self, index_file_path=None):
+        self.index_file_path = index_file_path
+        self.hits = 0
+        self.misses = 0
+        self._entries = {}
+        self._dirty = False
+        self._lock = threading.Lock()
+        # background hashing may save the index while an inventory run saves it too
+        self._save_lock = threading.Lock()
+        if index_file_path and os.path.isfile(index_file_path):
+            self._load()
+
+    def _load(self):
+        try:
+            with open(self.index_file_path) as f:
+                stored = json.load(f)
+        except (OSError, ValueError) as e:
+            print(
+                "Warning: Ignoring unreadable file fingerprint index '%s' (%s)"
+                % (self.index_file_path, e)
+            )
+            return
+        if stored.get("version") != file_fingerprint_index_format_version:
+            return
+        self._entries = {
+            path: (tuple(key), digests)
+            for path, (key, digests) in stored["entries"].items()
+        }
+
+    def lookup(self, path, stat_result, digests=default_file_digests):
+        # like cached, but counted as a hit or miss of the file inventory
+        cached = self.cached(path, stat_result, digests)
+        with self._lock:
+            if cached is not None:
+                self.hits += 1
+            else:
+                self.misses += 1
+        return cached
+
+    def cached(self, path, stat_result, digests=default_file_digests):
+        key = file_fingerprint_key(stat_result)
+        with self._lock:
+            entry = self._entries.get(path)
+            if (
+                entry is not None
+                and entry[0] == key
+                and all(digest in entry[1] for digest in digests)
+            ):
+                return dict(entry[1])
+            return None
+
+    def store(self, path, stat_result, digests):
+        key = file_fingerprint_key(stat_result)
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is not None and entry[0] == key:
+                # keep digests computed by earlier runs that requested other digests
+                digests = {**entry[1], **digests}
+            self._entries[path] = (key, dict(digests))
+            self._dirty = True
+
+    def forget(self, path):
+        with self._lock:
+            if self._entries.pop(path, None) is not None:
+                self._dirty = True
+
+    def save(self):
+        if not self.index_file_path:
+            return
+        # saves are serialized so that an older snapshot never overwrites a newer one
+        with self._save_lock:
+            with self._lock:
+                if not self._dirty:
+                    return
+                stored = {
+                    "version": file_fingerprint_index_format_version,
+                    "entries": {
+                        path: [list(key), digests]
+                        for path, (key, digests) in self._entries.items()
+                    },
+                }
+                self._dirty = False
+            os.makedirs(os.path.dirname(self.index_file_path), exist_ok=True)
+            # write to a temporary file first so that an interrupted run never leaves
+            # a truncated index behind
+            tmp_path = "%s.tmp" % self.index_file_path
+            with open(tmp_path, "w") as f:
+                json.dump(stored, f)
+            os.replace(tmp_path, self.index_file_path)
+
+    def counters(self):
+        return {"hits": self.hits, "misses": self.misses, "entries": len(self)}
+
+    def reset_counters(self):
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+
+_file_fingerprint_indexes = {}
+
+
+def default_file_fingerprint_index(selfquantifier_input_folder_path):
+    # only versioned input folders get a persistent index (the index lives in .git)
+    if not os.path.isdir(os.path.join(selfquantifier_input_folder_path, ".git")):
+        return None
+    index_file_path = os.path.join(
+        selfquantifier_cache_folder_path(selfquantifier_input_folder_path),
+        file_fingerprint_index_file_name,
+    )
+    if index_file_path not in _file_fingerprint_indexes:
+        _file_fingerprint_indexes[index_file_path] = FileFingerprintIndex(
+            index_file_path
+        )
+    return _file_fingerprint_indexes[index_file_path]
+
+
+_read_buffers = threading.local()
+
+
+def _read_buffer(size):
+    # one reusable buffer per thread, grown as needed
+    buffer = getattr(_read_buffers, "buffer", None)
+    if buffer is None or len(buffer) < size:
+        buffer = bytearray(max(size, 128 * 1024))
+        _read_buffers.buffer = buffer
+    return buffer
+
+
+def _read_file_into_buffer(path, size):
+    buffer = _read_buffer(size)
+    mv = memoryview(buffer)
+    n = 0
+    with open(path, "rb", buffering=0) as f:
+        while n < size:
+            read = f.readinto(mv[n:size])
+            if not read:
+                break
+            n += read
+    return mv[:n]
+
+
+def _update_hashers_from_file(path, hashers):
+    buffer = _read_buffer(1024 * 1024)
+    mv = memoryview(buffer)
+    with open(path, "rb", buffering=0) as f:
+        for n in iter(lambda: f.readinto(mv), 0):
+            for hasher in hashers:
+                hasher.update(mv[:n])
+
+
+def git_blob_hasher(size):
+    # git hashes the object header together with the contents
+    hasher = hashlib.sha1()
+    hasher.update(b"blob %d\0" % size)
+    return hasher
+
+
+def validate_file_digests(digests):
+    for digest in digests:
+        if digest not in supported_file_digests:
+            raise ValueError("digest '%s' not recognized" % digest)
+
+
+def full_file_hashers(size, digests):
+    # the hashers of the requested digests that are computed over the whole file, and
+    # the digests that are skipped since files above the threshold are not fully hashed
+    full_hashers = {}
+    skipped_digests = {}
+    for digest, new_hasher in [
+        ("sha1sum", hashlib.sha1),
+        ("sha256sum", hashlib.sha256),
+    ]:
+        if digest not in digests:
+            continue
+        if size < full_hash_filesize_threshold:
+            full_hashers[digest] = new_hasher()
+        else:
+            skipped_digests[digest] = False
+    if "gitsha1" in digests:
+        # the blob hash is only a fingerprint if it is complete, regardless of the size
+        full_hashers["gitsha1"] = git_blob_hasher(size)
+    return full_hashers, skipped_digests
+
+
+def hash_small_file(path, size, full_hashers, digests):
+    from imohash.imohash import hashfileobject
+
+    # read the file once and feed every requested digest from the same buffer
+    file_digests = {}
+    data = _read_file_into_buffer(path, size)
+    for hasher in full_hashers.values():
+        hasher.update(data)
+    if "imohash" in digests:
+        file_digests["imohash"] = hashfileobject(io.BytesIO(data), hexdigest=True)
+    data.release()
+    return file_digests
+
+
+def hash_file(path, size, digests=default_file_digests):
+    from imohash import hashfile
+
+    validate_file_digests(digests)
+    full_hashers, skipped_digests = full_file_hashers(size, digests)
+    file_digests = {"size": size, **skipped_digests}
+    if full_hashers and size < full_hash_filesize_threshold:
+        file_digests.update(hash_small_file(path, size, full_hashers, digests))
+    elif full_hashers:
+        _update_hashers_from_file(path, full_hashers.values())
+    for digest, hasher in full_hashers.items():
+        file_digests[digest] = hasher.hexdigest()
+
+    if "imohash" in digests and "imohash" not in file_digests:
+        # imohash only reads three small samples, so there is no point in a full read
+        file_digests["imohash"] = hashfile(path, hexdigest=True)
+    return file_digests
+
+
+def _update_hashers_from_mapped_file(f, size, hashers):
+    import mmap
+
+    # mapped pages are fed to the hashers without copying them into python objects
+    with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        mv = memoryview(mapped)
+        chunk_size = 8 * 1024 * 1024
+        for offset in range(0, size, chunk_size):
+            chunk = mv[offset : offset + chunk_size]
+            for hasher in hashers:
+                hasher.update(chunk)
+            chunk.release()
+        mv.release()
+
+
+def hash_file_fully(path, digests=("sha1sum", "sha256sum")):
+    hashers = {}
+    if "sha1sum" in digests:
+        hashers["sha1sum"] = hashlib.sha1()
+    if "sha256sum" in digests:
+        hashers["sha256sum"] = hashlib.sha256()
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if size > 0:
+            _update_hashers_from_mapped_file(f, size, hashers.values())
+    return {digest: hasher.hexdigest() for digest, hasher in hashers.items()}
+
+
+def file_metadata_from_digests(file_digests):
+    file_metadata = {"size": file_digests["size"]}
+    for digest in file_metadata_digests:
+        file_metadata[digest] = file_digests.get(digest, False)
+    if "gitsha1" in file_digests:
+        file_metadata["gitsha1"] = file_digests["gitsha1"]
+    return file_metadata
+
+
+def git_index_digests(full_path, stat_result, digests, git_index_fingerprints):
+    known_digests = {"size": stat_result.st_size}
+    # unchanged tracked files already have their blob hash in the git index
+    if git_index_fingerprints is not None and "gitsha1" in digests:
+        gitsha1 = git_index_fingerprints.lookup(full_path, stat_result)
+        if gitsha1 is not None:
+            known_digests["gitsha1"] = gitsha1
+    return known_digests
+
+
+def store_file_digests(file_fingerprint_index, full_path, stat_result, file_digests):
+    if file_fingerprint_index is not None:
+        file_fingerprint_index.store(full_path, stat_result, file_digests)
+
+
+def indexed_file_digests(full_path, stat_result, digests, file_fingerprint_index):
+    # reuse the digests of files that have not changed since they were last hashed
+    file_digests = (
+        file_fingerprint_index.lookup(full_path, stat_result, digests)
+        if file_fingerprint_index is not None
+        else None
+    )
+    if file_digests is None:
+        file_digests = hash_file(full_path, stat_result.st_size, digests)
+        store_file_digests(file_fingerprint_index, full_path, stat_result, file_digests)
+    return file_digests
+
+
+def fully_hash_large_file(
+    full_path,
+    stat_result,
+    digests,
+    file_digests,
+    file_fingerprint_index,
+    full_hash_large_files,
+):
+    # files above the full hash threshold only got a sampled imohash so far
+    unhashed_digests = [
+        digest
+        for digest in ("sha1sum", "sha256sum")
+        if digest in digests and file_digests.get(digest) is False
+    ]
+    if not unhashed_digests or not full_hash_large_files:
+        return file_digests
+    if full_hash_large_files == "inline":
+        file_digests = {
+            **file_digests,
+            **hash_file_fully(full_path, unhashed_digests),
+        }
+        store_file_digests(file_fingerprint_index, full_path, stat_result, file_digests)
+    elif full_hash_large_files == "background":
+        if file_fingerprint_index is None:
+            raise ValueError("Background hashing requires a file fingerprint index")
+        background_full_hasher(file_fingerprint_index).schedule(
+            full_path, stat_result, unhashed_digests
+        )
+    else:
+        raise ValueError(
+            "full_hash_large_files '%s' not recognized" % full_hash_large_files
+        )
+    return file_digests
+
+
+def fingerprint_file(
+    full_path,
+    file_fingerprint_index=None,
+    digests=default_file_digests,
+    stat_result=None,
+    git_index_fingerprints=None,
+    full_hash_large_files=False,
+):
+    if stat_result is None:
+        stat_result = os.stat(full_path)
+    known_digests = git_index_digests(
+        full_path, stat_result, digests, git_index_fingerprints
+    )
+    remaining_digests = [digest for digest in digests if digest not in known_digests]
+    if len(remaining_digests) == 0:
+        return known_digests
+    file_digests = indexed_file_digests(
+        full_path, stat_result, remaining_digests, file_fingerprint_index
+    )
+    file_digests = fully_hash_large_file(
+        full_path,
+        stat_result,
+        digests,
+        file_digests,
+        file_fingerprint_index,
+        full_hash_large_files,
+    )
+    return {**file_digests, **known_digests}
+
+
+# the index is saved after this many background hashed files, and when the queue drains
+background_full_hash_save_batch_size = 16
+
+
+class BackgroundFullHasher:
+    # fully hashes large files in a thread pool and stores the results in the
+    # fingerprint index as they finish, so that later inventory runs pick them up
+    def __init__(self, file_fingerprint_index, workers=None):
+        from concurrent.futures import ThreadPoolExecutor
+
+        self.file_fingerprint_index = file_fingerprint_index
+        self.completed = 0
+        self._executor = ThreadPoolExecutor(
+            max_workers=workers or default_hash_workers(),
+            thread_name_prefix="selfquantifier-full-hash",
+        )
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    def schedule(self, full_path, stat_result, digests):
+        key = (full_path, file_fingerprint_key(stat_result))
+        with self._lock:
+            if key in self._pending:
+                return self._pending[key]
+            future = self._executor.submit(
+                self._hash, full_path, stat_result, tuple(digests)
+            )
+            self._pending[key] = future
+        future.add_done_callback(lambda _: self._done(key))
+        return future
+
+    def _hash(self, full_path, stat_result, digests):
+        file_digests = hash_file_fully(full_path, digests)
+        # the results are only valid if the file did not change while it was hashed
+        if file_fingerprint_key(os.stat(full_path)) != file_fingerprint_key(
+            stat_result
+        ):
+            return None
+        self.file_fingerprint_index.store(full_path, stat_result, file_digests)
+        return file_digests
+
+    def _done(self, key):
+        with self._lock:
+            self._pending.pop(key, None)
+            self.completed += 1
+            save = (
+                len(self._pending) == 0
+                or self.completed % background_full_hash_save_batch_size == 0
+            )
+        if save:
+            self.file_fingerprint_index.save()
+
+    def pending(self):
+        with self._lock:
+            return len(self._pending)
+
+    def wait(self):
+        from concurrent.futures import wait
+
+        with self._lock:
+            futures = list(self._pending.values())
+        wait(futures)
+        # the done callbacks may still be saving, saves are serialized and skipped
+        # once the index is no longer dirty
+        self.file_fingerprint_index.save()
+        for future in futures:
+            # surface hashing errors (for example files deleted meanwhile) as warnings
+            if future.exception() is not None:
+                print("Warning: Background hashing failed (%s)" % future.exception())
+
+
+_background_full_hashers = {}
+
+
+def background_full_hasher(file_fingerprint_index):
+    if id(file_fingerprint_index) not in _background_full_hashers:
+        _background_full_hashers[id(file_fingerprint_index)] = BackgroundFullHasher(
+            file_fingerprint_index
+        )
+    return _background_full_hashers[id(file_fingerprint_index)]
+
+
+class GitIndexFingerprints:
+    def __init__(self, entries, index_mtime_ns):
+        self.hits = 0
+        self.misses = 0
+        self._entries = entries
+        self._index_mtime_ns = index_mtime_ns
+        self._lock = threading.Lock()
+
+    def lookup(self, path, stat_result):
+        entry = self._entries.get(path)
+        # the index stores truncated 32-bit values, and files modified in the same
+        # instant as the index was written may have changed without a visible stat
+        # change ("racy git")
+        unchanged = (
+            entry is not None
+            and entry[0]
+            == (
+                stat_result.st_size & 0xFFFFFFFF,
+                stat_result.st_mtime_ns // 1000000000 & 0xFFFFFFFF,
+                stat_result.st_mtime_ns % 1000000000,
+                stat_result.st_ino & 0xFFFFFFFF,
+            )
+            and stat_result.st_mtime_ns < self._index_mtime_ns
+        )
+        with self._lock:
+            if unchanged:
+                self.hits += 1
+            else:
+                self.misses += 1
+        return entry[1] if unchanged else None
+
+    def counters(self):
+        return {"hits": self.hits, "misses": self.misses, "entries": len(self._entries)}
+
+
+def git_index_fingerprints(repo_path):
+    import re
+    import subprocess
+
+    index_path = os.path.join(repo_path, ".git", "index")
+    if not os.path.isfile(index_path):
+        return GitIndexFingerprints({}, 0)
+    index_mtime_ns = os.stat(index_path).st_mtime_ns
+
+    # blob hashes and the stat data git uses for change detection, in a single call
+    output = subprocess.run(
+        ["git", "-C", repo_path, "ls-files", "--stage", "--debug", "-z"],
+        check=True,
+        capture_output=True,
+    ).stdout
+    entry_pattern = re.compile(
+        rb"(\d{6}) ([0-9a-f]{40}) (\d)\t([^\0]*)\0"
+        rb"  ctime: \d+:\d+\n"
+        rb"  mtime: (\d+):(\d+)\n"
+        rb"  dev: \d+\tino: (\d+)\n"
+        rb"  uid: \d+\tgid: \d+\n"
+        rb"  size: (\d+)\tflags: [0-9a-f]+\n"
+    )
+    entries = {}
+    for m in entry_pattern.finditer(output):
+        mode, sha, stage, path, mtime_s, mtime_ns, ino, size = m.groups()
+        # only regular files in the merged stage
+        if stage != b"0" or not mode.startswith(b"100"):
+            continue
+        full_path = os.path.join(repo_path, os.fsdecode(path).replace("/", os.sep))
+        entries[full_path] = (
+            (int(size), int(mtime_s), int(mtime_ns), int(ino)),
+            sha.decode(),
+        )
+    return GitIndexFingerprints(entries, index_mtime_ns)
+
+
+def default_hash_workers():
+    return os.cpu_count() or 1
+
+
+def ordered_parallel_map(function, iterable, workers=None):
+    # like map(), but runs in a bounded thread pool (hashlib and file reads release
+    # the GIL) while still yielding the results in the order of the iterable
+    from collections import deque
+    from concurrent.futures import ThreadPoolExecutor
+
+    if workers is None:
+        workers = default_hash_workers()
+    if workers <= 1:
+        yield from map(function, iterable)
+        return
+
+    max_pending = workers * 4
+    pending = deque()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for item in iterable:
+            pending.append(executor.submit(function, item))
+            if len(pending) >= max_pending:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
@@ -0,0 +1,206 @@
+import os
+import re
+
+# per-folder ignore files use the same syntax as .gitignore files
+ignore_file_name = ".selfquantifierignore"
+
+default_ignore_rules = [
+    ".git/",
+    # matched anywhere in the file name
+    "*.DS_Store*",
+    "*.gitignore*",
+    "*.~lock*",
+    "Icon\r",
+    ignore_file_name,
+    # dependency folders and photo thumbnail caches
+    "node_modules/",
+    ".thumbnails/",
+    "@eaDir/",
+    "Thumbs.db",
+]
+
+# generated by the flows themselves and not input data
+clerk_data_ignore_rules = ["*_editable_data.csv"]
+
+
+# wildcards, character classes and escaped characters of a rule, or single characters
+ignore_pattern_token_regex = re.compile(
+    r"\*\*/|\*\*|\*|\?|\[.[^\]]*\]|\\.|.", re.DOTALL
+)
+ignore_pattern_wildcards = {"**/": "(?:.*/)?", "**": ".*", "*": "[^/]*", "?": "[^/]"}
+
+
+def ignore_pattern_token_to_regex(token):
+    if token in ignore_pattern_wildcards:
+        return ignore_pattern_wildcards[token]
+    if len(token) > 2 and token.startswith("["):
+        character_class = token[1:-1]
+        if character_class.startswith("!"):
+            character_class = "^" + character_class[1:]
+        return "[%s]" % character_class.replace("\\", "\\\\")
+    if len(token) == 2 and token.startswith("\\"):
+        return re.escape(token[1])
+    return re.escape(token)
+
+
+def ignore_pattern_to_regex(pattern):
+    return "".join(
+        ignore_pattern_token_to_regex(token)
+        for token in ignore_pattern_token_regex.findall(pattern)
+    )
+
+
+def ignore_rule_to_regex(rule):
+    negated = rule.startswith("!")
+    if negated or rule.startswith("\\!") or rule.startswith("\\#"):
+        rule = rule[1:]
+    # trailing spaces are ignored unless escaped
+    if not rule.endswith("\\ "):
+        rule = rule.rstrip(" ")
+    directory_only = rule.endswith("/")
+    rule = rule.rstrip("/")
+    # rules with a non-trailing slash are relative to the folder of the ignore file
+    anchored = "/" in rule
+    regex = ignore_pattern_to_regex(rule.lstrip("/"))
+
+    if not anchored:
+        regex = "(?:.*/)?" + regex
+    return regex, negated, directory_only
+
+
+class IgnoreRules:
+    def __init__(self, rules):
+        compiled_rules = []
+        for rule in rules:
+            if rule.strip() == "" or rule.startswith("#"):
+                continue
+            compiled_rules.append(ignore_rule_to_regex(rule))
+        self.negated_groups = {
+            "r%s" % number
+            for number, (_, negated, _) in enumerate(compiled_rules)
+            if negated
+        }
+
+        # the last matching rule decides, so the alternatives are tried in reverse order
+        def combined_regex(include_directory_only_rules):
+            alternatives = [
+                "(?P<r%s>%s)" % (number, regex)
+                for number, (regex, _, directory_only) in reversed(
+                    list(enumerate(compiled_rules))
+                )
+                if include_directory_only_rules or not directory_only
+            ]
+            if len(alternatives) == 0:
+                return None
+            return re.compile("^(?:%s)$" % "|".join(alternatives), re.DOTALL)
+
+        self.file_regex = combined_regex(include_directory_only_rules=False)
+        self.directory_regex = combined_regex(include_directory_only_rules=True)
+
+    def match(self, relative_path, is_directory):
+        # True (ignored), False (explicitly re-included) or None (no rule matched)
+        regex = self.directory_regex if is_directory else self.file_regex
+        if regex is None:
+            return None
+        m = regex.match(relative_path)
+        if m is None:
+            return None
+        return m.lastgroup not in self.negated_groups
+
+    @classmethod
+    def from_ignore_file(cls, ignore_file_path):
+        with open(ignore_file_path, encoding="utf-8") as f:
+            return cls(f.read().splitlines())
+
+
+class IgnoreMatcher:
+    # rule sets from the walk root down to the current folder, deepest last
+    def __init__(self, rule_sets):
+        self.rule_sets = rule_sets
+
+    def is_ignored(self, path, is_directory):
+        for base_path, rules in reversed(self.rule_sets):
+            relative_path = path[len(base_path) :].lstrip(os.sep)
+            if os.sep != "/":
+                relative_path = relative_path.replace(os.sep, "/")
+            ignored = rules.match(relative_path, is_directory)
+            if ignored is not None:
+                return ignored
+        return False
+
+    def for_folder(self, folder_path):
+        ignore_file_path = os.path.join(folder_path, ignore_file_name)
+        if not os.path.isfile(ignore_file_path):
+            return self
+        return IgnoreMatcher(
+            [
+                *self.rule_sets,
+                (folder_path, IgnoreRules.from_ignore_file(ignore_file_path)),
+            ]
+        )
+
+
+def ignore_matcher(folder_path, additional_ignore_rules=None, ignore_root_path=None):
+    rule_sets = [
+        (
+            folder_path,
+            IgnoreRules([*default_ignore_rules, *(additional_ignore_rules or [])]),
+        )
+    ]
+    matcher = IgnoreMatcher(rule_sets)
+    # ignore files in the folders from the ignore root to the walked folder apply too
+    if ignore_root_path is not None:
+        relative_path = os.path.relpath(folder_path, ignore_root_path)
+        if relative_path != "." and not relative_path.startswith(".."):
+            ancestor_path = ignore_root_path
+            matcher = matcher.for_folder(ancestor_path)
+            for part in relative_path.split(os.sep)[:-1]:
+                ancestor_path = os.path.join(ancestor_path, part)
+                matcher = matcher.for_folder(ancestor_path)
+    return matcher
+
+
+def scan_folder(root, matcher):
+    # the non-ignored files and subfolders of a folder, sorted by name
+    try:
+        with os.scandir(root) as it:
+            entries = sorted(it, key=lambda entry: entry.name)
+    except (FileNotFoundError, NotADirectoryError):
+        return [], []
+    files = []
+    subfolders = []
+    for entry in entries:
+        if entry.is_dir():
+            # like os.walk, symlinked folders are not followed
+            if not entry.is_symlink() and not matcher.is_ignored(entry.path, True):
+                subfolders.append(entry.path)
+        elif not matcher.is_ignored(entry.path, False):
+            files.append(entry)
+    return files, subfolders
+
+
+def walk_files(
+    folder_path,
+    additional_ignore_rules=None,
+    ignore_root_path=None,
+    folder_callback=None,
+):
+    # yields (root, os.DirEntry) for each non-ignored file, in sorted walk order.
+    # ignored folders are pruned before they are descended into, so nothing within
+    # them is ever stat'ed. folder_callback is called with each walked folder path
+    stack = [
+        (
+            folder_path,
+            ignore_matcher(folder_path, additional_ignore_rules, ignore_root_path),
+        )
+    ]
+    while stack:
+        root, matcher = stack.pop()
+        matcher = matcher.for_folder(root)
+        if folder_callback is not None:
+            folder_callback(root)
+        files, subfolders = scan_folder(root, matcher)
+        for entry in files:
+            yield root, entry
+        for subfolder_path in reversed(subfolders):
+            stack.append((subfolder_path, matcher))
@@ -0,0 +1,120 @@
+import os
+import re
+
+from selfquantifier.commit_index import (
+    CommitPrefixIndex,
+    IndexedCommit,
+    default_commit_index,
+    git,
+)
+
+# the commit message used by add_all_untracked_and_changed_files and friends
+automation_commit_message = "Current files"
+
+# edit subfolders are named "<date> (<history reference>)", in Edits and Edits/Archive
+edit_subfolder_history_reference_regex = re.compile(r"\(([0-9a-f]{4,40})\)$")
+history_reference_regex = re.compile(r"^(?:'|commit:)?([0-9a-f]{4,40})$")
+
+
+def history_references_in_edit_file(xlsx_path):
+    # the values of the "History reference" columns (like "Source transaction file:
+    # History reference"), read as the strings they were written as
+    import pandas as pd
+
+    df = pd.read_excel(
+        xlsx_path,
+        dtype=str,
+        usecols=lambda column: str(column).endswith("History reference"),
+    )
+    return {
+        m.group(1)
+        for column in df.columns
+        for value in df[column].dropna().unique()
+        for m in [history_reference_regex.match(value.strip())]
+        if m is not None
+    }
+
+
+def history_references_in_edits_folder(edits_folder_path):
+    # the history references of the edit subfolders, the edit files and the edit
+    # journal, which are all resolved against the history later on
+    from selfquantifier.edit_journal import edit_journal_folder_name, read_journal_file
+
+    history_references = set()
+    for root, folder_names, file_names in os.walk(edits_folder_path):
+        for folder_name in folder_names:
+            m = edit_subfolder_history_reference_regex.search(folder_name)
+            if m is not None:
+                history_references.add(m.group(1))
+        for file_name in file_names:
+            file_path = os.path.join(root, file_name)
+            if os.path.basename(root) == edit_journal_folder_name:
+                if file_name.endswith(".jsonl"):
+                    history_references.update(
+                        entry["history_reference"]
+                        for entry in read_journal_file(file_path)
+                    )
+            # skipping the lock files of spreadsheet applications
+            elif file_name.endswith(".xlsx") and not file_name.startswith("~$"):
+                history_references.update(history_references_in_edit_file(file_path))
+    return history_references
+
+
+def first_parent_history(repo_path):
+    # oldest first, as seen through any grafts made by earlier compactions
+    output = git(repo_path, "log", "--reverse", "--format=%H%x00%P%x00%s", "HEAD")
+    history = []
+    for line in output.splitlines():
+        sha, parents, subject = line.split("\0", 2)
+        parents = parents.split()
+        if len(parents) > 1:
+            raise Exception(
+                "Merge commit %s found, history with merges is not compacted" % sha
+            )
+        history.append((sha, parents[0] if parents else None, subject))
+    return history
+
+
+def compact_automation_commits(repo_path, history_references, dry_run=False):
+    # hides the automation commits that no history reference points to. the commits
+    # that are kept get grafted (git replace --graft) onto the closest kept ancestor,
+    # so that no kept commit changes its sha and every history reference stays
+    # resolvable. the hidden commits are only skipped by history traversals, and the
+    # compaction is undone by deleting the refs under refs/replace/. git gc keeps the
+    # hidden commits, since the kept commits themselves still point to them
+    history = first_parent_history(repo_path)
+    prefix_index = CommitPrefixIndex(
+        [IndexedCommit(sha, None) for (sha, _, _) in history]
+    )
+    referenced_shas = {
+        commit.hash
+        for history_reference in history_references
+        # ambiguous references keep all of their candidates
+        for commit in prefix_index.matching_commits(history_reference)
+    }
+    head_sha = history[-1][0]
+
+    def is_kept(sha, subject):
+        return (
+            sha == head_sha
+            or sha in referenced_shas
+            or subject != automation_commit_message
+        )
+
+    hidden_commits = 0
+    last_kept_sha = None
+    grafts = []
+    for i, (sha, parent_sha, subject) in enumerate(history):
+        if i > 0 and not is_kept(sha, subject):
+            hidden_commits += 1
+            continue
+        if parent_sha != last_kept_sha:
+            grafts.append((sha, last_kept_sha))
+        last_kept_sha = sha
+
+    if not dry_run and len(grafts) > 0:
+        for sha, parent_sha in grafts:
+            git(repo_path, "replace", "-f", "--graft", sha, parent_sha)
+        # the indexed history no longer matches what git log returns
+        default_commit_index(repo_path).invalidate()
+    return hidden_commits
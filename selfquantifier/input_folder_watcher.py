@@ -0,0 +1,343 @@
+import os
+import struct
+import sys
+import threading
+
+from selfquantifier.file_fingerprints import (
+    default_file_digests,
+    file_fingerprint_key,
+    fingerprint_file,
+    ordered_parallel_map,
+)
+from selfquantifier.file_walking import (
+    clerk_data_ignore_rules,
+    ignore_file_name,
+    ignore_matcher,
+    walk_files,
+)
+
+# from <sys/inotify.h>
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+watch_mask = (
+    IN_MODIFY
+    | IN_ATTRIB
+    | IN_CLOSE_WRITE
+    | IN_MOVED_FROM
+    | IN_MOVED_TO
+    | IN_CREATE
+    | IN_DELETE
+    | IN_DELETE_SELF
+    | IN_MOVE_SELF
+    | IN_ONLYDIR
+)
+
+inotify_event_header = struct.Struct("iIII")
+
+
+def load_libc():
+    if not sys.platform.startswith("linux"):
+        return None
+    import ctypes
+    import ctypes.util
+
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        libc.inotify_init1
+    except (OSError, AttributeError):
+        return None
+    libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+    return libc
+
+
+_libc = None
+
+
+def inotify_available():
+    global _libc
+    if _libc is None:
+        _libc = load_libc() or False
+    return _libc is not False
+
+
+class InputFolderWatcher:
+    # keeps the inventory of a clerk input subfolder in memory and brings it up
+    # to date from inotify events, so that only touched files are stat'ed and hashed
+    # again. structural changes (folders created, moved or deleted, ignore files
+    # changed, event queue overflows) lead to a new walk that still reuses the
+    # fingerprints of all files with unchanged stat results
+    def __init__(
+        self,
+        folder_path,
+        selfquantifier_folder_path,
+        file_fingerprint_index=None,
+        additional_ignore_rules=None,
+    ):
+        self.folder_path = folder_path
+        self.selfquantifier_folder_path = selfquantifier_folder_path
+        self.file_fingerprint_index = file_fingerprint_index
+        self.ignore_rules = [*clerk_data_ignore_rules, *(additional_ignore_rules or [])]
+        self.walks = 0
+        self.rehashed = 0
+        self._fd = None
+        self._folders_by_watch = {}
+        self._watched_folders = set()
+        self._walked_folders = set()
+        self._matchers = {}
+        # full path -> (root, file name, stat result, file digests)
+        self._inventory = {}
+        self._touched = set()
+        self._rewalk = True
+        self._lock = threading.Lock()
+
+    def start(self):
+        if not inotify_available():
+            raise OSError("inotify is not available on this system")
+        fd = _libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if fd < 0:
+            import ctypes
+
+            errno = ctypes.get_errno()
+            raise OSError(errno, os.strerror(errno))
+        self._fd = fd
+        return self
+
+    def stop(self):
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+    def _add_watch(self, folder_path):
+        self._walked_folders.add(folder_path)
+        if folder_path in self._watched_folders:
+            return
+        wd = _libc.inotify_add_watch(self._fd, os.fsencode(folder_path), watch_mask)
+        # folders that disappeared in the meantime are caught by the parent's events
+        if wd < 0:
+            return
+        # a folder moved within the tree keeps its watch descriptor
+        previous_folder_path = self._folders_by_watch.get(wd)
+        if previous_folder_path is not None:
+            self._watched_folders.discard(previous_folder_path)
+        self._folders_by_watch[wd] = folder_path
+        self._watched_folders.add(folder_path)
+
+    def _remove_stale_watches(self):
+        for wd, folder_path in list(self._folders_by_watch.items()):
+            if folder_path not in self._walked_folders:
+                _libc.inotify_rm_watch(self._fd, wd)
+                del self._folders_by_watch[wd]
+                self._watched_folders.discard(folder_path)
+
+    def _drain_events(self):
+        while True:
+            try:
+                data = os.read(self._fd, 64 * 1024)
+            except BlockingIOError:
+                return
+            offset = 0
+            while offset < len(data):
+                wd, mask, _, name_length = inotify_event_header.unpack_from(
+                    data, offset
+                )
+                offset += inotify_event_header.size
+                name = os.fsdecode(data[offset : offset + name_length].rstrip(b"\0"))
+                offset += name_length
+                self._handle_event(wd, mask, name)
+
+    def _handle_event(self, wd, mask, name):
+        if mask & IN_Q_OVERFLOW:
+            self._rewalk = True
+            return
+        folder_path = self._folders_by_watch.get(wd)
+        if mask & IN_IGNORED:
+            if folder_path is not None:
+                del self._folders_by_watch[wd]
+                self._watched_folders.discard(folder_path)
+            return
+        if folder_path is None:
+            return
+        if (
+            mask & (IN_ISDIR | IN_DELETE_SELF | IN_MOVE_SELF)
+            or name == ignore_file_name
+        ):
+            self._rewalk = True
+        elif name:
+            self._touched.add(os.path.join(folder_path, name))
+
+    def _matcher_for_folder(self, folder_path):
+        if folder_path not in self._matchers:
+            if folder_path == self.folder_path:
+                matcher = ignore_matcher(
+                    self.folder_path,
+                    self.ignore_rules,
+                    ignore_root_path=self.selfquantifier_folder_path,
+                )
+            else:
+                matcher = self._matcher_for_folder(os.path.dirname(folder_path))
+            self._matchers[folder_path] = matcher.for_folder(folder_path)
+        return self._matchers[folder_path]
+
+    def _walk(self):
+        previous_inventory = self._inventory
+        self._inventory = {}
+        self._matchers = {}
+        self._walked_folders = set()
+        for root, entry in walk_files(
+            self.folder_path,
+            additional_ignore_rules=self.ignore_rules,
+            ignore_root_path=self.selfquantifier_folder_path,
+            folder_callback=self._add_watch,
+        ):
+            stat_result = entry.stat()
+            previous = previous_inventory.get(entry.path)
+            file_digests = None
+            if previous is not None and file_fingerprint_key(
+                previous[2]
+            ) == file_fingerprint_key(stat_result):
+                file_digests = previous[3]
+            self._inventory[entry.path] = (root, entry.name, stat_result, file_digests)
+        self._remove_stale_watches()
+        self.walks += 1
+
+    def _update_touched_files(self, touched):
+        for path in touched:
+            root = os.path.dirname(path)
+            try:
+                stat_result = os.stat(path)
+            except FileNotFoundError:
+                stat_result = None
+            if (
+                stat_result is None
+                or not os.path.isfile(path)
+                or self._matcher_for_folder(root).is_ignored(path, False)
+            ):
+                self._inventory.pop(path, None)
+                continue
+            previous = self._inventory.get(path)
+            file_digests = None
+            if previous is not None and file_fingerprint_key(
+                previous[2]
+            ) == file_fingerprint_key(stat_result):
+                file_digests = previous[3]
+            self._inventory[path] = (
+                root,
+                os.path.basename(path),
+                stat_result,
+                file_digests,
+            )
+
+    def records(
+        self,
+        digests=default_file_digests,
+        hash_workers=None,
+        full_hash_large_files=False,
+        content_type_sniffer=None,
+    ):
+        from selfquantifier.utils import file_record
+
+        with self._lock:
+            if self._fd is None:
+                raise OSError("The input folder watcher has not been started")
+            self._drain_events()
+            touched = self._touched
+            self._touched = set()
+            if self._rewalk:
+                self._rewalk = False
+                self._walk()
+            else:
+                self._update_touched_files(touched)
+            # same order as walk_files: folder by folder, files before subfolders
+            paths = sorted(
+                self._inventory,
+                key=lambda path: (
+                    tuple(os.path.dirname(path).split(os.sep)),
+                    os.path.basename(path),
+                ),
+            )
+
+            def fingerprint(path):
+                root, file_name, stat_result, file_digests = self._inventory[path]
+                if file_digests is None or any(
+                    digest not in file_digests for digest in digests
+                ):
+                    file_digests = fingerprint_file(
+                        path,
+                        self.file_fingerprint_index,
+                        digests,
+                        stat_result=stat_result,
+                        full_hash_large_files=full_hash_large_files,
+                    )
+                    self._inventory[path] = (root, file_name, stat_result, file_digests)
+                    self.rehashed += 1
+                if (
+                    content_type_sniffer is not None
+                    and content_type_sniffer.fingerprint_key not in file_digests
+                ):
+                    file_digests = {
+                        **file_digests,
+                        content_type_sniffer.fingerprint_key: (
+                            content_type_sniffer.sniff_file(
+                                path, self.file_fingerprint_index, stat_result
+                            )
+                        ),
+                    }
+                    self._inventory[path] = (root, file_name, stat_result, file_digests)
+                record = file_record(
+                    root, file_name, file_digests, self.selfquantifier_folder_path
+                )
+                if content_type_sniffer is not None:
+                    record["Content type"] = file_digests[
+                        content_type_sniffer.fingerprint_key
+                    ]
+                return record
+
+            records = list(
+                ordered_parallel_map(fingerprint, paths, workers=hash_workers)
+            )
+        if self.file_fingerprint_index is not None:
+            self.file_fingerprint_index.save()
+        return records
+
+
+_input_folder_watchers = {}
+
+
+def watch_input_subfolder(
+    folder_path, selfquantifier_folder_path, file_fingerprint_index=None
+):
+    # returns None where inotify is not available, in which case the inventory
+    # helpers keep walking the folder on every call
+    if not inotify_available():
+        return None
+    if folder_path not in _input_folder_watchers:
+        _input_folder_watchers[folder_path] = InputFolderWatcher(
+            folder_path,
+            selfquantifier_folder_path,
+            file_fingerprint_index=file_fingerprint_index,
+        ).start()
+    return _input_folder_watchers[folder_path]
+
+
+def running_input_folder_watcher(folder_path):
+    return _input_folder_watchers.get(folder_path)
+
+
+def stop_watching_input_folders():
+    for watcher in _input_folder_watchers.values():
+        watcher.stop()
+    _input_folder_watchers.clear()
@@ -4,7 +4,16 @@ import geopy.distance
 import pandas as pd
 import reverse_geocoder as rg
 
-from selfquantifier.utils import list_files_in_clerk_input_subfolder
+from selfquantifier.content_type_sniffing import (
+    ContentTypeSniffer,
+    fill_missing_content_types,
+)
+from selfquantifier.file_fingerprints import default_file_digests
+from selfquantifier.run_context import refreshing_run_context, run_history_reference
+from selfquantifier.utils import (
+    add_missing_editable_columns,
+    list_files_in_clerk_input_subfolder,
+)
 
 
 def location_history_flow(
@@ -17,16 +26,29 @@ def location_history_flow(
     current_history_reference,
     keep_unmerged_previous_edits=False,
     failfast=False,
+    file_digests=default_file_digests,
+    run_context=None,
 ):
+    current_history_reference = run_history_reference(
+        run_context, current_history_reference
+    )
+    acknowledge_changes_in_selfquantifier_input_folder = refreshing_run_context(
+        acknowledge_changes_in_selfquantifier_input_folder, run_context
+    )
+
     def list_location_history_files_in_location_history_folder():
+        from selfquantifier.location_history.parse import content_type_signatures
+
         _ = list_files_in_clerk_input_subfolder(
             location_history_folder_path,
             selfquantifier_input_folder_path=selfquantifier_input_folder_path,
+            digests=file_digests,
+            content_type_sniffer=ContentTypeSniffer(content_type_signatures),
         )
         if len(_) == 0:
             return _
-        for column in location_history_files_editable_columns:
-            _[column] = None
+        # content types sniffed from the file headers are kept
+        add_missing_editable_columns(_, location_history_files_editable_columns)
         _["History reference"] = current_history_reference()
         return _[
             [
@@ -69,6 +91,9 @@ def location_history_flow(
         location_history_files_editable_columns,
         keep_unmerged_previous_edits,
     )
+    possibly_edited_location_history_files_df = fill_missing_content_types(
+        possibly_edited_location_history_files_df, location_history_files_df
+    )
 
     included_location_history_files = possibly_edited_location_history_files_df[
         (
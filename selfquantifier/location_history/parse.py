@@ -16,6 +16,16 @@ parser_by_content_type = {
 }
 
 
+# header signatures of the exports, used to set the content type of new location history files
+content_type_signatures = [
+    ("exported-location-history-file/exiftool-output.csv", "SourceFile,"),
+    (
+        "exported-location-history-file/google-takeout.location-history.json",
+        r'\{\s*"locations"\s*:',
+    ),
+]
+
+
 def parse_location_history_files(
     location_history_files,
     selfquantifier_input_folder_path,
@@ -1,10 +1,18 @@
 import os
+from functools import partial
 
+from selfquantifier.edit_file_sidecars import sidecar_ignore_rule
+from selfquantifier.edit_journal import edit_journal_folder_name
+from selfquantifier.file_fingerprints import (
+    default_file_digests,
+    default_file_fingerprint_index,
+)
 from selfquantifier.location_history.defaults import (
     location_history_by_date_editable_columns,
     location_history_files_editable_columns,
 )
 from selfquantifier.location_history.flow import location_history_flow
+from selfquantifier.run_context import RunContext
 from selfquantifier.time_tracking.defaults import (
     default_time_tracking_entries_editable_columns,
     default_time_tracking_files_editable_columns,
@@ -17,9 +25,12 @@ from selfquantifier.transactions.defaults import (
 from selfquantifier.transactions.flow import transactions_flow
 from selfquantifier.utils import (
     add_all_untracked_and_changed_files,
+    add_untracked_and_changed_files_in_subfolders,
     commit_datetime_from_history_reference,
+    commit_datetimes_from_history_references,
     commits_by_short_gitsha1,
     current_gitsha1,
+    enable_git_status_caches,
     ensure_selfquantifier_folder_versioning,
     export_file_name_by_record_type,
     fetch_gsheets_worksheet_as_df,
@@ -41,7 +52,62 @@ def extract_commit_sha_from_edit_subfolder_path(edit_subfolder_path):
     return commit_sha
 
 
-def init_notebook_and_return_helpers(selfquantifier_folder):
+def setup_input_folder_watching(
+    watch_input_folder,
+    input_subfolder_paths,
+    selfquantifier_input_folder_path,
+    file_fingerprint_index,
+):
+    # keep the inventories of the input subfolders up to date from inotify events (linux only)
+    if not watch_input_folder:
+        return
+    from selfquantifier.input_folder_watcher import watch_input_subfolder
+
+    for folder_path in input_subfolder_paths:
+        watch_input_subfolder(
+            folder_path,
+            selfquantifier_input_folder_path,
+            file_fingerprint_index=file_fingerprint_index,
+        )
+
+
+def setup_input_subfolder_staging(
+    scoped_staging,
+    selfquantifier_input_folder_repo,
+    acknowledge_changes_in_selfquantifier_input_folder,
+):
+    # with scoped staging, the flows only commit their own input subfolder (and the
+    # editable data), and skip git entirely when nothing changed since the last run
+    if scoped_staging:
+        enable_git_status_caches(selfquantifier_input_folder_repo)
+
+    def acknowledge_changes_in_selfquantifier_input_subfolder(folder_path):
+        if not scoped_staging:
+            return acknowledge_changes_in_selfquantifier_input_folder
+
+        def acknowledge_changes():
+            add_untracked_and_changed_files_in_subfolders(
+                selfquantifier_input_folder_repo, [folder_path]
+            )
+
+        return acknowledge_changes
+
+    return acknowledge_changes_in_selfquantifier_input_subfolder
+
+
+def setup_edit_journal(edit_journal, edits_folder_path):
+    # the folder of the edit journal, or None when edit files are merged one by one
+    if not edit_journal:
+        return None
+    return os.path.join(edits_folder_path, edit_journal_folder_name)
+
+
+def init_notebook_and_return_helpers(
+    selfquantifier_folder,
+    watch_input_folder=False,
+    scoped_staging=False,
+    edit_journal=False,
+):
     # expand given paths to absolute paths
     selfquantifier_folder_path = os.path.expanduser(selfquantifier_folder).rstrip(
         os.sep
@@ -58,6 +124,7 @@ def init_notebook_and_return_helpers(selfquantifier_folder):
         selfquantifier_input_folder_path, "Location History"
     )
     edits_folder_path = os.path.join(selfquantifier_folder_path, "Edits")
+    edit_journal_folder_path = setup_edit_journal(edit_journal, edits_folder_path)
     selfquantifier_output_folder_path = os.path.join(
         selfquantifier_folder_path, "Output"
     )
@@ -82,12 +149,45 @@ def init_notebook_and_return_helpers(selfquantifier_folder):
         selfquantifier_input_folder_path=selfquantifier_input_folder_path
     )
 
+    # digests of unchanged input files are reused across flow runs
+    file_fingerprint_index = default_file_fingerprint_index(
+        selfquantifier_input_folder_path
+    )
+
+    setup_input_folder_watching(
+        watch_input_folder,
+        [
+            transactions_folder_path,
+            receipts_folder_path,
+            time_tracking_folder_path,
+            location_history_folder_path,
+        ],
+        selfquantifier_input_folder_path,
+        file_fingerprint_index,
+    )
+
     def acknowledge_changes_in_selfquantifier_input_folder():
         add_all_untracked_and_changed_files(selfquantifier_input_folder_repo)
 
+    acknowledge_changes_in_selfquantifier_input_subfolder = (
+        setup_input_subfolder_staging(
+            scoped_staging,
+            selfquantifier_input_folder_repo,
+            acknowledge_changes_in_selfquantifier_input_folder,
+        )
+    )
+
     def current_history_reference():
         return current_gitsha1(selfquantifier_input_folder_repo)
 
+    # repository state is read once per flow run
+    def new_run_context():
+        return RunContext(
+            selfquantifier_input_folder_path,
+            selfquantifier_input_folder_repo,
+            list_edit_files_in_edits_folder,
+        )
+
     # transactions
 
     def transactions(
@@ -95,6 +195,7 @@ def init_notebook_and_return_helpers(selfquantifier_folder):
         failfast=False,
         additional_transaction_files_editable_columns=None,
         additional_transactions_editable_columns=None,
+        file_digests=default_file_digests,
     ):
         if additional_transaction_files_editable_columns:
             transaction_files_editable_columns = [
@@ -112,24 +213,30 @@ def init_notebook_and_return_helpers(selfquantifier_folder):
             ]
         else:
             transactions_editable_columns = default_transactions_editable_columns
+        run_context = new_run_context()
         return transactions_flow(
             transaction_files_editable_columns=transaction_files_editable_columns,
             transactions_editable_columns=transactions_editable_columns,
             selfquantifier_input_folder_path=selfquantifier_input_folder_path,
-            possibly_edited_df=possibly_edited_df,
+            possibly_edited_df=partial(possibly_edited_df, run_context=run_context),
             transactions_folder_path=transactions_folder_path,
-            acknowledge_changes_in_selfquantifier_input_folder=acknowledge_changes_in_selfquantifier_input_folder,
+            acknowledge_changes_in_selfquantifier_input_folder=acknowledge_changes_in_selfquantifier_input_subfolder(
+                transactions_folder_path
+            ),
             current_history_reference=current_history_reference,
             keep_unmerged_previous_edits=keep_unmerged_previous_edits,
             failfast=failfast,
+            file_digests=file_digests,
+            run_context=run_context,
         )
 
     # receipts
 
-    def list_receipt_files_in_receipts_folder():
+    def list_receipt_files_in_receipts_folder(file_digests=default_file_digests):
         _ = list_files_in_clerk_input_subfolder(
             receipts_folder_path,
             selfquantifier_input_folder_path=selfquantifier_input_folder_path,
+            digests=file_digests,
         )
         if len(_) == 0:
             return _
@@ -141,17 +248,26 @@ def init_notebook_and_return_helpers(selfquantifier_folder):
 
     # location_history
 
-    def location_history(keep_unmerged_previous_edits=False, failfast=False):
+    def location_history(
+        keep_unmerged_previous_edits=False,
+        failfast=False,
+        file_digests=default_file_digests,
+    ):
+        run_context = new_run_context()
         return location_history_flow(
             location_history_files_editable_columns=location_history_files_editable_columns,
             location_history_by_date_editable_columns=location_history_by_date_editable_columns,
             selfquantifier_input_folder_path=selfquantifier_input_folder_path,
-            possibly_edited_df=possibly_edited_df,
+            possibly_edited_df=partial(possibly_edited_df, run_context=run_context),
             location_history_folder_path=location_history_folder_path,
-            acknowledge_changes_in_selfquantifier_input_folder=acknowledge_changes_in_selfquantifier_input_folder,
+            acknowledge_changes_in_selfquantifier_input_folder=acknowledge_changes_in_selfquantifier_input_subfolder(
+                location_history_folder_path
+            ),
             current_history_reference=current_history_reference,
             keep_unmerged_previous_edits=keep_unmerged_previous_edits,
             failfast=failfast,
+            file_digests=file_digests,
+            run_context=run_context,
         )
 
     # time_tracking_entries
@@ -161,6 +277,7 @@ def init_notebook_and_return_helpers(selfquantifier_folder):
         failfast=False,
         additional_time_tracking_files_editable_columns=None,
         additional_time_tracking_entries_editable_columns=None,
+        file_digests=default_file_digests,
     ):
         if additional_time_tracking_files_editable_columns:
             time_tracking_files_editable_columns = [
@@ -180,39 +297,55 @@ def init_notebook_and_return_helpers(selfquantifier_folder):
             time_tracking_entries_editable_columns = (
                 default_time_tracking_entries_editable_columns
             )
+        run_context = new_run_context()
         return time_tracking_flow(
             time_tracking_files_editable_columns=time_tracking_files_editable_columns,
             time_tracking_entries_editable_columns=time_tracking_entries_editable_columns,
             selfquantifier_input_folder_path=selfquantifier_input_folder_path,
-            possibly_edited_df=possibly_edited_df,
+            possibly_edited_df=partial(possibly_edited_df, run_context=run_context),
             time_tracking_folder_path=time_tracking_folder_path,
-            acknowledge_changes_in_selfquantifier_input_folder=acknowledge_changes_in_selfquantifier_input_folder,
+            acknowledge_changes_in_selfquantifier_input_folder=acknowledge_changes_in_selfquantifier_input_subfolder(
+                time_tracking_folder_path
+            ),
             current_history_reference=current_history_reference,
             keep_unmerged_previous_edits=keep_unmerged_previous_edits,
             failfast=failfast,
+            file_digests=file_digests,
+            run_context=run_context,
         )
 
     # other
 
-    def list_edit_files_in_edits_folder():
+    def list_edit_files_in_edits_folder(commits=None):
         _ = list_files_in_clerk_subfolder(
-            edits_folder_path, selfquantifier_folder_path=selfquantifier_folder_path
+            edits_folder_path,
+            selfquantifier_folder_path=selfquantifier_folder_path,
+            # only the names and history references of the edit files are used
+            digests=(),
+            # the archive and journal subfolders are not descended into
+            additional_ignore_rules=[
+                "/Archive/",
+                "/%s/" % edit_journal_folder_name,
+                sidecar_ignore_rule,
+            ],
         )
         if len(_) == 0:
             return _
-        # ignore those in the archive subfolder
-        _ = _[~_["File path"].str.contains("\\/Archive\\/", regex=True)]
-        if len(_) == 0:
-            return _
-        # add commit-metadata to list
-        commits = commits_by_short_gitsha1(
-            selfquantifier_input_folder_path, selfquantifier_input_folder_repo
-        )
+        # add commit-metadata to list. commits may also be a callable returning them,
+        # so that they are only looked up once there are edit files
+        if commits is None:
+            commits = commits_by_short_gitsha1(
+                selfquantifier_input_folder_path, selfquantifier_input_folder_repo
+            )
+        elif callable(commits):
+            commits = commits()
         _["Related history reference"] = _["File path"].apply(
             extract_commit_sha_from_edit_subfolder_path
         )
-        _["Related history reference date"] = _["Related history reference"].apply(
-            commit_datetime_from_history_reference, commits=commits
+        _[
+            "Related history reference date"
+        ] = commit_datetimes_from_history_references(
+            _["Related history reference"], commits
         )
         _ = _.sort_values(by="Related history reference date")
         return _
@@ -229,11 +362,26 @@ def init_notebook_and_return_helpers(selfquantifier_folder):
     if not os.path.isdir(edits_folder_path):
         os.mkdir(edits_folder_path)
 
+    def compact_input_folder_history(dry_run=False):
+        from selfquantifier.history_compaction import (
+            compact_automation_commits,
+            history_references_in_edits_folder,
+        )
+
+        # hides the "Current files" commits that no edit file refers to
+        return compact_automation_commits(
+            selfquantifier_input_folder_path,
+            history_references_in_edits_folder(edits_folder_path),
+            dry_run=dry_run,
+        )
+
     def possibly_edited_df(
         current_commit_df,
         record_type,
         editable_columns,
         keep_unmerged_previous_edits=False,
+        run_context=None,
+        provenance=False,
     ):
         return possibly_edited_df_util(
             current_commit_df,
@@ -245,6 +393,9 @@ def init_notebook_and_return_helpers(selfquantifier_folder):
             edits_folder_path,
             selfquantifier_input_folder_path,
             selfquantifier_input_folder_repo,
+            run_context=run_context,
+            edit_journal_folder_path=edit_journal_folder_path,
+            provenance=provenance,
         )
 
     def store_gsheets_edits(gsheets_title, gsheets_sheet_name, edits_df, record_type):
@@ -310,8 +461,11 @@ def init_notebook_and_return_helpers(selfquantifier_folder):
         "location_history": location_history,
         "time_tracking_entries": time_tracking_entries,
         "acknowledge_changes_in_selfquantifier_input_folder": acknowledge_changes_in_selfquantifier_input_folder,
+        "list_edit_files_in_edits_folder": list_edit_files_in_edits_folder,
+        "compact_input_folder_history": compact_input_folder_history,
         "store_gsheets_edits": store_gsheets_edits,
         "download_and_store_gsheets_edits": download_and_store_gsheets_edits,
+        "file_fingerprint_index": file_fingerprint_index,
         "paths": {
             "selfquantifier_input_folder_path": selfquantifier_input_folder_path,
             "transactions_folder_path": transactions_folder_path,
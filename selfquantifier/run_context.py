@@ -0,0 +1,139 @@
+from selfquantifier.utils import (
+    commit_datetimes_from_history_references,
+    commits_by_short_gitsha1,
+    current_gitcommit_datetime,
+    current_gitsha1,
+)
+
+
+class RunContext:
+    # the repository state that a flow run needs, read once and then reused. the
+    # flows refresh it after committing changes to the input folder. the catalog
+    # of edit files outlives refreshes, since committing changes to the input folder
+    # does not change the edits folder, and possibly_edited_df_util keeps it current
+    # as it archives and creates edit files
+    def __init__(
+        self,
+        selfquantifier_input_folder_path,
+        selfquantifier_input_folder_repo,
+        list_edit_files_in_edits_folder=None,
+        current_history_reference=None,
+    ):
+        self.selfquantifier_input_folder_path = selfquantifier_input_folder_path
+        self.selfquantifier_input_folder_repo = selfquantifier_input_folder_repo
+        self._list_edit_files_in_edits_folder = list_edit_files_in_edits_folder
+        self._current_history_reference = current_history_reference
+        self._edit_files_df = None
+        self.refresh()
+
+    def refresh(self):
+        self._history_reference = None
+        self._commit_datetime = None
+        self._commits = None
+
+    def history_reference(self):
+        if self._history_reference is None:
+            if self._current_history_reference is not None:
+                self._history_reference = self._current_history_reference()
+            else:
+                self._history_reference = current_gitsha1(
+                    self.selfquantifier_input_folder_repo
+                )
+        return self._history_reference
+
+    def commit_datetime(self):
+        if self._commit_datetime is None:
+            self._commit_datetime = current_gitcommit_datetime(
+                self.selfquantifier_input_folder_repo
+            )
+        return self._commit_datetime
+
+    def commits(self):
+        if self._commits is None:
+            self._commits = commits_by_short_gitsha1(
+                self.selfquantifier_input_folder_path,
+                self.selfquantifier_input_folder_repo,
+            )
+        return self._commits
+
+    def edit_files(self):
+        # listing helpers that accept commits get the cached ones, looked up only
+        # when needed
+        import inspect
+
+        if self._edit_files_df is None:
+            if (
+                "commits"
+                in inspect.signature(self._list_edit_files_in_edits_folder).parameters
+            ):
+                self._edit_files_df = self._list_edit_files_in_edits_folder(
+                    commits=self.commits
+                )
+            else:
+                self._edit_files_df = self._list_edit_files_in_edits_folder()
+        return self._edit_files_df
+
+    def forget_edit_files(self):
+        self._edit_files_df = None
+
+    def add_edit_file(self, file_path, file_name, history_reference):
+        # keeps a listed catalog current after an edit file was created
+        import pandas as pd
+
+        if self._edit_files_df is None:
+            return
+        edit_files_df = self._edit_files_df
+        if len(edit_files_df) > 0:
+            if (
+                (edit_files_df["File path"] == file_path)
+                & (edit_files_df["File name"] == file_name)
+            ).any():
+                return
+            # the labels of the listed edit files stay valid for remove_edit_files
+            label = edit_files_df.index.max() + 1
+        else:
+            edit_files_df = None
+            label = 0
+        added_edit_file_df = pd.DataFrame(
+            {
+                "File name": file_name,
+                "File path": file_path,
+                "Related history reference": history_reference,
+            },
+            index=[label],
+        )
+        added_edit_file_df["Related history reference date"] = (
+            commit_datetimes_from_history_references(
+                added_edit_file_df["Related history reference"], self.commits()
+            )
+        )
+        self._edit_files_df = pd.concat(
+            [edit_files_df, added_edit_file_df]
+        ).sort_values(by="Related history reference date")
+
+    def remove_edit_files(self, edit_files_df):
+        if self._edit_files_df is None:
+            return
+        self._edit_files_df = self._edit_files_df.drop(
+            edit_files_df.index, errors="ignore"
+        )
+
+
+def run_history_reference(run_context, current_history_reference):
+    # the history reference is read once per run, and again after acknowledging changes
+    if run_context is None:
+        return current_history_reference
+    return run_context.history_reference
+
+
+def refreshing_run_context(acknowledge_changes, run_context):
+    # acknowledging changes to the input folder commits them, after which the run
+    # context is refreshed
+    if run_context is None:
+        return acknowledge_changes
+
+    def acknowledge_changes_and_refresh_run_context():
+        acknowledge_changes()
+        run_context.refresh()
+
+    return acknowledge_changes_and_refresh_run_context
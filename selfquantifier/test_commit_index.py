@@ -0,0 +1,162 @@
+import os
+
+from selfquantifier.commit_index import CommitIndex, unique_abbreviations
+from selfquantifier.utils import (
+    add_all_untracked_and_changed_files,
+    commit_datetime_from_history_reference,
+    ensure_selfquantifier_folder_versioning,
+    short_gitsha1,
+)
+
+
+def commit_file(repo, file_name, contents):
+    with open(os.path.join(repo.working_tree_dir, file_name), "w") as f:
+        f.write(contents)
+    add_all_untracked_and_changed_files(repo)
+
+
+def test_commit_index_matches_git_history_and_updates_incrementally(tmp_path):
+    # type: (...) -> None
+    from pydriller import RepositoryMining
+
+    repo_path = str(tmp_path / "Input")
+    repo = ensure_selfquantifier_folder_versioning(repo_path)
+    for number in range(3):
+        commit_file(repo, "%s.csv" % number, "%s\n" % number)
+
+    index_file_path = str(tmp_path / "commit-index.json")
+    commits = CommitIndex(repo_path, index_file_path).commits_by_short_gitsha1()
+    # history references abbreviated by git resolve to the same author dates
+    for commit in RepositoryMining(repo_path).traverse_commits():
+        assert (
+            commit_datetime_from_history_reference(
+                short_gitsha1(repo, commit.hash), commits
+            )
+            == commit.author_date
+        )
+    assert len(commits) == 4
+
+    commit_file(repo, "3.csv", "3\n")
+    index = CommitIndex(repo_path, index_file_path)
+    assert len(index) == 4
+    commits = index.commits_by_short_gitsha1()
+    assert len(index) == 5
+    assert index.git_log_calls == 1
+    head = short_gitsha1(repo, repo.head.object.hexsha)
+    assert commits[head].hash == repo.head.object.hexsha
+    assert commit_datetime_from_history_reference(head, commits) == (
+        commits[head].author_date
+    )
+
+    # unchanged history is answered from memory, with the same prefix index
+    prefix_index = index.prefix_index(commits)
+    assert index.commits_by_short_gitsha1() is commits
+    assert index.git_log_calls == 1
+    assert index.prefix_index(commits) is prefix_index
+
+    # a rewritten history is indexed from scratch
+    repo.git.reset("--hard", "HEAD~2")
+    commits = index.commits_by_short_gitsha1()
+    assert len(commits) == 3
+    assert head not in commits
+    assert len(index.prefix_index(commits).shas) == 3
+
+
+def test_unique_abbreviations():
+    # type: () -> None
+    assert unique_abbreviations(["abc1234f", "abc1235f", "bcd00000"], 4) == {
+        "abc1234f": "abc1234",
+        "abc1235f": "abc1235",
+        "bcd00000": "bcd0",
+    }
+
+
+def test_commit_datetimes_from_history_references_reports_unresolved_in_bulk():
+    # type: () -> None
+    from datetime import datetime
+
+    import pandas as pd
+    import pytest
+
+    from selfquantifier.commit_index import (
+        IndexedCommit,
+        UnresolvedHistoryReferencesError,
+    )
+    from selfquantifier.utils import commit_datetimes_from_history_references
+
+    commits = {
+        "abc1": IndexedCommit("abc1" + "0" * 36, datetime(2020, 1, 1)),
+        "abc2": IndexedCommit("abc2" + "0" * 36, datetime(2020, 1, 2)),
+        "bcd0": IndexedCommit("bcd0" + "0" * 36, datetime(2020, 1, 3)),
+    }
+    history_references = pd.Series(["abc1", "bcd0", "abc1", "abc", "fff0", "eee0"])
+
+    with pytest.raises(UnresolvedHistoryReferencesError) as e:
+        commit_datetimes_from_history_references(history_references, commits)
+    assert e.value.unknown == ["fff0", "eee0"]
+
+    dates = commit_datetimes_from_history_references(
+        history_references, commits, errors="coerce"
+    )
+    # ambiguous references resolve to the oldest matching commit
+    assert list(dates[:4]) == [
+        datetime(2020, 1, 1),
+        datetime(2020, 1, 3),
+        datetime(2020, 1, 1),
+        datetime(2020, 1, 1),
+    ]
+    assert dates[4:].isnull().all()
+
+
+def commit_sharing_the_prefix_of(repo, sha, prefix_length=4):
+    # a later commit on top of sha whose sha starts with the same characters, found
+    # by varying the commit message
+    import hashlib
+    import subprocess
+    import time
+
+    tree = repo.git.rev_parse("%s^{tree}" % sha)
+    identity = "A <a@example.com> %s +0000" % (int(time.time()) + 24 * 60 * 60)
+    number = 0
+    while True:
+        body = (
+            "tree %s\nparent %s\nauthor %s\ncommitter %s\n\n%s\n"
+            % (tree, sha, identity, identity, number)
+        ).encode()
+        later_sha = hashlib.sha1(b"commit %d\0" % len(body) + body).hexdigest()
+        if later_sha[:prefix_length] == sha[:prefix_length]:
+            break
+        number += 1
+    subprocess.run(
+        ["git", "-C", repo.working_tree_dir, "hash-object", "-t", "commit", "-w"]
+        + ["--stdin"],
+        input=body,
+        check=True,
+        capture_output=True,
+    )
+    repo.git.update_ref("HEAD", later_sha)
+    return later_sha
+
+
+def test_edit_folders_keep_resolving_when_later_commits_share_their_prefix(tmp_path):
+    # type: (...) -> None
+    from datetime import datetime
+
+    from selfquantifier.nb_helpers import init_notebook_and_return_helpers
+
+    helpers = init_notebook_and_return_helpers(str(tmp_path))
+    repo_path = helpers["paths"]["selfquantifier_input_folder_path"]
+    repo = ensure_selfquantifier_folder_versioning(repo_path)
+    commit_file(repo, "a.csv", "a\n")
+    sha = repo.head.object.hexsha
+    edit_folder_path = str(tmp_path / "Edits" / ("2020-01-01 0000 (%s)" % sha[:4]))
+    os.makedirs(edit_folder_path)
+    with open(os.path.join(edit_folder_path, "Transaction files.xlsx"), "w") as f:
+        f.write("")
+
+    later_sha = commit_sharing_the_prefix_of(repo, sha)
+    assert later_sha != sha and later_sha[:4] == sha[:4]
+    edit_files_df = helpers["list_edit_files_in_edits_folder"]()
+    assert edit_files_df["Related history reference date"].tolist() == [
+        datetime.fromisoformat(repo.git.log("-1", "--format=%aI", sha))
+    ]
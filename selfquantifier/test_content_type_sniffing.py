@@ -0,0 +1,104 @@
+import glob
+import os
+
+import pandas as pd
+
+from selfquantifier.content_type_sniffing import (
+    ContentTypeSniffer,
+    fill_missing_content_types,
+)
+from selfquantifier.file_fingerprints import FileFingerprintIndex
+
+package_path = os.path.dirname(__file__)
+
+
+def sniffed_content_types(signatures, test_data_path):
+    sniffer = ContentTypeSniffer(signatures)
+    return {
+        os.path.relpath(path, test_data_path): sniffer.sniff_file(path)
+        for path in glob.glob(
+            os.path.join(test_data_path, "**", "test_data", "*"), recursive=True
+        )
+        if ".expected." not in path and ".actual." not in path and os.path.isfile(path)
+    }
+
+
+def test_sniff_transaction_file_content_types():
+    # type: () -> None
+    from selfquantifier.transactions.parse import content_type_signatures
+
+    content_types = sniffed_content_types(
+        content_type_signatures,
+        os.path.join(package_path, "transactions", "parsers"),
+    )
+    expected_content_types_by_folder = {
+        "fi/nordea/personal": "exported-transaction-file/nordea.fi.natbanken-privat.xls",
+        "ee/lhv": "exported-transaction-file/lhv.ee.account-statement.csv",
+        "se/danskebank/personal": "exported-transaction-file/danskebank.se.csv",
+        "international/nordea/netbank": "exported-transaction-file/nordea.netbank.csv",
+        "international/n26": "exported-transaction-file/n26.com.csv",
+        "international/revolut/legacy": "exported-transaction-file/revolut.com.legacy.csv",
+        "international/revolut": "exported-transaction-file/revolut.com.csv",
+        "international/xolo": "exported-transaction-file/xolo.io.expenses.csv",
+        # spreadsheets are not sniffed
+        "se/nordea/personal/internetbanken_privat": None,
+        "se/banknorwegian": None,
+    }
+    assert len(content_types) > 20
+    for path, content_type in content_types.items():
+        folder = os.path.dirname(os.path.dirname(path))
+        assert content_type == expected_content_types_by_folder[folder], path
+
+
+def test_sniff_location_history_file_content_types(tmp_path):
+    # type: (...) -> None
+    from selfquantifier.location_history.parse import content_type_signatures
+
+    folder_path = os.path.join(package_path, "location_history", "parsers")
+    assert sniffed_content_types(content_type_signatures, folder_path) == {
+        "exiftool/test_data/dropbox-camera-uploads.edited.csv": (
+            "exported-location-history-file/exiftool-output.csv"
+        ),
+        "google/takeout/test_data/Location History.edited.json": (
+            "exported-location-history-file/google-takeout.location-history.json"
+        ),
+    }
+
+    # sniffed content types are cached in the fingerprint index
+    path = str(tmp_path / "Location History.json")
+    with open(path, "w") as f:
+        f.write('{"locations": []}')
+    sniffer = ContentTypeSniffer(content_type_signatures)
+    index = FileFingerprintIndex()
+    assert sniffer.sniff_file(path, index, os.stat(path)) == (
+        "exported-location-history-file/google-takeout.location-history.json"
+    )
+    sniffer.sniff = None
+    assert sniffer.sniff_file(path, index, os.stat(path)) == (
+        "exported-location-history-file/google-takeout.location-history.json"
+    )
+    # without counting as hits or misses of the file digests
+    assert index.counters() == {"hits": 0, "misses": 0, "entries": 1}
+
+
+def test_fill_missing_content_types():
+    # type: () -> None
+    sniffed_files_df = pd.DataFrame(
+        {
+            "File path": ["@/Transactions"] * 3,
+            "File name": ["a.csv", "b.csv", "c.csv"],
+            "Content type": ["sniffed/a", "sniffed/b", None],
+        }
+    )
+    df = pd.DataFrame(
+        {
+            "File path": ["@/Transactions"] * 3,
+            "File name": ["a.csv", "b.csv", "c.csv"],
+            "Content type": ["edited/a", None, None],
+        }
+    )
+    assert list(fill_missing_content_types(df, sniffed_files_df)["Content type"]) == [
+        "edited/a",
+        "sniffed/b",
+        None,
+    ]
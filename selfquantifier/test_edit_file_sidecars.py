@@ -0,0 +1,127 @@
+import os
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+from selfquantifier.edit_file_sidecars import (
+    move_edit_file,
+    read_edit_file,
+    read_edit_files,
+    sidecar_path,
+    store_written_edit_file,
+)
+
+
+def example_df():
+    return pd.DataFrame(
+        {
+            "File name": ["a.csv", "b.csv", "", "ä\nb", None],
+            "Ignore": [None, 1, 0, None, None],
+            "Amount": [1.5, -12.34, 0.1 + 0.2, np.nan, 3.0],
+            "Count": [1, 2, 3, 4, 5],
+            "Flag": [True, False, True, False, True],
+            "Date": pd.to_datetime(
+                ["2020-01-01", "2020-01-02 10:11:12", None, "2021-05-05", "2021-05-05"]
+            ),
+            "Day": [date(2020, 1, 1)] * 5,
+            "Month": pd.Series(pd.to_datetime(["2020-01-01"] * 5)).dt.to_period("M"),
+            "File metadata": [{"size": 1, "sha1": "da39a3ee"}] * 5,
+            "Numeric string": ["123", "0012", "1e5", "12,5", " 7"],
+            "Mixed": [1, "a", 2.5, None, True],
+            "Empty": [None] * 5,
+            "History reference": ["1bd9", "00e1", "1e10", "abcd", "ffff"],
+            "Floats": [1 / 3, 2 / 3, 1e-20, 123456789.123456789, -0.0],
+        }
+    )
+
+
+def test_edit_files_are_read_from_sidecars_until_edited(tmp_path, monkeypatch):
+    # type: (...) -> None
+    xlsx_path = str(tmp_path / "Transactions.xlsx")
+    df = example_df()
+    df.to_excel(xlsx_path, index=False, engine="xlsxwriter")
+    expected = pd.read_excel(xlsx_path)
+    pd.testing.assert_frame_equal(store_written_edit_file(xlsx_path), expected)
+    assert os.path.isfile(sidecar_path(xlsx_path))
+
+    read_excel = pd.read_excel
+    parsed = []
+
+    def counting_read_excel(*args, **kwargs):
+        parsed.append(args)
+        return read_excel(*args, **kwargs)
+
+    monkeypatch.setattr(pd, "read_excel", counting_read_excel)
+    pd.testing.assert_frame_equal(read_edit_file(xlsx_path), expected)
+    # columns are loaded selectively, missing ones are left out
+    pd.testing.assert_frame_equal(
+        read_edit_file(xlsx_path, columns=["Ignore", "File name", "Missing"]),
+        expected[["File name", "Ignore"]],
+    )
+    # touched but not changed
+    os.utime(xlsx_path, ns=(0, 0))
+    pd.testing.assert_frame_equal(read_edit_file(xlsx_path), expected)
+    assert parsed == []
+
+    # the sidecar moves along with the edit file
+    os.makedirs(str(tmp_path / "Archive"))
+    archived_xlsx_path = str(tmp_path / "Archive" / "Transactions.xlsx")
+    move_edit_file(xlsx_path, archived_xlsx_path)
+    assert not os.path.isfile(sidecar_path(xlsx_path))
+    pd.testing.assert_frame_equal(read_edit_file(archived_xlsx_path), expected)
+    assert parsed == []
+
+    # edited by a person
+    edited_df = expected.copy()
+    edited_df.loc[0, "Ignore"] = 1
+    edited_df.to_excel(archived_xlsx_path, index=False, engine="openpyxl")
+    pd.testing.assert_frame_equal(read_edit_file(archived_xlsx_path), edited_df)
+    assert len(parsed) == 1
+    read_edit_file(archived_xlsx_path)
+    assert len(parsed) == 1
+
+
+def test_read_edit_files_in_parallel_in_order(tmp_path):
+    # type: (...) -> None
+    xlsx_paths = []
+    for number in range(4):
+        xlsx_path = str(tmp_path / ("Transactions.gsheets.%s.xlsx" % number))
+        df = pd.DataFrame({"File name": ["%s.csv" % number], "Ignore": [number]})
+        df.to_excel(xlsx_path, index=False, engine="xlsxwriter")
+        # only some of the edit files have been read before
+        if number % 2 == 0:
+            store_written_edit_file(xlsx_path)
+        xlsx_paths.append(xlsx_path)
+
+    dfs = read_edit_files(xlsx_paths, columns=["Ignore"], workers=2)
+    assert [df["Ignore"].tolist() for df in dfs] == [[0], [1], [2], [3]]
+    assert [list(df.columns) for df in dfs] == [["Ignore"]] * 4
+    # and have sidecars from now on
+    assert all(os.path.isfile(sidecar_path(xlsx_path)) for xlsx_path in xlsx_paths)
+
+
+def test_sidecars_that_were_not_written_here_are_not_loaded(tmp_path, monkeypatch):
+    # type: (...) -> None
+    import pickle
+
+    from selfquantifier import edit_file_sidecars
+
+    xlsx_path = str(tmp_path / "Transactions.xlsx")
+    df = pd.DataFrame({"File name": ["a.csv"], "Ignore": [1]})
+    df.to_excel(xlsx_path, index=False, engine="xlsxwriter")
+    store_written_edit_file(xlsx_path)
+    assert read_edit_file(xlsx_path)["Ignore"].tolist() == [1]
+
+    # a sidecar with another payload (or written with another key) is ignored
+    with open(sidecar_path(xlsx_path), "rb") as f:
+        header = f.readline()
+        digest = f.read(32)
+    with open(sidecar_path(xlsx_path), "wb") as f:
+        f.write(header + digest + pickle.dumps({"columns": []}))
+    assert read_edit_file(xlsx_path)["Ignore"].tolist() == [1]
+    monkeypatch.setattr(edit_file_sidecars, "_sidecar_keys", {})
+    monkeypatch.setattr(
+        edit_file_sidecars, "sidecar_key_path", str(tmp_path / "other.key")
+    )
+    assert edit_file_sidecars.read_sidecar(xlsx_path) is None
@@ -0,0 +1,107 @@
+import pandas as pd
+
+from selfquantifier.edit_journal import (
+    EditJournal,
+    apply_edit_journal,
+    journal_edit_files,
+)
+
+
+def transaction_files_df(ignore):
+    return pd.DataFrame(
+        {
+            "File name": ["a.csv", "b.csv", "c.csv"],
+            "File path": ["@/Transactions"] * 3,
+            "Ignore": ignore,
+            "File metadata": ["{}"] * 3,
+        }
+    )
+
+
+def test_journal_edit_files(tmp_path):
+    # type: (...) -> None
+    edit_journal = EditJournal(str(tmp_path / ".journal"), "transaction_files")
+
+    def journaled(edits_dfs):
+        return journal_edit_files(
+            current_commit_df=transaction_files_df([None] * 3),
+            edits_dfs=edits_dfs,
+            record_type="transaction_files",
+            editable_columns=["Ignore", "Comment"],
+            edit_journal=edit_journal,
+            selfquantifier_input_folder_path=None,
+            history_reference="1bd9",
+        )
+
+    # only the changed cell is journaled, rows of records that are gone are not
+    edits_df = pd.concat(
+        [
+            transaction_files_df([1, None, None]),
+            pd.DataFrame(
+                {
+                    "File name": ["gone.csv"],
+                    "File path": ["@/Transactions"],
+                    "Ignore": [1],
+                }
+            ),
+        ]
+    )
+    df = journaled([("1bd9", edits_df)])
+    assert df["Ignore"].tolist() == [1, None, None]
+    assert df["Comment"].isnull().all()
+    assert edit_journal.entries().to_dict("records") == [
+        {
+            "path": "@/Transactions/a.csv",
+            "id": None,
+            "column": "Ignore",
+            "value": 1,
+            "history_reference": "1bd9",
+        }
+    ]
+
+    # the journal is applied to data parsed later on
+    df = journaled([])
+    assert df["Ignore"].tolist() == [1, None, None]
+
+    # later edit files win, unchanged cells are not journaled again
+    df = journaled(
+        [
+            ("1bd9", transaction_files_df([1, 1, None])),
+            ("1bd9", transaction_files_df([None, 1, None])),
+        ]
+    )
+    assert df["Ignore"].tolist() == [None, 1, None]
+    assert len(edit_journal.entries()) == 3
+
+    assert edit_journal.compact() == 2
+    assert len(edit_journal.entries()) == 2
+    df = apply_edit_journal(
+        transaction_files_df([None] * 3),
+        "transaction_files",
+        ["Ignore"],
+        edit_journal,
+        None,
+        "1bd9",
+    )
+    assert df["Ignore"].tolist() == [None, 1, None]
+
+
+def test_journal_is_compacted_beyond_the_threshold(tmp_path, monkeypatch):
+    # type: (...) -> None
+    from selfquantifier import edit_journal as edit_journal_module
+
+    monkeypatch.setattr(edit_journal_module, "journal_compaction_threshold", 2)
+    entry = {
+        "path": "@/Transactions/a.csv",
+        "id": None,
+        "column": "Ignore",
+        "value": 1,
+        "history_reference": "1bd9",
+    }
+    EditJournal(str(tmp_path), "transaction_files").append([entry, entry])
+    edit_journal = EditJournal(str(tmp_path), "transaction_files")
+    assert not (tmp_path / "transaction_files.snapshot.jsonl").exists()
+    # the entries journaled by earlier instances count too
+    edit_journal.append([{**entry, "value": 0}])
+    assert not (tmp_path / "transaction_files.jsonl").exists()
+    assert edit_journal.entries()["value"].tolist() == [0]
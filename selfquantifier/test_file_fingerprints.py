@@ -0,0 +1,228 @@
+import hashlib
+import os
+
+from selfquantifier.file_fingerprints import FileFingerprintIndex
+from selfquantifier.utils import list_files_in_folder
+
+
+def file_hexdigest(path, hasher):
+    with open(path, "rb") as f:
+        return hasher(f.read()).hexdigest()
+
+
+def write_test_files(folder_path):
+    os.makedirs(os.path.join(folder_path, "sub"))
+    with open(os.path.join(folder_path, "a.csv"), "w") as f:
+        f.write("foo,bar\n1,2\n")
+    with open(os.path.join(folder_path, "sub", "b.csv"), "w") as f:
+        f.write("zoo,zar\n3,4\n")
+
+
+def test_list_files_in_folder_reuses_fingerprints_of_unchanged_files(tmp_path):
+    # type: (...) -> None
+    write_test_files(str(tmp_path / "Input"))
+    index_file_path = str(tmp_path / "file-fingerprints.json")
+
+    index = FileFingerprintIndex(index_file_path)
+    first = list_files_in_folder(str(tmp_path / "Input"), file_fingerprint_index=index)
+    assert index.counters() == {"hits": 0, "misses": 2, "entries": 2}
+
+    # a fresh index instance reads the persisted fingerprints
+    index = FileFingerprintIndex(index_file_path)
+    second = list_files_in_folder(str(tmp_path / "Input"), file_fingerprint_index=index)
+    assert index.counters() == {"hits": 2, "misses": 0, "entries": 2}
+    assert second == first
+
+
+def test_list_files_in_folder_rehashes_changed_files(tmp_path):
+    # type: (...) -> None
+    write_test_files(str(tmp_path / "Input"))
+    index = FileFingerprintIndex(str(tmp_path / "file-fingerprints.json"))
+    list_files_in_folder(str(tmp_path / "Input"), file_fingerprint_index=index)
+
+    with open(str(tmp_path / "Input" / "a.csv"), "a") as f:
+        f.write("5,6\n")
+    index.reset_counters()
+    files = list_files_in_folder(str(tmp_path / "Input"), file_fingerprint_index=index)
+    assert index.counters()["hits"] == 1
+    assert index.counters()["misses"] == 1
+
+    uncached_files = list_files_in_folder(str(tmp_path / "Input"))
+    assert files == uncached_files
+
+
+def test_hash_file_matches_separately_computed_digests(tmp_path):
+    # type: (...) -> None
+    from imohash import hashfile
+
+    from selfquantifier.file_fingerprints import hash_file
+
+    # below the imohash sample threshold, above it and above the full hash threshold
+    for size in [0, 1000, 300 * 1024, 2 * 1024 * 1024]:
+        path = str(tmp_path / ("%s.bin" % size))
+        with open(path, "wb") as f:
+            f.write(os.urandom(size))
+        digests = hash_file(path, size)
+        assert digests["size"] == size
+        assert digests["imohash"] == hashfile(path, hexdigest=True)
+        if size < 1024 * 1024:
+            assert digests["sha1sum"] == file_hexdigest(path, hashlib.sha1)
+            assert digests["sha256sum"] == file_hexdigest(path, hashlib.sha256)
+        else:
+            assert digests["sha1sum"] is False
+            assert digests["sha256sum"] is False
+
+
+def test_list_files_in_folder_with_change_detection_digests_only(tmp_path):
+    # type: (...) -> None
+    from selfquantifier.file_fingerprints import change_detection_file_digests
+
+    write_test_files(str(tmp_path / "Input"))
+    index = FileFingerprintIndex(str(tmp_path / "file-fingerprints.json"))
+    files = list_files_in_folder(
+        str(tmp_path / "Input"),
+        file_fingerprint_index=index,
+        digests=change_detection_file_digests,
+    )
+    assert all(file["File metadata"]["sha256sum"] is False for file in files)
+    assert all(file["File metadata"]["imohash"] for file in files)
+
+    # fingerprints without the cryptographic digests do not satisfy a full run
+    index.reset_counters()
+    files = list_files_in_folder(str(tmp_path / "Input"), file_fingerprint_index=index)
+    assert index.counters()["misses"] == 2
+    assert all(file["File metadata"]["sha256sum"] for file in files)
+
+
+def test_list_files_in_folder_parallel_hashing_keeps_walk_order(tmp_path):
+    # type: (...) -> None
+    for folder_number in range(5):
+        folder_path = tmp_path / "Input" / ("folder %s" % folder_number)
+        os.makedirs(str(folder_path))
+        for file_number in range(20):
+            with open(str(folder_path / ("%s.csv" % file_number)), "wb") as f:
+                f.write(os.urandom(1000 + file_number))
+
+    sequential = list_files_in_folder(str(tmp_path / "Input"), hash_workers=1)
+    parallel = list_files_in_folder(str(tmp_path / "Input"), hash_workers=8)
+    assert len(parallel) == 100
+    assert parallel == sequential
+
+
+def test_list_files_in_clerk_subfolder_builds_df_in_chunks(tmp_path):
+    # type: (...) -> None
+    from selfquantifier.utils import (
+        files_df_from_records,
+        iter_files_in_folder,
+        list_files_in_clerk_subfolder,
+    )
+
+    write_test_files(str(tmp_path / "Input"))
+    for file_number in range(5):
+        with open(str(tmp_path / "Input" / ("%s.txt" % file_number)), "w") as f:
+            f.write("%s\n" % file_number)
+    with open(str(tmp_path / "Input" / "foo_editable_data.csv"), "w") as f:
+        f.write("Ignore\n")
+
+    df = list_files_in_clerk_subfolder(str(tmp_path / "Input"), str(tmp_path))
+    assert len(df) == 7
+    assert "foo_editable_data.csv" not in df["File name"].values
+    assert set(df["File path"]) == {"@/Input", "@/Input/sub"}
+
+    chunked_df = files_df_from_records(
+        iter_files_in_folder(
+            str(tmp_path / "Input"), selfquantifier_folder_path=str(tmp_path)
+        ),
+        chunk_size=3,
+    )
+    assert chunked_df.equals(df)
+    assert len(files_df_from_records(iter([]))) == 0
+
+
+def test_git_index_fingerprints_are_used_for_unchanged_tracked_files(tmp_path):
+    # type: (...) -> None
+    import subprocess
+
+    from selfquantifier.file_fingerprints import (
+        git_file_digests,
+        git_index_fingerprints,
+    )
+    from selfquantifier.utils import (
+        add_all_untracked_and_changed_files,
+        ensure_selfquantifier_folder_versioning,
+        list_files_in_clerk_input_subfolder,
+        selfquantifier_input_file_path,
+    )
+
+    input_folder_path = str(tmp_path / "Input")
+    write_test_files(input_folder_path)
+    repo = ensure_selfquantifier_folder_versioning(input_folder_path)
+    add_all_untracked_and_changed_files(repo)
+
+    git_index = git_index_fingerprints(input_folder_path)
+    assert git_index.lookup(
+        os.path.join(input_folder_path, "a.csv"),
+        os.stat(os.path.join(input_folder_path, "a.csv")),
+    )
+    assert git_index.counters()["entries"] == 2
+
+    # a modified and an untracked file are hashed in python
+    with open(os.path.join(input_folder_path, "a.csv"), "a") as f:
+        f.write("5,6\n")
+    with open(os.path.join(input_folder_path, "c.csv"), "w") as f:
+        f.write("new\n")
+
+    df = list_files_in_clerk_input_subfolder(
+        input_folder_path,
+        selfquantifier_input_folder_path=input_folder_path,
+        file_fingerprint_index=False,
+        digests=git_file_digests,
+    )
+    assert len(df) == 3
+    for _, file in df.iterrows():
+        expected_gitsha1 = subprocess.run(
+            [
+                "git",
+                "hash-object",
+                selfquantifier_input_file_path(input_folder_path, file),
+            ],
+            check=True,
+            capture_output=True,
+        ).stdout.decode()
+        assert file["File metadata"]["gitsha1"] == expected_gitsha1.strip()
+        assert file["File metadata"]["sha256sum"] is False
+
+
+def test_large_files_are_fully_hashed_inline_or_in_the_background(tmp_path):
+    # type: (...) -> None
+    from selfquantifier.file_fingerprints import background_full_hasher, hash_file_fully
+
+    os.makedirs(str(tmp_path / "Input"))
+    path = str(tmp_path / "Input" / "large.json")
+    with open(path, "wb") as f:
+        f.write(os.urandom(3 * 1024 * 1024))
+    assert hash_file_fully(path) == {
+        "sha1sum": file_hexdigest(path, hashlib.sha1),
+        "sha256sum": file_hexdigest(path, hashlib.sha256),
+    }
+
+    (inline,) = list_files_in_folder(
+        str(tmp_path / "Input"), full_hash_large_files="inline"
+    )
+    assert inline["File metadata"]["sha256sum"] == file_hexdigest(path, hashlib.sha256)
+
+    index = FileFingerprintIndex(str(tmp_path / "file-fingerprints.json"))
+    (sampled,) = list_files_in_folder(
+        str(tmp_path / "Input"),
+        file_fingerprint_index=index,
+        full_hash_large_files="background",
+    )
+    assert sampled["File metadata"]["sha256sum"] is False
+    background_full_hasher(index).wait()
+
+    # the next run picks up the digests stored by the background workers
+    index = FileFingerprintIndex(str(tmp_path / "file-fingerprints.json"))
+    assert list_files_in_folder(
+        str(tmp_path / "Input"), file_fingerprint_index=index
+    ) == [inline]
+    assert index.counters()["hits"] == 1
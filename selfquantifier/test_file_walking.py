@@ -0,0 +1,77 @@
+import os
+
+from selfquantifier.file_walking import IgnoreRules, walk_files
+
+
+def write_file(path, contents=""):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        f.write(contents)
+
+
+def walked_relative_paths(folder_path, **kwargs):
+    return [
+        os.path.relpath(entry.path, folder_path)
+        for _, entry in walk_files(folder_path, **kwargs)
+    ]
+
+
+def test_ignore_rules():
+    # type: () -> None
+    rules = IgnoreRules(
+        ["# comment", "", "*.tmp", "/build/", "docs/*.md", "**/cache", "!keep.tmp"]
+    )
+    assert rules.match("foo.tmp", False) is True
+    assert rules.match("a/b/foo.tmp", False) is True
+    assert rules.match("keep.tmp", False) is False
+    assert rules.match("foo.txt", False) is None
+    assert rules.match("build", True) is True
+    assert rules.match("build", False) is None
+    assert rules.match("a/build", True) is None
+    assert rules.match("docs/readme.md", False) is True
+    assert rules.match("a/docs/readme.md", False) is None
+    assert rules.match("a/b/cache", True) is True
+
+
+def test_walk_files_prunes_ignored_folders(tmp_path):
+    # type: (...) -> None
+    folder_path = str(tmp_path / "Input")
+    write_file(os.path.join(folder_path, "b.csv"))
+    write_file(os.path.join(folder_path, "a.csv"))
+    write_file(os.path.join(folder_path, ".DS_Store"))
+    write_file(os.path.join(folder_path, ".~lock.a.csv#"))
+    write_file(os.path.join(folder_path, ".git", "HEAD"))
+    write_file(os.path.join(folder_path, "Photos", "1.jpg"))
+    write_file(os.path.join(folder_path, "Photos", ".thumbnails", "1.jpg"))
+    write_file(os.path.join(folder_path, "app", "node_modules", "x", "index.js"))
+    write_file(os.path.join(folder_path, "app", "main.js"))
+
+    assert walked_relative_paths(folder_path) == [
+        "a.csv",
+        "b.csv",
+        os.path.join("Photos", "1.jpg"),
+        os.path.join("app", "main.js"),
+    ]
+
+
+def test_walk_files_applies_selfquantifierignore_files(tmp_path):
+    # type: (...) -> None
+    root_path = str(tmp_path)
+    folder_path = os.path.join(root_path, "Input", "Transactions")
+    write_file(os.path.join(root_path, ".selfquantifierignore"), "*.pdf\n")
+    write_file(os.path.join(folder_path, "a.csv"))
+    write_file(os.path.join(folder_path, "a.pdf"))
+    write_file(os.path.join(folder_path, "Old", "b.csv"))
+    write_file(os.path.join(folder_path, "Keep", ".selfquantifierignore"), "!*.pdf\n")
+    write_file(os.path.join(folder_path, "Keep", "c.pdf"))
+    write_file(os.path.join(folder_path, ".selfquantifierignore"), "/Old/\n")
+
+    assert walked_relative_paths(folder_path, ignore_root_path=root_path) == [
+        "a.csv",
+        os.path.join("Keep", "c.pdf"),
+    ]
+    assert walked_relative_paths(folder_path) == [
+        "a.csv",
+        "a.pdf",
+        os.path.join("Keep", "c.pdf"),
+    ]
@@ -0,0 +1,124 @@
+import os
+
+from selfquantifier.commit_index import default_commit_index
+from selfquantifier.history_compaction import (
+    compact_automation_commits,
+    history_references_in_edits_folder,
+)
+from selfquantifier.utils import (
+    add_all_untracked_and_changed_files,
+    changes_between_two_commits,
+    commit_datetime_from_history_reference,
+    commits_by_short_gitsha1,
+    ensure_selfquantifier_folder_versioning,
+    short_gitsha1,
+)
+
+
+def test_compact_automation_commits(tmp_path):
+    # type: (...) -> None
+    repo_path = str(tmp_path / "Input")
+    repo = ensure_selfquantifier_folder_versioning(repo_path)
+    shas = []
+    for number in range(8):
+        with open(os.path.join(repo_path, "%s.csv" % (number % 3)), "w") as f:
+            f.write("%s\n" % number)
+        add_all_untracked_and_changed_files(repo)
+        shas.append(repo.head.object.hexsha)
+    head = repo.head.object.hexsha
+
+    edits_folder_path = str(tmp_path / "Edits")
+    referenced = [shas[1], shas[4]]
+    os.makedirs(
+        os.path.join(
+            edits_folder_path, "2020-01-01 0000 (%s)" % short_gitsha1(repo, shas[1])
+        )
+    )
+    os.makedirs(
+        os.path.join(
+            edits_folder_path,
+            "Archive",
+            "2020-01-02 0000 (%s)" % short_gitsha1(repo, shas[4]),
+            "Archived 2020-01-03 000000",
+        )
+    )
+    history_references = history_references_in_edits_folder(edits_folder_path)
+    assert history_references == {short_gitsha1(repo, sha) for sha in referenced}
+    diff_before = repo.git.diff(shas[1], head)
+    commits_before = commits_by_short_gitsha1(repo_path, repo)
+    assert len(commits_before) == 9
+
+    assert compact_automation_commits(repo_path, history_references, dry_run=True) == 5
+    assert len(repo.git.log("--format=%H").splitlines()) == 9
+    assert compact_automation_commits(repo_path, history_references) == 5
+
+    # the initial commit, the referenced commits and HEAD are kept as they are
+    assert repo.git.log("--format=%H").splitlines() == [
+        head,
+        shas[4],
+        shas[1],
+        repo.git.rev_list("--max-parents=0", "HEAD"),
+    ]
+    assert repo.head.object.hexsha == head
+    assert repo.git.diff(shas[1], head) == diff_before
+    commits = commits_by_short_gitsha1(repo_path, repo)
+    assert len(commits) == 4
+    for history_reference in history_references:
+        assert commit_datetime_from_history_reference(
+            history_reference, commits
+        ) == commit_datetime_from_history_reference(history_reference, commits_before)
+    old_to_new_paths, old_now_deleted_paths, _ = changes_between_two_commits(
+        repo_path, shas[1], head
+    )
+    assert old_to_new_paths == {} and old_now_deleted_paths == {}
+
+    # compacting again does nothing, new automation commits are compacted as well
+    assert compact_automation_commits(repo_path, history_references) == 0
+    for number in range(2):
+        with open(os.path.join(repo_path, "new.csv"), "w") as f:
+            f.write("%s\n" % number)
+        add_all_untracked_and_changed_files(repo)
+    assert compact_automation_commits(repo_path, history_references) == 2
+    assert len(default_commit_index(repo_path).commits_by_short_gitsha1()) == 4
+
+    # git gc keeps the hidden commits, which the kept commits still point to
+    repo.git.gc("--prune=now")
+    assert len(repo.git.log("--format=%H").splitlines()) == 4
+    for ref in repo.git.for_each_ref("--format=%(refname)", "refs/replace/").split():
+        repo.git.update_ref("-d", ref)
+    assert len(repo.git.log("--format=%H").splitlines()) == 11
+
+
+def test_history_references_of_edit_files_and_the_journal_are_found(tmp_path):
+    # type: (...) -> None
+    import json
+
+    import pandas as pd
+
+    edits_folder_path = str(tmp_path / "Edits")
+    edit_folder_path = os.path.join(edits_folder_path, "2020-01-01 0000 (1bd9)")
+    os.makedirs(edit_folder_path)
+    pd.DataFrame(
+        {
+            "File name": ["a.csv", "b.csv", "c.csv"],
+            "History reference": ["00e1", "1234", None],
+            "Source transaction file: History reference": ["1e10", "abcd", "x"],
+        }
+    ).to_excel(
+        os.path.join(edit_folder_path, "Transactions.xlsx"),
+        index=False,
+        engine="xlsxwriter",
+    )
+    os.makedirs(os.path.join(edits_folder_path, ".journal"))
+    with open(
+        os.path.join(edits_folder_path, ".journal", "transactions.jsonl"), "w"
+    ) as f:
+        f.write(json.dumps({"history_reference": "ffff"}) + "\n")
+    assert history_references_in_edits_folder(edits_folder_path) == {
+        "1bd9",
+        "00e1",
+        "1234",
+        "1e10",
+        "abcd",
+        "ffff",
+    }
@@ -0,0 +1,56 @@
+import os
+
+import pytest
+
+from selfquantifier.input_folder_watcher import InputFolderWatcher, inotify_available
+from selfquantifier.utils import files_df_from_records, list_files_in_clerk_subfolder
+
+
+def write_file(path, contents=""):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        f.write(contents)
+
+
+@pytest.mark.skipif(not inotify_available(), reason="inotify is not available")
+def test_input_folder_watcher_only_rehashes_touched_files(tmp_path):
+    # type: (...) -> None
+    root_path = str(tmp_path)
+    folder_path = os.path.join(root_path, "Input", "Transactions")
+    write_file(os.path.join(folder_path, "a.csv"), "a\n")
+    write_file(os.path.join(folder_path, "b", "c.csv"), "c\n")
+    write_file(os.path.join(folder_path, "b c", "d.csv"), "d\n")
+
+    def assert_same_as_walk(records):
+        assert files_df_from_records(records).equals(
+            list_files_in_clerk_subfolder(folder_path, root_path)
+        )
+
+    watcher = InputFolderWatcher(folder_path, root_path).start()
+    try:
+        assert_same_as_walk(watcher.records())
+        assert (watcher.walks, watcher.rehashed) == (1, 3)
+
+        # unchanged folders are answered from memory
+        assert_same_as_walk(watcher.records())
+        assert (watcher.walks, watcher.rehashed) == (1, 3)
+
+        write_file(os.path.join(folder_path, "a.csv"), "changed\n")
+        write_file(os.path.join(folder_path, "b", "e.csv"), "e\n")
+        write_file(os.path.join(folder_path, "b", "e.DS_Store"))
+        os.remove(os.path.join(folder_path, "b c", "d.csv"))
+        assert_same_as_walk(watcher.records())
+        assert (watcher.walks, watcher.rehashed) == (1, 5)
+
+        # new folders are walked again, reusing the fingerprints of unchanged files
+        write_file(os.path.join(folder_path, "new", "f.csv"), "f\n")
+        write_file(os.path.join(folder_path, ".selfquantifierignore"), "/b/\n")
+        assert_same_as_walk(watcher.records())
+        assert (watcher.walks, watcher.rehashed) == (2, 6)
+
+        # files in folders that were created after the walk are picked up too
+        write_file(os.path.join(folder_path, "new", "g.csv"), "g\n")
+        assert_same_as_walk(watcher.records())
+        assert (watcher.walks, watcher.rehashed) == (2, 7)
+    finally:
+        watcher.stop()
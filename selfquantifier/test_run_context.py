@@ -0,0 +1,96 @@
+import os
+
+import pandas as pd
+
+from selfquantifier.run_context import RunContext
+from selfquantifier.utils import (
+    add_all_untracked_and_changed_files,
+    current_gitsha1,
+    ensure_selfquantifier_folder_versioning,
+)
+
+
+def test_run_context_reads_repository_state_once(tmp_path):
+    # type: (...) -> None
+    repo_path = str(tmp_path / "Input")
+    repo = ensure_selfquantifier_folder_versioning(repo_path)
+    edit_file_listings = []
+
+    def list_edit_files_in_edits_folder(commits):
+        edit_file_listings.append(commits())
+        return []
+
+    history_references = []
+
+    def current_history_reference():
+        history_references.append(current_gitsha1(repo))
+        return history_references[-1]
+
+    run_context = RunContext(
+        repo_path, repo, list_edit_files_in_edits_folder, current_history_reference
+    )
+    head = run_context.history_reference()
+    commit_datetime = run_context.commit_datetime()
+    for _ in range(3):
+        assert run_context.history_reference() == head
+        assert run_context.commit_datetime() == commit_datetime
+        run_context.edit_files()
+    assert history_references == [head]
+    assert len(edit_file_listings) == 1
+    assert len(edit_file_listings[0]) == 1
+
+    # edit files are listed again once they have changed
+    run_context.forget_edit_files()
+    run_context.edit_files()
+    assert len(edit_file_listings) == 2
+
+    # and the repository state is read again after acknowledging changes, while
+    # the edit files are kept
+    with open(os.path.join(repo_path, "foo.csv"), "w") as f:
+        f.write("foo\n")
+    add_all_untracked_and_changed_files(repo)
+    run_context.refresh()
+    assert run_context.history_reference() != head
+    assert len(run_context.commits()) == 2
+    run_context.edit_files()
+    assert len(edit_file_listings) == 2
+
+
+def test_run_context_keeps_the_edit_files_current(tmp_path):
+    # type: (...) -> None
+    repo_path = str(tmp_path / "Input")
+    repo = ensure_selfquantifier_folder_versioning(repo_path)
+    head = current_gitsha1(repo)
+
+    def list_edit_files_in_edits_folder():
+        return pd.DataFrame()
+
+    run_context = RunContext(repo_path, repo, list_edit_files_in_edits_folder)
+    assert len(run_context.edit_files()) == 0
+    folder_path = "@/Edits/2021-01-01 0000 (%s)" % head
+    for _ in range(2):
+        run_context.add_edit_file(folder_path, "Transaction files.xlsx", head)
+    run_context.add_edit_file(folder_path, "Transactions.xlsx", head)
+    edit_files_df = run_context.edit_files()
+    assert edit_files_df["File name"].tolist() == [
+        "Transaction files.xlsx",
+        "Transactions.xlsx",
+    ]
+    assert edit_files_df["Related history reference date"].notnull().all()
+
+    run_context.remove_edit_files(edit_files_df[:1])
+    assert run_context.edit_files()["File name"].tolist() == ["Transactions.xlsx"]
+
+
+def test_run_context_looks_up_commits_only_when_listing_needs_them(tmp_path):
+    # type: (...) -> None
+    repo_path = str(tmp_path / "Input")
+    repo = ensure_selfquantifier_folder_versioning(repo_path)
+
+    def list_edit_files_in_edits_folder(commits=None):
+        return pd.DataFrame()
+
+    run_context = RunContext(repo_path, repo, list_edit_files_in_edits_folder)
+    assert len(run_context.edit_files()) == 0
+    assert run_context._commits is None
+    assert len(run_context.commits()) == 1
@@ -0,0 +1,464 @@
+import os
+
+from selfquantifier.utils import (
+    add_all_untracked_and_changed_files,
+    add_untracked_and_changed_files_in_subfolders,
+    changes_between_two_commits,
+    enable_git_status_caches,
+    ensure_selfquantifier_folder_versioning,
+)
+
+
+def test_changes_between_two_commits(tmp_path):
+    # type: (...) -> None
+    repo_path = str(tmp_path / "Input")
+    repo = ensure_selfquantifier_folder_versioning(repo_path)
+    os.makedirs(os.path.join(repo_path, "Transactions"))
+    for file_name in ["Transactions/a.csv", "Transactions/b.csv", "c.csv"]:
+        with open(os.path.join(repo_path, file_name), "w") as f:
+            f.write("%s\n" % file_name * 20)
+    add_all_untracked_and_changed_files(repo)
+    from_commit = repo.head.object.hexsha
+
+    # renamed twice, deleted and added in separate commits
+    os.rename(
+        os.path.join(repo_path, "Transactions/a.csv"),
+        os.path.join(repo_path, "Transactions/ä.csv"),
+    )
+    add_all_untracked_and_changed_files(repo)
+    os.rename(
+        os.path.join(repo_path, "Transactions/ä.csv"),
+        os.path.join(repo_path, "a.csv"),
+    )
+    os.remove(os.path.join(repo_path, "c.csv"))
+    add_all_untracked_and_changed_files(repo)
+    with open(os.path.join(repo_path, "Transactions/d.csv"), "w") as f:
+        f.write("d\n")
+    add_all_untracked_and_changed_files(repo)
+    to_commit = repo.head.object.hexsha
+
+    changes = changes_between_two_commits(repo_path, from_commit, to_commit)
+    old_to_new_paths, old_now_deleted_paths, old_non_existing_now_added_paths = changes
+    assert old_to_new_paths == {"Transactions/a.csv": "a.csv"}
+    assert list(old_now_deleted_paths) == ["c.csv"]
+    assert list(old_non_existing_now_added_paths) == ["Transactions/d.csv"]
+    assert changes_between_two_commits(repo_path, from_commit, to_commit) is changes
+    # from a bounded cache
+    assert changes_between_two_commits.cache_info().maxsize is not None
+
+
+def test_add_untracked_and_changed_files_in_subfolders(tmp_path, monkeypatch):
+    # type: (...) -> None
+    repo_path = str(tmp_path / "Input")
+    repo = ensure_selfquantifier_folder_versioning(repo_path)
+    # the git status caches are only enabled along with scoped staging
+    assert not repo.config_reader().has_option("core", "untrackedCache")
+    enable_git_status_caches(repo)
+    assert repo.config_reader().get_value("core", "untrackedCache") is True
+    for file_name in [
+        "Transactions/a.csv",
+        "Transactions/transaction_files_editable_data.csv",
+        "Receipts/b.pdf",
+    ]:
+        os.makedirs(os.path.dirname(os.path.join(repo_path, file_name)), exist_ok=True)
+        with open(os.path.join(repo_path, file_name), "w") as f:
+            f.write("%s\n" % file_name)
+    os.makedirs(os.path.join(repo_path, "Time Tracking"))
+    initial_commit = repo.head.object.hexsha
+
+    transactions_folder_path = os.path.join(repo_path, "Transactions")
+    assert add_untracked_and_changed_files_in_subfolders(
+        repo, [transactions_folder_path, os.path.join(repo_path, "Time Tracking")]
+    )
+    assert repo.head.object.hexsha != initial_commit
+    assert sorted(repo.git.ls_files().splitlines()) == [
+        "Transactions/a.csv",
+        "Transactions/transaction_files_editable_data.csv",
+    ]
+    # the other subfolders are left untracked
+    assert repo.untracked_files == ["Receipts/b.pdf"]
+
+    # unchanged subfolders do not run git at all
+    head = repo.head.object.hexsha
+    assert not add_untracked_and_changed_files_in_subfolders(
+        repo, [transactions_folder_path]
+    )
+    git = repo.git
+    monkeypatch.setattr(repo, "git", None)
+    assert not add_untracked_and_changed_files_in_subfolders(
+        repo, [transactions_folder_path]
+    )
+    monkeypatch.setattr(repo, "git", git)
+    assert repo.head.object.hexsha == head
+
+    os.remove(os.path.join(transactions_folder_path, "a.csv"))
+    assert add_untracked_and_changed_files_in_subfolders(
+        repo, [transactions_folder_path]
+    )
+    assert repo.git.ls_files().splitlines() == [
+        "Transactions/transaction_files_editable_data.csv"
+    ]
+
+
+def test_merging_earlier_edits_only_merges_the_editable_columns():
+    # type: (...) -> None
+    import pandas as pd
+
+    from selfquantifier.utils import (
+        merge_changes_from_previous_possibly_edited_df,
+        propagate_previous_edits_from_across_columns,
+    )
+
+    current_df = pd.DataFrame(
+        {
+            "File name": ["a.csv", "b.csv", "c.csv"],
+            "File path": ["@/Transactions"] * 3,
+            "Ignore": [None] * 3,
+            "File metadata": ["{}"] * 3,
+        }
+    )
+    previous_df = pd.DataFrame(
+        {
+            "File name": ["b.csv", "a.csv", "gone.csv"],
+            "File path": ["@/Transactions"] * 3,
+            "Ignore": [1, None, 1],
+            "File metadata": ['{"size": 1}'] * 3,
+            "Original data": ["..."] * 3,
+        }
+    )
+    edit_files = pd.DataFrame(
+        {"File name": ["Transaction files.xlsx"], "Related history reference": ["1bd9"]}
+    )
+
+    def merged(editable_columns):
+        df, columns_to_drop, _ = merge_changes_from_previous_possibly_edited_df(
+            accumulating_df=current_df.copy(),
+            previous_possibly_edited_df=previous_df.copy(),
+            edit_file=edit_files.iloc[0],
+            record_type="transaction_files",
+            selfquantifier_input_folder_path=None,
+            current_history_reference=lambda: "1bd9",
+            keep_unmerged_previous_edits=False,
+            editable_columns=editable_columns,
+        )
+        return df, propagate_previous_edits_from_across_columns(
+            df, edit_files, ["Ignore"]
+        ).drop(columns_to_drop, axis=1)
+
+    pruned_df, pruned_result = merged(["Ignore"])
+    full_df, full_result = merged(None)
+    assert "Original data (1bd9 - Transaction files.xlsx)" in full_df.columns
+    assert list(pruned_df.columns) == [
+        *current_df.columns,
+        "File name (1bd9 - Transaction files.xlsx)",
+        "File path (1bd9 - Transaction files.xlsx)",
+        "Ignore (1bd9 - Transaction files.xlsx)",
+        "selfquantifier_path (1bd9 - Transaction files.xlsx)",
+    ]
+    pd.testing.assert_frame_equal(pruned_result, full_result)
+    assert pruned_result["Ignore"].isnull().tolist() == [True, False, True]
+
+
+def test_normalized_joined_paths():
+    # type: (...) -> None
+    import unicodedata
+
+    import pandas as pd
+
+    from selfquantifier.utils import (
+        head_commit_corresponding_paths,
+        normalized_joined_paths,
+    )
+
+    decomposed = unicodedata.normalize("NFD", "Kvitton/Å.pdf")
+    df = pd.DataFrame(
+        {
+            "File path": ["@/Receipts", "@/Receipts", "@/Transactions", None],
+            "File name": [decomposed, "Kvitton/Å.pdf", "a.csv", "b.csv"],
+        }
+    )
+    paths = normalized_joined_paths(df, "File path", "File name")
+    assert paths.tolist() == [
+        "@/Receipts/Kvitton/Å.pdf",
+        "@/Receipts/Kvitton/Å.pdf",
+        "@/Transactions/a.csv",
+        "None/b.csv",
+    ]
+    assert head_commit_corresponding_paths(
+        paths, {"Transactions/a.csv": "Transactions/2020/a.csv"}
+    ).tolist() == [
+        "@/Receipts/Kvitton/Å.pdf",
+        "@/Receipts/Kvitton/Å.pdf",
+        "@/Transactions/2020/a.csv",
+        "None/b.csv",
+    ]
+
+
+def test_id_keys(monkeypatch):
+    # type: (...) -> None
+    import pandas as pd
+    import pytest
+
+    import selfquantifier.utils
+    from selfquantifier.utils import ensure_no_id_key_collisions, id_keys
+
+    ids = pd.Series(['{"ref": {"amount": "1"}, "ord": 1}', None, "b", "b"])
+    keys = id_keys(ids)
+    assert isinstance(keys[0], str) and len(keys[0]) == 32
+    assert pd.isnull(keys[1])
+    assert keys[2] == keys[3] != keys[0]
+    assert id_keys(ids).tolist()[2:] == keys.tolist()[2:]
+    ensure_no_id_key_collisions(ids, keys)
+
+    # collisions are found across the keys of separately parsed ids too
+    monkeypatch.setattr(selfquantifier.utils, "id_key", lambda id: "0" * 32)
+    other_ids = pd.Series(["c"])
+    all_ids = pd.concat([ids[2:], other_ids])
+    ensure_no_id_key_collisions(ids[2:], id_keys(ids[2:]))
+    with pytest.raises(Exception, match="ID key collision between 'b' and 'c'"):
+        ensure_no_id_key_collisions(
+            all_ids, pd.concat([id_keys(ids[2:]), id_keys(other_ids)])
+        )
+
+
+def test_propagate_previous_edits_from_across_columns():
+    # type: (...) -> None
+    import pandas as pd
+
+    from selfquantifier.utils import propagate_previous_edits_from_across_columns
+
+    edit_files = pd.DataFrame(
+        {
+            "File name": ["Transaction files.xlsx"] * 2,
+            "Related history reference": ["1bd9", "2ce0"],
+        }
+    )
+    df = pd.DataFrame(
+        {
+            "Ignore": [None, None, 1],
+            "selfquantifier_path (1bd9 - Transaction files.xlsx)": ["a", "b", None],
+            "Ignore (1bd9 - Transaction files.xlsx)": [1, 1, None],
+            "Comment (1bd9 - Transaction files.xlsx)": ["x", "y", None],
+            "selfquantifier_path (2ce0 - Transaction files.xlsx)": [None, "b", None],
+            "Ignore (2ce0 - Transaction files.xlsx)": [None, None, None],
+        }
+    )
+    df = propagate_previous_edits_from_across_columns(
+        df, edit_files, ["Ignore", "Comment"]
+    )
+    # the last edit file that had a row wins, also where it emptied the cell
+    assert df["Ignore"].tolist()[:2] == [1, None]
+    assert df["Ignore"].tolist()[2] == 1
+    # the column that the later edit file lacks is taken from the earlier one
+    assert df["Comment"].tolist() == ["x", "y", None]
+
+
+def test_merging_earlier_edits_with_provenance():
+    # type: (...) -> None
+    import pandas as pd
+
+    from selfquantifier.utils import (
+        edit_provenance,
+        merge_changes_from_previous_possibly_edited_df,
+        propagate_previous_edits_from_across_columns,
+    )
+
+    current_df = pd.DataFrame(
+        {
+            "File name": ["a.csv", "b.csv"],
+            "File path": ["@/Transactions"] * 2,
+            "Ignore": [None, None],
+        }
+    )
+    previous_df = pd.DataFrame(
+        {
+            "File name": ["b.csv", "gone.csv"],
+            "File path": ["@/Transactions"] * 2,
+            "Ignore": [1, 1],
+            "Original data": ["..."] * 2,
+        }
+    )
+    edit_files = pd.DataFrame(
+        {"File name": ["Transaction files.xlsx"], "Related history reference": ["1bd9"]}
+    )
+    df, columns_to_drop, unmerged_df = merge_changes_from_previous_possibly_edited_df(
+        accumulating_df=current_df.copy(),
+        previous_possibly_edited_df=previous_df.copy(),
+        edit_file=edit_files.iloc[0],
+        record_type="transaction_files",
+        selfquantifier_input_folder_path=None,
+        current_history_reference=lambda: "1bd9",
+        keep_unmerged_previous_edits=False,
+        editable_columns=["Ignore"],
+        provenance=True,
+    )
+    assert len(df) == 2
+    assert unmerged_df.to_dict("records") == [
+        {"File path": "@/Transactions", "File name": "gone.csv", "Ignore": 1}
+    ]
+
+    df, winning_layers = propagate_previous_edits_from_across_columns(
+        df, edit_files, ["Ignore"], provenance=True
+    )
+    df = df.drop(columns_to_drop, axis=1)
+    assert list(df.columns) == list(current_df.columns)
+    assert df["Ignore"].tolist()[1] == 1
+
+    # the layers are keyed by the join columns, not by the row positions
+    edit_layers, edit_layer_files, unmerged_previous_edits = edit_provenance(
+        df.iloc[::-1],
+        "transaction_files",
+        ["Ignore"],
+        winning_layers=winning_layers,
+        edit_layer_files=[None, "1bd9 - Transaction files.xlsx"],
+        unmerged_previous_edits_dfs=[unmerged_df.assign(**{"Edit layer": 1})],
+    )
+    assert edit_layers.loc[("@/Transactions", "a.csv"), "Ignore"] == 0
+    assert edit_layers.loc[("@/Transactions", "b.csv"), "Ignore"] == 1
+    assert edit_layer_files == [None, "1bd9 - Transaction files.xlsx"]
+    assert unmerged_previous_edits["Edit layer"].tolist() == [1]
+
+
+def test_possibly_edited_location_history_by_date_across_commits(tmp_path):
+    # type: (...) -> None
+    import pandas as pd
+
+    from selfquantifier.nb_helpers import init_notebook_and_return_helpers
+    from selfquantifier.utils import current_gitsha1, possibly_edited_df_util
+
+    helpers = init_notebook_and_return_helpers(str(tmp_path))
+    repo_path = helpers["paths"]["selfquantifier_input_folder_path"]
+    repo = ensure_selfquantifier_folder_versioning(repo_path)
+    df = pd.DataFrame(
+        {
+            "date": ["2021-01-01", "2021-01-02"],
+            "ID": ["1", "2"],
+            "Source location history file: File name": ["a.json"] * 2,
+            "Source location history file: File path": ["@/Location History"] * 2,
+            "Comment": [None, None],
+        }
+    )
+
+    def possibly_edited_df(provenance=False):
+        return possibly_edited_df_util(
+            df,
+            "location_history_by_date",
+            ["Comment"],
+            False,
+            helpers["list_edit_files_in_edits_folder"],
+            lambda: current_gitsha1(repo),
+            str(tmp_path / "Edits"),
+            repo_path,
+            repo,
+            provenance=provenance,
+        )
+
+    possibly_edited_df()
+    with open(os.path.join(repo_path, "Location History", "a.json"), "w") as f:
+        f.write("{}\n")
+    add_all_untracked_and_changed_files(repo)
+    # the earlier edit file is merged (and ignored) at the new HEAD
+    assert possibly_edited_df()["date"].tolist() == ["2021-01-01", "2021-01-02"]
+
+    with open(os.path.join(repo_path, "Location History", "a.json"), "w") as f:
+        f.write("[]\n")
+    add_all_untracked_and_changed_files(repo)
+    edited_df, provenance = possibly_edited_df(provenance=True)
+    assert edited_df["date"].tolist() == ["2021-01-01", "2021-01-02"]
+    assert provenance.edit_layers.index.names == [
+        "Source location history file: File path",
+        "Source location history file: File name",
+        "ID",
+    ]
+    assert provenance.edit_layers["Comment"].tolist() == [0, 0]
+    assert len(provenance.unmerged_previous_edits) == 0
+
+
+def journaled_transaction_files(tmp_path):
+    # a possibly_edited_df of transaction files in a repository with an edit journal,
+    # and a function that commits a change to the input folder
+    import pandas as pd
+
+    from selfquantifier.nb_helpers import init_notebook_and_return_helpers
+    from selfquantifier.utils import current_gitsha1, possibly_edited_df_util
+
+    helpers = init_notebook_and_return_helpers(str(tmp_path), edit_journal=True)
+    repo_path = helpers["paths"]["selfquantifier_input_folder_path"]
+    repo = ensure_selfquantifier_folder_versioning(repo_path)
+    df = pd.DataFrame(
+        {
+            "File name": ["a.csv", "b.csv"],
+            "File path": ["@/Transactions"] * 2,
+            "Ignore": [None, None],
+        }
+    )
+
+    def possibly_edited_df():
+        return possibly_edited_df_util(
+            df,
+            "transaction_files",
+            ["Ignore"],
+            False,
+            helpers["list_edit_files_in_edits_folder"],
+            lambda: current_gitsha1(repo),
+            str(tmp_path / "Edits"),
+            repo_path,
+            repo,
+            edit_journal_folder_path=str(tmp_path / "Edits" / ".journal"),
+        )
+
+    def commit_change(contents):
+        with open(os.path.join(repo_path, "Transactions", "a.csv"), "w") as f:
+            f.write(contents)
+        add_all_untracked_and_changed_files(repo)
+
+    return possibly_edited_df, commit_change
+
+
+def edit_ignore_column(edits_folder_path, ignore):
+    # edits the only transaction files edit file like a person would
+    import glob
+
+    import pandas as pd
+
+    (xlsx_path,) = glob.glob(
+        os.path.join(edits_folder_path, "*", "Transaction files.xlsx")
+    )
+    df = pd.read_excel(xlsx_path)
+    df["Ignore"] = ignore
+    df.to_excel(xlsx_path, index=False, engine="openpyxl")
+
+
+def test_journaled_edits_apply_once_their_edit_files_are_gone(tmp_path):
+    # type: (...) -> None
+    import shutil
+
+    possibly_edited_df, commit_change = journaled_transaction_files(tmp_path)
+    edits_folder_path = str(tmp_path / "Edits")
+    possibly_edited_df()
+    edit_ignore_column(edits_folder_path, [1, None])
+    commit_change("a\n")
+    assert possibly_edited_df()["Ignore"].fillna(0).tolist() == [1, 0]
+
+    # only the journal is left
+    for file_name in os.listdir(edits_folder_path):
+        if file_name != ".journal":
+            shutil.rmtree(os.path.join(edits_folder_path, file_name))
+    assert possibly_edited_df()["Ignore"].fillna(0).tolist() == [1, 0]
+
+
+def test_journaled_edit_files_are_not_archived(tmp_path):
+    # type: (...) -> None
+    import glob
+
+    possibly_edited_df, commit_change = journaled_transaction_files(tmp_path)
+    edits_folder_path = str(tmp_path / "Edits")
+    possibly_edited_df()
+    for run in range(3):
+        edit_ignore_column(edits_folder_path, [run, 1])
+        commit_change("%s\n" % run)
+        assert possibly_edited_df()["Ignore"].tolist() == [run, 1]
+        # only the edit file for the head commit is left
+        assert not os.path.isdir(os.path.join(edits_folder_path, "Archive"))
+        assert len(glob.glob(os.path.join(edits_folder_path, "*"))) == 1
+        assert len(glob.glob(os.path.join(edits_folder_path, "*", "*.xlsx"))) == 1
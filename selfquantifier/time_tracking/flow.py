@@ -2,8 +2,12 @@ import os
 
 import pandas as pd
 
+from selfquantifier.file_fingerprints import default_file_digests
+from selfquantifier.run_context import refreshing_run_context, run_history_reference
 from selfquantifier.utils import (
     add_date_columns_for_pivoting,
+    ensure_no_id_key_collisions,
+    id_key_column_name,
     list_files_in_clerk_input_subfolder,
 )
 
@@ -18,7 +22,16 @@ def time_tracking_flow(
     current_history_reference,
     keep_unmerged_previous_edits=False,
     failfast=False,
+    file_digests=default_file_digests,
+    run_context=None,
 ):
+    current_history_reference = run_history_reference(
+        run_context, current_history_reference
+    )
+    acknowledge_changes_in_selfquantifier_input_folder = refreshing_run_context(
+        acknowledge_changes_in_selfquantifier_input_folder, run_context
+    )
+
     time_tracking_files_calculated_columns = [
         "Parse status",
         # "Include in reports?",
@@ -36,6 +49,7 @@ def time_tracking_flow(
         _ = list_files_in_clerk_input_subfolder(
             time_tracking_folder_path,
             selfquantifier_input_folder_path=selfquantifier_input_folder_path,
+            digests=file_digests,
         )
         if len(_) == 0:
             return _
@@ -182,6 +196,10 @@ def time_tracking_flow(
             ].values,
             sort=False,
         ).reset_index(drop=True)
+        ensure_no_id_key_collisions(
+            all_parsed_time_tracking_entries_df["ID"],
+            all_parsed_time_tracking_entries_df[id_key_column_name],
+        )
         all_parsed_time_tracking_entries_df[
             "History reference"
         ] = current_history_reference()
@@ -198,9 +216,11 @@ def time_tracking_flow(
 
         # print("all_parsed_time_tracking_entries_df.columns", all_parsed_time_tracking_entries_df.columns)
 
-        time_tracking_entry_duplicates = all_parsed_time_tracking_entries_df.groupby(
-            "ID"
-        ).filter(lambda x: len(x) > 1)
+        time_tracking_entry_duplicates = all_parsed_time_tracking_entries_df[
+            all_parsed_time_tracking_entries_df[id_key_column_name].duplicated(
+                keep=False
+            )
+        ]
         print(
             "time_tracking_entry_duplicates: ",
             time_tracking_entry_duplicates[
@@ -217,7 +237,7 @@ def time_tracking_flow(
         )
 
         time_tracking_entries_df = all_parsed_time_tracking_entries_df.drop_duplicates(
-            subset=["ID"]
+            subset=[id_key_column_name]
         )
 
         # ensure that empty tag values is filled with source file default tag if available
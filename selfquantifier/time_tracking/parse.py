@@ -7,6 +7,8 @@ from selfquantifier.time_tracking.parsers.neamtime.tslog import (
     neamtime_tslog_time_tracking_entries_parser,
 )
 from selfquantifier.utils import (
+    id_key_column_name,
+    id_keys,
     is_nan,
     raw_if_available,
     selfquantifier_input_file_path,
@@ -154,6 +156,9 @@ def parse_time_tracking_files(
                 )
             else:
                 time_tracking_entries["ID"] = None
+            time_tracking_entries[id_key_column_name] = id_keys(
+                time_tracking_entries["ID"]
+            )
 
             # drop raw columns
             if not keepraw:
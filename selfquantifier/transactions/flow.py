@@ -2,8 +2,17 @@ import os
 
 import pandas as pd
 
+from selfquantifier.content_type_sniffing import (
+    ContentTypeSniffer,
+    fill_missing_content_types,
+)
+from selfquantifier.file_fingerprints import default_file_digests
+from selfquantifier.run_context import refreshing_run_context, run_history_reference
 from selfquantifier.utils import (
+    add_missing_editable_columns,
     add_date_columns_for_pivoting,
+    ensure_no_id_key_collisions,
+    id_key_column_name,
     list_files_in_clerk_input_subfolder,
 )
 
@@ -18,16 +27,29 @@ def transactions_flow(
     current_history_reference,
     keep_unmerged_previous_edits=False,
     failfast=False,
+    file_digests=default_file_digests,
+    run_context=None,
 ):
+    current_history_reference = run_history_reference(
+        run_context, current_history_reference
+    )
+    acknowledge_changes_in_selfquantifier_input_folder = refreshing_run_context(
+        acknowledge_changes_in_selfquantifier_input_folder, run_context
+    )
+
     def list_transaction_files_in_transactions_folder():
+        from selfquantifier.transactions.parse import content_type_signatures
+
         _ = list_files_in_clerk_input_subfolder(
             transactions_folder_path,
             selfquantifier_input_folder_path=selfquantifier_input_folder_path,
+            digests=file_digests,
+            content_type_sniffer=ContentTypeSniffer(content_type_signatures),
         )
         if len(_) == 0:
             return _
-        for column in transaction_files_editable_columns:
-            _[column] = None
+        # content types sniffed from the file headers are kept
+        add_missing_editable_columns(_, transaction_files_editable_columns)
         _["History reference"] = current_history_reference()
         return _[
             [
@@ -67,6 +89,9 @@ def transactions_flow(
         transaction_files_editable_columns,
         keep_unmerged_previous_edits,
     )
+    possibly_edited_transaction_files_df = fill_missing_content_types(
+        possibly_edited_transaction_files_df, transaction_files_df
+    )
 
     included_transaction_files = possibly_edited_transaction_files_df[
         (
@@ -113,6 +138,10 @@ def transactions_flow(
         all_parsed_transactions_df = pd.concat(
             successfully_parsed_transaction_files["Parse results"].values, sort=False
         ).reset_index(drop=True)
+        ensure_no_id_key_collisions(
+            all_parsed_transactions_df["ID"],
+            all_parsed_transactions_df[id_key_column_name],
+        )
         all_parsed_transactions_df["History reference"] = current_history_reference()
         # include transaction_files data
         all_parsed_transactions_df = pd.merge(
@@ -127,7 +156,9 @@ def transactions_flow(
 
         # print("all_parsed_transactions_df.columns", all_parsed_transactions_df.columns)
 
-        transactions_df = all_parsed_transactions_df.drop_duplicates(subset=["ID"])
+        transactions_df = all_parsed_transactions_df.drop_duplicates(
+            subset=[id_key_column_name]
+        )
 
         # ensure that empty currency values is filled with source file currency if available
         if "Currency" in transactions_df.columns:
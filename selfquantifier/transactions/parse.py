@@ -34,6 +34,8 @@ from selfquantifier.transactions.parsers.se.nordea.personal.internetbanken_priva
     nordea_se_personal_internetbanken_privat_xlsx_transactions_parser,
 )
 from selfquantifier.utils import (
+    id_key_column_name,
+    id_keys,
     is_nan,
     raw_if_available,
     selfquantifier_input_file_path,
@@ -62,6 +64,45 @@ parser_by_content_type = {
 }
 
 
+# header signatures of the exports, used to set the content type of new transaction files
+content_type_signatures = [
+    (
+        "exported-transaction-file/nordea.netbank.csv",
+        "(?:Bokföringsdag;Belopp;Avsändare;Mottagare"
+        "|Kirjauspäivä;Määrä;Maksaja;Maksunsaaja"
+        "|Booking date;Amount;Sender;Recipient);",
+    ),
+    (
+        "exported-transaction-file/nordea.fi.natbanken-privat.xls",
+        r"Kontonummer\t\S+\s+Bokningsdag\tValutadag\tBetalningsdag\tBelopp\t",
+    ),
+    (
+        "exported-transaction-file/lhv.ee.account-statement.csv",
+        '"Customer account no","Document no","Date","Sender/receiver account",',
+    ),
+    (
+        "exported-transaction-file/danskebank.se.csv",
+        '"Bokf.ringsdag";"Specifikation";"Belopp";"Saldo";"Status";"Avst.mt"',
+    ),
+    (
+        "exported-transaction-file/xolo.io.expenses.csv",
+        '"Vendor","Category","Description","Status","Invoice date","Paid date",',
+    ),
+    (
+        "exported-transaction-file/revolut.com.csv",
+        "Type,Product,Started Date,Completed Date,Description,Amount,Fee,Currency,",
+    ),
+    (
+        "exported-transaction-file/revolut.com.legacy.csv",
+        r"Completed Date;Reference;Paid Out \([A-Z]{3}\);Paid In \([A-Z]{3}\);",
+    ),
+    (
+        "exported-transaction-file/n26.com.csv",
+        '"Date","Payee","Account number","Transaction type","Payment reference",',
+    ),
+]
+
+
 def naive_transaction_ids(transactions):
     import jellyfish
 
@@ -156,6 +197,7 @@ def parse_transaction_files(
             transactions["Source transaction file index"] = transaction_file.name
             # add future join/merge index
             transactions["ID"] = transaction_ids(transactions)
+            transactions[id_key_column_name] = id_keys(transactions["ID"])
             # drop raw columns
             if not keepraw:
                 transactions = transactions.drop(
@@ -1,14 +1,29 @@
 import hashlib
 import os
+from collections import namedtuple
 from datetime import datetime
-from os.path import getsize, join
+from functools import lru_cache
 
 import pandas as pd
 from gspread import SpreadsheetNotFound, WorksheetNotFound
 from gspread_dataframe import get_as_dataframe, set_with_dataframe
 from gspread_formatting import CellFormat, Color
 from gspread_formatting.dataframe import BasicFormatter, format_with_dataframe
-from imohash import hashfile
+
+from selfquantifier.edit_file_sidecars import (
+    move_edit_file,
+    read_edit_file,
+    read_edit_files,
+    remove_edit_file,
+    store_written_edit_file,
+)
+from selfquantifier.file_fingerprints import (
+    default_file_digests,
+    file_metadata_from_digests,
+    fingerprint_file,
+    git_index_fingerprints,
+    ordered_parallel_map,
+)
 
 
 def ensure_selfquantifier_folder_versioning(selfquantifier_input_folder_path):
@@ -30,19 +45,165 @@ def ensure_selfquantifier_folder_versioning(selfquantifier_input_folder_path):
     return repo
 
 
+def enable_git_status_caches(repo):
+    import sys
+
+    # the untracked cache lets git add and git status skip unchanged folders.
+    # the builtin fsmonitor daemon is only available on macos and windows, as of git 2.36
+    settings = {"untrackedCache": "true"}
+    if sys.platform in ["darwin", "win32"] and repo.git.version_info >= (2, 36):
+        settings["fsmonitor"] = "true"
+    config_reader = repo.config_reader(config_level="repository")
+    missing_settings = {
+        name: value
+        for (name, value) in settings.items()
+        if str(config_reader.get_value("core", name, "")).lower() != value
+    }
+    if len(missing_settings) == 0:
+        return
+    config = repo.config_writer()
+    for name, value in missing_settings.items():
+        config.set_value("core", name, value)
+    config.release()
+
+
+selfquantifier_git_excludes = "Edits\n.~lock.*\n"
+
+# the editable data saved by the flows in the input subfolders
+editable_data_pathspec = ":(glob)*/*_editable_data.csv"
+
+staging_fingerprints_file_name = "staging-fingerprints.json"
+
+
+def write_selfquantifier_git_excludes(repo):
+    # track ignores within the git folder. only written when changed so that git
+    # does not have to invalidate its untracked cache
+    exclude_file_path = os.path.join(repo.working_tree_dir, ".git", "info", "exclude")
+    if os.path.isfile(exclude_file_path):
+        with open(exclude_file_path) as text_file:
+            if text_file.read() == selfquantifier_git_excludes:
+                return
+    os.makedirs(os.path.dirname(exclude_file_path), exist_ok=True)
+    with open(exclude_file_path, "w") as text_file:
+        text_file.write(selfquantifier_git_excludes)
+
+
 # add all untracked and changed files
 def add_all_untracked_and_changed_files(repo):
-    # track ignores within the git folder
-    with open(
-        os.path.join(repo.working_tree_dir, ".git", "info", "exclude"), "w"
-    ) as text_file:
-        text_file.write("Edits\n.~lock.*\n")
+    write_selfquantifier_git_excludes(repo)
     repo.git.add("-A")
     uncommited_changes = repo.git.status("--porcelain")
     if uncommited_changes != "":
         repo.git.commit("-m", "Current files", "-a")
 
 
+def working_tree_stats(repo, folder_paths):
+    # the stat of every file that scoped staging would look at, by folder. git itself
+    # is skipped for as long as neither these nor the HEAD commit change
+    import glob
+
+    def folder_stats(folder_path):
+        stats = []
+        try:
+            with os.scandir(folder_path) as it:
+                entries = sorted(it, key=lambda entry: entry.name)
+        except (FileNotFoundError, NotADirectoryError):
+            return stats
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                if entry.name != ".git":
+                    stats.extend(folder_stats(entry.path))
+            else:
+                stat_result = entry.stat(follow_symlinks=False)
+                stats.append(
+                    (
+                        entry.path,
+                        stat_result.st_size,
+                        stat_result.st_mtime_ns,
+                        stat_result.st_ino,
+                    )
+                )
+        return stats
+
+    stats = {folder_path: folder_stats(folder_path) for folder_path in folder_paths}
+    editable_data_stats = []
+    for file_path in sorted(
+        glob.glob(os.path.join(repo.working_tree_dir, "*", "*_editable_data.csv"))
+    ):
+        stat_result = os.stat(file_path)
+        editable_data_stats.append(
+            (file_path, stat_result.st_size, stat_result.st_mtime_ns)
+        )
+    return stats, editable_data_stats
+
+
+def load_staging_fingerprints(file_path):
+    import json
+
+    try:
+        with open(file_path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_staging_fingerprints(file_path, staging_fingerprints):
+    import json
+
+    os.makedirs(os.path.dirname(file_path), exist_ok=True)
+    tmp_path = "%s.tmp" % file_path
+    with open(tmp_path, "w") as f:
+        json.dump(staging_fingerprints, f)
+    os.replace(tmp_path, file_path)
+
+
+def add_untracked_and_changed_files_in_subfolders(repo, folder_paths):
+    # like add_all_untracked_and_changed_files, but only stages the given subfolders
+    # and the editable data of the flows, and leaves git alone entirely when nothing
+    # has changed since the last time the same subfolders were committed
+    from selfquantifier.file_fingerprints import selfquantifier_cache_folder_path
+
+    staging_fingerprints_file_path = os.path.join(
+        selfquantifier_cache_folder_path(repo.working_tree_dir),
+        staging_fingerprints_file_name,
+    )
+    staging_key = "\n".join(sorted(folder_paths))
+    stats, editable_data_stats = working_tree_stats(repo, folder_paths)
+    fingerprint = hashlib.sha1(
+        repr((sorted(stats.items()), editable_data_stats)).encode()
+    ).hexdigest()
+    staging_fingerprints = load_staging_fingerprints(staging_fingerprints_file_path)
+    if staging_fingerprints.get(staging_key) == {
+        "head": repo.head.object.hexsha,
+        "fingerprint": fingerprint,
+    }:
+        return False
+
+    write_selfquantifier_git_excludes(repo)
+    # git refuses pathspecs that match nothing, so empty folders are only passed
+    # along if they used to have files that are now to be removed
+    pathspecs = []
+    for folder_path, folder_stats in stats.items():
+        relative_path = os.path.relpath(folder_path, repo.working_tree_dir)
+        if len(folder_stats) == 0 and repo.git.ls_files("--", relative_path) == "":
+            continue
+        pathspecs.append(relative_path)
+    if len(editable_data_stats) > 0:
+        pathspecs.append(editable_data_pathspec)
+    if len(pathspecs) > 0:
+        repo.git.add("-A", "--", *pathspecs)
+    staged_changes = repo.git.diff("--cached", "--name-only")
+    if staged_changes != "":
+        repo.git.commit("-m", "Current files")
+
+    staging_fingerprints[staging_key] = {
+        "head": repo.head.object.hexsha,
+        "fingerprint": fingerprint,
+    }
+    save_staging_fingerprints(staging_fingerprints_file_path, staging_fingerprints)
+    return staged_changes != ""
+
+
 def short_gitsha1(repo, sha):
     short_sha = repo.git.rev_parse(sha, short=1)
     return short_sha
@@ -60,13 +221,10 @@ def current_gitcommit_datetime(repo):
 
 
 def commits_by_short_gitsha1(repo_path, repo):
-    from pydriller import RepositoryMining
+    from selfquantifier.commit_index import default_commit_index
 
-    commits_iterator = RepositoryMining(repo_path).traverse_commits()
-    commits = {}
-    for commit in commits_iterator:
-        history_reference = short_gitsha1(repo, commit.hash)
-        commits[history_reference] = commit
+    # read from a persisted index that is only updated with the commits added since
+    commits = default_commit_index(repo_path).commits_by_short_gitsha1()
 
     if len(commits) == 0:
         raise Exception('No commits found in "%s"' % repo_path)
@@ -74,13 +232,32 @@ def commits_by_short_gitsha1(repo_path, repo):
     return commits
 
 
+def commit_prefix_index(commits):
+    from selfquantifier.commit_index import CommitPrefixIndex
+
+    # the commits read from a commit index share the prefix index cached on it
+    if hasattr(commits, "commit_index"):
+        return commits.commit_index.prefix_index(commits)
+    return CommitPrefixIndex(commits.values())
+
+
 def commit_datetime_from_history_reference(history_reference, commits):
-    first_matching_commit_history_reference_key = next(
-        filter(lambda _: _.startswith(history_reference), commits.keys()), False
+    resolved = commit_prefix_index(commits).resolve([history_reference])
+    return resolved[history_reference].author_date
+
+
+def commit_datetimes_from_history_references(
+    history_references, commits, errors="raise"
+):
+    # each distinct history reference is resolved once, and all unresolvable ones
+    # are reported together (or left as NaN with errors="coerce")
+    resolved = commit_prefix_index(commits).resolve(history_references, errors=errors)
+    return history_references.map(
+        {
+            history_reference: commit.author_date
+            for history_reference, commit in resolved.items()
+        }
     )
-    if not first_matching_commit_history_reference_key:
-        raise Exception('No commit matching "%s" found' % history_reference)
-    return commits[first_matching_commit_history_reference_key].author_date
 
 
 def selfquantifier_input_file_path(selfquantifier_input_folder_path, file):
@@ -126,34 +303,103 @@ def possibly_edited_df_util(
     edits_folder_path,
     selfquantifier_input_folder_path,
     selfquantifier_input_folder_repo,
+    run_context=None,
+    edit_journal_folder_path=None,
+    provenance=False,
 ):
+    # with provenance, which edit file supplied each editable value is returned along
+    # with the df (see EditProvenance), instead of keeping the columns of the edit files
+    if provenance and keep_unmerged_previous_edits:
+        raise ValueError(
+            "keep_unmerged_previous_edits and provenance can not be combined"
+        )
+
+    if run_context is None:
+        from selfquantifier.run_context import RunContext
+
+        run_context = RunContext(
+            selfquantifier_input_folder_path,
+            selfquantifier_input_folder_repo,
+            list_edit_files_in_edits_folder,
+            current_history_reference,
+        )
+
     # set config based on record type
     (export_file_name, export_file_name_base) = export_file_name_by_record_type(
         record_type
     )
 
     # list of edit files
-    edit_files_df = list_edit_files_in_edits_folder()
+    edit_files_df = run_context.edit_files()
     # print("edit_files_df", edit_files_df)
 
+    def catalog_edit_file_for_the_head_commit():
+        # the run's catalog of edit files is updated instead of listed again
+        (
+            _,
+            commit_specific_directory,
+            _,
+            xlsx_path,
+        ) = edited_commit_specific_df_exists(
+            export_file_name,
+            edits_folder_path,
+            run_context.commit_datetime(),
+            run_context.history_reference(),
+        )
+        run_context.add_edit_file(
+            "@/Edits/%s" % commit_specific_directory,
+            os.path.basename(xlsx_path),
+            run_context.history_reference(),
+        )
+
+    from selfquantifier.edit_journal import (
+        EditJournal,
+        apply_edit_journal,
+        unjournaled_record_types,
+    )
+
+    # with an edit journal, the cells that the edit files change are journaled and the
+    # journal is applied to the currently parsed data, instead of merging in the edit
+    # files one by one
+    journal_edits = (
+        edit_journal_folder_path is not None
+        and not keep_unmerged_previous_edits
+        and not provenance
+        and record_type not in unjournaled_record_types
+    )
+
     # not much to do here if there are no edit files
     if len(edit_files_df) == 0:
+        # the journaled edits still apply once their edit files are gone
+        if journal_edits:
+            current_commit_df = apply_edit_journal(
+                current_commit_df,
+                record_type,
+                editable_columns,
+                EditJournal(edit_journal_folder_path, record_type),
+                selfquantifier_input_folder_path,
+                run_context.history_reference(),
+            )
         # make sure that the merged editable df file is available in the most current location
-        return possibly_edited_commit_specific_df(
+        possibly_edited_df = possibly_edited_commit_specific_df(
             df=current_commit_df,
             record_type=record_type,
             export_file_name=export_file_name,
             edits_folder_path=edits_folder_path,
-            commit_datetime=current_gitcommit_datetime(
-                selfquantifier_input_folder_repo
-            ),
-            history_reference=current_history_reference(),
+            commit_datetime=run_context.commit_datetime(),
+            history_reference=run_context.history_reference(),
             create_if_not_exists=True,
         )
+        catalog_edit_file_for_the_head_commit()
+        if provenance:
+            return possibly_edited_df, edit_provenance(
+                possibly_edited_df, record_type, editable_columns
+            )
+        return possibly_edited_df
 
     # include earlier edits
     previous_main_edit_files_mask = (edit_files_df["File name"] == export_file_name) & (
-        edit_files_df["Related history reference"] != current_history_reference()
+        edit_files_df["Related history reference"] != run_context.history_reference()
     )
 
     # include gsheets edits
@@ -179,8 +425,8 @@ def possibly_edited_df_util(
         record_type=record_type,
         export_file_name=export_file_name,
         edits_folder_path=edits_folder_path,
-        commit_datetime=current_gitcommit_datetime(selfquantifier_input_folder_repo),
-        history_reference=current_history_reference(),
+        commit_datetime=run_context.commit_datetime(),
+        history_reference=run_context.history_reference(),
         create_if_not_exists=False,
     )
     main_edit_file_for_the_head_commit_exists = type(main_edit_file_df) is not bool
@@ -196,15 +442,177 @@ def possibly_edited_df_util(
         )
         # just one adjustment: make sure the currently configured editable
         # columns are available on the returned dataframe (despite them not being in the xlsx)
-        for editable_column in editable_columns:
-            if editable_column not in main_edit_file_df:
-                main_edit_file_df[editable_column] = None
-
+        add_missing_editable_columns(main_edit_file_df, editable_columns)
+
+        if provenance:
+            return main_edit_file_df, edit_provenance(
+                main_edit_file_df,
+                record_type,
+                editable_columns,
+                edit_layer_files=["%s.xlsx" % export_file_name_base],
+            )
         return main_edit_file_df
 
+    # the edit files are loaded up front (in parallel where they need to be parsed),
+    # but merged one after another in the order below
+    previous_possibly_edited_dfs = read_previous_edit_files(
+        [
+            os.path.join(
+                edit_file["File path"].replace("@/Edits", edits_folder_path),
+                edit_file["File name"],
+            )
+            for index, edit_file in unmerged_non_current_main_edit_files.iterrows()
+        ],
+        record_type,
+        editable_columns,
+        keep_unmerged_previous_edits,
+    )
+
+    if journal_edits:
+        clean_df_with_previous_edits = journaled_df_with_previous_edits(
+            current_commit_df=current_commit_df,
+            main_edit_file_df=main_edit_file_df,
+            unmerged_non_current_main_edit_files=unmerged_non_current_main_edit_files,
+            previous_possibly_edited_dfs=previous_possibly_edited_dfs,
+            record_type=record_type,
+            editable_columns=editable_columns,
+            edit_journal_folder_path=edit_journal_folder_path,
+            selfquantifier_input_folder_path=selfquantifier_input_folder_path,
+            history_reference=run_context.history_reference(),
+        )
+    else:
+        (
+            clean_df_with_previous_edits,
+            winning_layers,
+            unmerged_previous_possibly_edited_dfs,
+        ) = merged_df_with_previous_edits(
+            current_commit_df=current_commit_df,
+            main_edit_file_df=main_edit_file_df,
+            export_file_name_base=export_file_name_base,
+            unmerged_non_current_main_edit_files=unmerged_non_current_main_edit_files,
+            previous_possibly_edited_dfs=previous_possibly_edited_dfs,
+            record_type=record_type,
+            editable_columns=editable_columns,
+            keep_unmerged_previous_edits=keep_unmerged_previous_edits,
+            selfquantifier_input_folder_path=selfquantifier_input_folder_path,
+            current_history_reference=run_context.history_reference,
+            provenance=provenance,
+        )
+
+    # if the main edit file existed before the merging, archive it before
+    main_edit_file_for_the_head_commit_mask = (
+        edit_files_df["File name"] == export_file_name
+    ) & (edit_files_df["Related history reference"] == run_context.history_reference())
+    main_edit_file_for_the_head_commit = edit_files_df[
+        main_edit_file_for_the_head_commit_mask
+    ]
+    main_edit_file_for_the_head_commit.apply(
+        archive_edit_file, axis=1, args=(edits_folder_path, journal_edits)
+    )
+    run_context.remove_edit_files(main_edit_file_for_the_head_commit)
+
+    # make sure that the merged editable df file is available in the most current location
+    possibly_edited_df_with_previous_edits = possibly_edited_commit_specific_df(
+        df=clean_df_with_previous_edits,
+        record_type=record_type,
+        export_file_name=export_file_name,
+        edits_folder_path=edits_folder_path,
+        commit_datetime=run_context.commit_datetime(),
+        history_reference=run_context.history_reference(),
+        create_if_not_exists=True,
+    )
+    catalog_edit_file_for_the_head_commit()
+
+    # at this point, we have incorporated the information from the edit files that were used here
+    # thus, we move them to the archive folder
+    unmerged_non_current_main_edit_files.apply(
+        archive_edit_file, axis=1, args=(edits_folder_path, journal_edits)
+    )
+    run_context.remove_edit_files(unmerged_non_current_main_edit_files)
+
+    if provenance:
+        # keyed by the join columns of the merged records, so that the layers can be
+        # looked up for the rows of the stored edit file
+        return possibly_edited_df_with_previous_edits, edit_provenance(
+            clean_df_with_previous_edits,
+            record_type,
+            editable_columns,
+            winning_layers=winning_layers,
+            edit_layer_files=[
+                "%s.xlsx" % export_file_name_base
+                if main_edit_file_for_the_head_commit_exists
+                else None,
+                *(
+                    "{} - {}".format(
+                        edit_file["Related history reference"], edit_file["File name"]
+                    )
+                    for index, edit_file in unmerged_non_current_main_edit_files.iterrows()
+                ),
+            ],
+            unmerged_previous_edits_dfs=unmerged_previous_possibly_edited_dfs,
+        )
+    return possibly_edited_df_with_previous_edits
+
+
+def journaled_df_with_previous_edits(
+    current_commit_df,
+    main_edit_file_df,
+    unmerged_non_current_main_edit_files,
+    previous_possibly_edited_dfs,
+    record_type,
+    editable_columns,
+    edit_journal_folder_path,
+    selfquantifier_input_folder_path,
+    history_reference,
+):
+    # the cells that the edit files change are journaled and the journal is applied to
+    # the currently parsed data. main_edit_file_df is False when there is no edit file
+    # for the head commit
+    from selfquantifier.edit_journal import EditJournal, journal_edit_files
+
+    edits_dfs = list(
+        zip(
+            unmerged_non_current_main_edit_files["Related history reference"],
+            previous_possibly_edited_dfs,
+        )
+    )
+    if main_edit_file_df is not False:
+        edits_dfs.insert(0, (history_reference, main_edit_file_df))
+    print(
+        "Journaling edits from %s edit file(s) and applying them to the currently "
+        "parsed data" % len(edits_dfs)
+    )
+    return journal_edit_files(
+        current_commit_df=current_commit_df,
+        edits_dfs=edits_dfs,
+        record_type=record_type,
+        editable_columns=editable_columns,
+        edit_journal=EditJournal(edit_journal_folder_path, record_type),
+        selfquantifier_input_folder_path=selfquantifier_input_folder_path,
+        history_reference=history_reference,
+    )
+
+
+def merged_df_with_previous_edits(
+    current_commit_df,
+    main_edit_file_df,
+    export_file_name_base,
+    unmerged_non_current_main_edit_files,
+    previous_possibly_edited_dfs,
+    record_type,
+    editable_columns,
+    keep_unmerged_previous_edits,
+    selfquantifier_input_folder_path,
+    current_history_reference,
+    provenance,
+):
+    # the edit files merged in one by one. returns the merged df, and with provenance
+    # also the winning layers and the previous rows that were not merged.
+    # main_edit_file_df is False when there is no edit file for the head commit
+
     # include the current main edit file df if exists and a merge is
     # imminent - or else all changes only in the main edit file will be lost
-    if main_edit_file_for_the_head_commit_exists:
+    if main_edit_file_df is not False:
         print(
             "Merging edits from %s edit file(s) and %s.xlsx into a new %s.xlsx (ignoring currently parsed data)"
             % (
@@ -222,18 +630,19 @@ def possibly_edited_df_util(
         df_with_previous_edits_across_columns = current_commit_df
 
     columns_to_drop_after_propagation_of_previous_edits = []
-    for index, edit_file in unmerged_non_current_main_edit_files.iterrows():
-        previous_possibly_edited_df_xlsx_path = os.path.join(
-            edit_file["File path"].replace("@/Edits", edits_folder_path),
-            edit_file["File name"],
-        )
-        previous_possibly_edited_df = pd.read_excel(
-            previous_possibly_edited_df_xlsx_path
-        )
+    unmerged_previous_possibly_edited_dfs = []
+    for layer, ((index, edit_file), previous_possibly_edited_df) in enumerate(
+        zip(
+            unmerged_non_current_main_edit_files.iterrows(),
+            previous_possibly_edited_dfs,
+        ),
+        start=1,
+    ):
         try:
             (
                 df_with_previous_edits_across_columns,
                 additional_columns_to_drop_after_propagation_of_previous_edits,
+                unmerged_previous_possibly_edited_df,
             ) = merge_changes_from_previous_possibly_edited_df(
                 accumulating_df=df_with_previous_edits_across_columns,
                 previous_possibly_edited_df=previous_possibly_edited_df,
@@ -242,6 +651,8 @@ def possibly_edited_df_util(
                 selfquantifier_input_folder_path=selfquantifier_input_folder_path,
                 current_history_reference=current_history_reference,
                 keep_unmerged_previous_edits=keep_unmerged_previous_edits,
+                editable_columns=editable_columns,
+                provenance=provenance,
             )
         except InvalidPreviouslyEditedDfException as e:
             print(
@@ -253,12 +664,20 @@ def possibly_edited_df_util(
             *columns_to_drop_after_propagation_of_previous_edits,
             *additional_columns_to_drop_after_propagation_of_previous_edits,
         ]
+        if unmerged_previous_possibly_edited_df is not None:
+            unmerged_previous_possibly_edited_dfs.append(
+                unmerged_previous_possibly_edited_df.assign(**{"Edit layer": layer})
+            )
 
     df_with_previous_edits = propagate_previous_edits_from_across_columns(
         df_with_previous_edits_across_columns,
         unmerged_non_current_main_edit_files,
         editable_columns,
+        provenance=provenance,
     )
+    winning_layers = None
+    if provenance:
+        df_with_previous_edits, winning_layers = df_with_previous_edits
 
     # clean up irrelevant old columns (should have been merged and propagated already)
     if not keep_unmerged_previous_edits:
@@ -269,49 +688,40 @@ def possibly_edited_df_util(
         print("Warning: Keeping potential old edits and columns for reference")
         clean_df_with_previous_edits = df_with_previous_edits
 
-    def archive_edit_file(edit_file_to_archive):
-        import shutil
-        from datetime import datetime
+    return (
+        clean_df_with_previous_edits,
+        winning_layers,
+        unmerged_previous_possibly_edited_dfs,
+    )
 
-        from_folder = edit_file_to_archive["File path"].replace(
-            "@/Edits", edits_folder_path
-        )
-        to_folder = edit_file_to_archive["File path"].replace(
-            "@/Edits", "@/Edits/Archive"
-        ).replace("@/Edits", edits_folder_path) + (
-            "/Archived %s" % datetime.today().strftime("%Y-%m-%d %H%M%S")
-        )
-        os.makedirs(to_folder, exist_ok=True)
-        shutil.move(
-            os.path.join(from_folder, edit_file_to_archive["File name"]),
-            os.path.join(to_folder, edit_file_to_archive["File name"]),
-        )
 
-    # if the main edit file existed before the merging, archive it before
-    main_edit_file_for_the_head_commit_mask = (
-        edit_files_df["File name"] == export_file_name
-    ) & (edit_files_df["Related history reference"] == current_history_reference())
-    main_edit_file_for_the_head_commit = edit_files_df[
-        main_edit_file_for_the_head_commit_mask
-    ]
-    main_edit_file_for_the_head_commit.apply(archive_edit_file, axis=1)
+def archive_edit_file(edit_file_to_archive, edits_folder_path, journaled=False):
+    from datetime import datetime
 
-    # make sure that the merged editable df file is available in the most current location
-    possibly_edited_df_with_previous_edits = possibly_edited_commit_specific_df(
-        df=clean_df_with_previous_edits,
-        record_type=record_type,
-        export_file_name=export_file_name,
-        edits_folder_path=edits_folder_path,
-        commit_datetime=current_gitcommit_datetime(selfquantifier_input_folder_repo),
-        history_reference=current_history_reference(),
-        create_if_not_exists=True,
+    from_folder = edit_file_to_archive["File path"].replace(
+        "@/Edits", edits_folder_path
+    )
+    # the edits of journaled edit files live on in the journal, so that the edit
+    # files are removed instead of piling up in the archive
+    if journaled:
+        remove_edit_file(os.path.join(from_folder, edit_file_to_archive["File name"]))
+        return
+    to_folder = edit_file_to_archive["File path"].replace(
+        "@/Edits", "@/Edits/Archive"
+    ).replace("@/Edits", edits_folder_path) + (
+        "/Archived %s" % datetime.today().strftime("%Y-%m-%d %H%M%S")
+    )
+    os.makedirs(to_folder, exist_ok=True)
+    move_edit_file(
+        os.path.join(from_folder, edit_file_to_archive["File name"]),
+        os.path.join(to_folder, edit_file_to_archive["File name"]),
     )
 
-    # at this point, we have incorporated the information from the edit files that were used here
-    # thus, we move them to the archive folder
-    unmerged_non_current_main_edit_files.apply(archive_edit_file, axis=1)
 
-    return possibly_edited_df_with_previous_edits
+def add_missing_editable_columns(df, editable_columns):
+    for editable_column in editable_columns:
+        if editable_column not in df:
+            df[editable_column] = None
 
 
 def possibly_edited_commit_specific_df(
@@ -334,7 +744,9 @@ def possibly_edited_commit_specific_df(
     )
     if not exists and not create_if_not_exists:
         return False
+    # machine reads go through a sidecar, the xlsx is only parsed once edited
     if create_if_exists or (not exists and create_if_not_exists):
+        df = df.drop(columns=[id_key_column_name], errors="ignore")
         save_edited_commit_specific_df(
             df,
             commit_specific_directory,
@@ -343,7 +755,8 @@ def possibly_edited_commit_specific_df(
             record_type,
             xlsx_path,
         )
-    return pd.read_excel(xlsx_path)
+        return store_written_edit_file(xlsx_path)
+    return read_edit_file(xlsx_path)
 
 
 def edited_commit_specific_df_exists(
@@ -663,40 +1076,179 @@ def fetch_gsheets_worksheet_as_df(gsheets_client, gsheets_title, gsheets_sheet_n
     return df
 
 
+# the trees of two commits, and so the changes between them, never change. rewriting
+# the history in between (see history_compaction) keeps the commits and their trees
+@lru_cache(maxsize=256)
 def changes_between_two_commits(repo_base_path, from_commit, to_commit):
-    from pydriller import RepositoryMining
-
-    commits_iterator = RepositoryMining(
-        repo_base_path, filepath=".", from_commit=from_commit, to_commit=to_commit
-    ).traverse_commits()
-
-    # follows file renames (ignores deletes and additions, so some new paths may have been
-    # subsequently deleted, and some old paths may have not existed in the from_commit
+    # a single diff between the two commits instead of walking every commit in between.
+    # renames are detected between the endpoints, so a file renamed several times maps
+    # straight to its latest path, and paths both added and deleted in between are left out
+    from selfquantifier.commit_index import git
+
+    # -z keeps non-ascii paths unquoted
+    fields = git(
+        repo_base_path,
+        "diff",
+        "-M",
+        "--name-status",
+        "-z",
+        from_commit,
+        to_commit,
+    ).split("\0")
     old_to_new_paths = {}
-    new_to_old_paths = {}
-    old_now_deleted_paths = {}  # TODO
-    old_non_existing_now_added_paths = {}  # TODO
-    for commit in commits_iterator:
-        for modification in commit.modifications:
-            if (
-                modification.old_path
-                and modification.new_path
-                and modification.old_path != modification.new_path
-            ):
-                if modification.new_path in new_to_old_paths:
-                    old_to_new_paths[
-                        new_to_old_paths[modification.new_path]
-                    ] = modification.new_path
-                    new_to_old_paths[modification.new_path] = new_to_old_paths[
-                        modification.new_path
-                    ]
-                else:
-                    old_to_new_paths[modification.old_path] = modification.new_path
-                    new_to_old_paths[modification.new_path] = modification.old_path
-    del new_to_old_paths
+    old_now_deleted_paths = {}
+    old_non_existing_now_added_paths = {}
+    i = 0
+    while i < len(fields) - 1:
+        status = fields[i]
+        if status.startswith("R"):
+            old_to_new_paths[fields[i + 1]] = fields[i + 2]
+            i += 3
+            continue
+        if status.startswith("C"):
+            # copies are only detected with -C, the copy is then a newly added path
+            old_non_existing_now_added_paths[fields[i + 2]] = True
+            i += 3
+            continue
+        if status == "D":
+            old_now_deleted_paths[fields[i + 1]] = True
+        elif status == "A":
+            old_non_existing_now_added_paths[fields[i + 1]] = True
+        i += 2
     # print("old_to_new_paths", old_to_new_paths)
 
-    return (old_to_new_paths, old_now_deleted_paths, old_non_existing_now_added_paths)
+    return (
+        old_to_new_paths,
+        old_now_deleted_paths,
+        old_non_existing_now_added_paths,
+    )
+
+
+# internal join and dedup key derived from the readable ids, never exported
+id_key_column_name = "ID key"
+
+
+def id_key(id):
+    import hashlib
+
+    return hashlib.blake2b(id.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def id_keys(ids):
+    # fixed-width 128-bit hex digests instead of the long json ids, each distinct id
+    # hashed once. see ensure_no_id_key_collisions
+    keys = {id: id_key(str(id)) for id in ids.dropna().unique()}
+    return ids.map(keys).astype(object)
+
+
+def ensure_no_id_key_collisions(ids, keys):
+    # a collision would silently join or deduplicate unrelated records, so it raises
+    # instead. checked on all of the ids that are joined or deduplicated together
+    ids_and_keys = pd.DataFrame(
+        {"id": ids.to_numpy(), "key": keys.to_numpy()}
+    ).dropna()
+    ids_and_keys = ids_and_keys.drop_duplicates()
+    colliding = ids_and_keys[ids_and_keys["key"].duplicated(keep=False)]
+    if len(colliding) > 0:
+        raise Exception(
+            "ID key collision between %s"
+            % " and ".join(repr(id) for id in colliding["id"])
+        )
+
+
+def normalized_joined_paths(df, file_path_column_name, file_name_column_name):
+    # normalize encodings to properly join paths that have been encoded differently
+    # for whatever reason. each distinct path is only normalized once, and ascii
+    # paths are already in normal form
+    import unicodedata as ud
+
+    joined_paths = (
+        df[file_path_column_name].astype(str)
+        + "/"
+        + df[file_name_column_name].astype(str)
+    )
+    normalized_paths = {
+        path: path if path.isascii() else ud.normalize("NFC", path)
+        for path in joined_paths.unique()
+    }
+    return joined_paths.map(normalized_paths)
+
+
+def head_commit_corresponding_paths(selfquantifier_paths, old_to_new_paths):
+    # if no moves occurred just use the old path as is
+    head_commit_paths = {}
+    for selfquantifier_path in selfquantifier_paths.unique():
+        selfquantifier_path_key = selfquantifier_path.replace("@/", "")
+        if selfquantifier_path_key in old_to_new_paths:
+            head_commit_paths[selfquantifier_path] = (
+                "@/%s" % old_to_new_paths[selfquantifier_path_key]
+            )
+        else:
+            head_commit_paths[selfquantifier_path] = selfquantifier_path
+    return selfquantifier_paths.map(head_commit_paths)
+
+
+def edit_file_join_columns(record_type):
+    # (additional join column, file name column, file path column)
+    if (
+        record_type == "transaction_files"
+        or record_type == "receipt_files"
+        or record_type == "location_history_files"
+        or record_type == "time_tracking_files"
+    ):
+        return (None, "File name", "File path")
+    elif record_type == "transactions":
+        return (
+            "ID",
+            "Source transaction file: File name",
+            "Source transaction file: File path",
+        )
+    elif record_type == "location_history_by_date":
+        return (
+            "ID",
+            "Source location history file: File name",
+            "Source location history file: File path",
+        )
+    elif record_type == "time_tracking_entries":
+        return (
+            "ID",
+            "Source time tracking file: File name",
+            "Source time tracking file: File path",
+        )
+    else:
+        raise ValueError("record_type '%s' not recognized" % record_type)
+
+
+def edit_file_merge_columns(record_type, editable_columns):
+    (
+        additional_join_column,
+        file_name_column_name,
+        file_path_column_name,
+    ) = edit_file_join_columns(record_type)
+    return [
+        file_path_column_name,
+        file_name_column_name,
+        *([additional_join_column] if additional_join_column else []),
+        *editable_columns,
+    ]
+
+
+def read_previous_edit_files(
+    xlsx_paths, record_type, editable_columns, keep_unmerged_previous_edits
+):
+    if keep_unmerged_previous_edits:
+        return read_edit_files(xlsx_paths)
+    dfs = read_edit_files(
+        xlsx_paths, columns=edit_file_merge_columns(record_type, editable_columns)
+    )
+    # the ids of edit files that predate them are derived from all columns
+    additional_join_column = edit_file_join_columns(record_type)[0]
+    return [
+        read_edit_file(xlsx_path)
+        if additional_join_column and additional_join_column not in df.columns
+        else df
+        for (xlsx_path, df) in zip(xlsx_paths, dfs)
+    ]
 
 
 def merge_changes_from_previous_possibly_edited_df(
@@ -707,6 +1259,8 @@ def merge_changes_from_previous_possibly_edited_df(
     selfquantifier_input_folder_path,
     current_history_reference,
     keep_unmerged_previous_edits,
+    editable_columns=None,
+    provenance=False,
 ):
 
     if type(previous_possibly_edited_df) is bool and not previous_possibly_edited_df:
@@ -716,19 +1270,12 @@ def merge_changes_from_previous_possibly_edited_df(
         )
 
     # set config based on record type
-    if (
-        record_type == "transaction_files"
-        or record_type == "receipt_files"
-        or record_type == "location_history_files"
-        or record_type == "time_tracking_files"
-    ):
-        additional_join_column = None
-        file_name_column_name = "File name"
-        file_path_column_name = "File path"
-    elif record_type == "transactions":
-        additional_join_column = "ID"
-        file_name_column_name = "Source transaction file: File name"
-        file_path_column_name = "Source transaction file: File path"
+    (
+        additional_join_column,
+        file_name_column_name,
+        file_path_column_name,
+    ) = edit_file_join_columns(record_type)
+    if record_type == "transactions":
         # Add ID column if not present in previous edits file
         if additional_join_column not in previous_possibly_edited_df.columns:
             from selfquantifier.transactions.parse import transaction_ids
@@ -738,12 +1285,9 @@ def merge_changes_from_previous_possibly_edited_df(
             )
     elif record_type == "location_history_by_date":
         # for now simply return the current df, ignoring the previously possibly edited df
-        return (accumulating_df, [])
+        return (accumulating_df, [], None)
         """
         # TODO: Support editing location history
-        additional_join_column = "ID"
-        file_name_column_name = "Source location history file: File name"
-        file_path_column_name = "Source location history file: File path"
         # Add ID column if not present in previous edits file
         if additional_join_column not in previous_possibly_edited_df.columns:
             from selfquantifier.location_history.parse import location_history_ids
@@ -753,9 +1297,6 @@ def merge_changes_from_previous_possibly_edited_df(
             )
         """
     elif record_type == "time_tracking_entries":
-        additional_join_column = "ID"
-        file_name_column_name = "Source time tracking file: File name"
-        file_path_column_name = "Source time tracking file: File path"
         # Add ID column if not present in previous edits file
         if additional_join_column not in previous_possibly_edited_df.columns:
             from selfquantifier.transactions.parse import transaction_ids
@@ -763,8 +1304,6 @@ def merge_changes_from_previous_possibly_edited_df(
             previous_possibly_edited_df[additional_join_column] = transaction_ids(
                 previous_possibly_edited_df
             )
-    else:
-        raise ValueError("record_type '%s' not recognized" % record_type)
 
     # sanity check
     if file_name_column_name not in previous_possibly_edited_df.columns:
@@ -783,6 +1322,16 @@ def merge_changes_from_previous_possibly_edited_df(
             "Missing column: %s" % additional_join_column
         )
 
+    # only the join keys and the editable columns are needed to propagate the earlier
+    # edits. the other columns are only merged along when unmerged edits are kept
+    if not keep_unmerged_previous_edits and editable_columns is not None:
+        merge_columns = edit_file_merge_columns(record_type, editable_columns)
+        previous_possibly_edited_df = previous_possibly_edited_df[
+            previous_possibly_edited_df.columns[
+                previous_possibly_edited_df.columns.isin(merge_columns)
+            ]
+        ].copy()
+
     # print("df.head(), edit_file, previous_possibly_edited_df.head()")
     # print(df.head(), edit_file, previous_possibly_edited_df.head())
 
@@ -790,23 +1339,10 @@ def merge_changes_from_previous_possibly_edited_df(
     from_commit = edit_file["Related history reference"]
     to_commit = current_history_reference()
 
-    def normalize_encoding(string):
-        import unicodedata as ud
-
-        normalized = ud.normalize("NFC", string)
-        return normalized
-
-    def joined_normalized_path(record):
-        # normalize encodings to properly join paths that have been encoded differently for whatever reason
-        joined_path = "{}/{}".format(
-            record[file_path_column_name],
-            record[file_name_column_name],
-        )
-        return normalize_encoding(joined_path)
+    def joined_normalized_paths(df):
+        return normalized_joined_paths(df, file_path_column_name, file_name_column_name)
 
-    accumulating_df["selfquantifier_path"] = accumulating_df.apply(
-        joined_normalized_path, axis=1
-    )
+    accumulating_df["selfquantifier_path"] = joined_normalized_paths(accumulating_df)
     left_on = ["selfquantifier_path"]
 
     if from_commit != to_commit:
@@ -818,29 +1354,20 @@ def merge_changes_from_previous_possibly_edited_df(
             selfquantifier_input_folder_path, from_commit, to_commit
         )
 
-        previous_possibly_edited_df[
-            "selfquantifier_path"
-        ] = previous_possibly_edited_df.apply(joined_normalized_path, axis=1)
-
-        def find_head_commit_corresponding_selfquantifier_path(selfquantifier_path):
-            selfquantifier_path_key = selfquantifier_path.replace("@/", "")
-            if selfquantifier_path_key in old_to_new_paths:
-                return "@/%s" % old_to_new_paths[selfquantifier_path_key]
-            else:
-                # if no moves occurred just use the old path as is
-                return selfquantifier_path
-
+        previous_possibly_edited_df["selfquantifier_path"] = joined_normalized_paths(
+            previous_possibly_edited_df
+        )
         previous_possibly_edited_df[
             "head_commit_corresponding_selfquantifier_path"
-        ] = previous_possibly_edited_df["selfquantifier_path"].apply(
-            find_head_commit_corresponding_selfquantifier_path
+        ] = head_commit_corresponding_paths(
+            previous_possibly_edited_df["selfquantifier_path"], old_to_new_paths
         )
 
         right_on = ["head_commit_corresponding_selfquantifier_path"]
     else:
-        previous_possibly_edited_df[
-            "selfquantifier_path"
-        ] = previous_possibly_edited_df.apply(joined_normalized_path, axis=1)
+        previous_possibly_edited_df["selfquantifier_path"] = joined_normalized_paths(
+            previous_possibly_edited_df
+        )
         right_on = ["selfquantifier_path"]
 
     suffix = " ({} - {})".format(from_commit, edit_file["File name"])
@@ -848,16 +1375,38 @@ def merge_changes_from_previous_possibly_edited_df(
     def add_suffix(column_name):
         return "{}{}".format(column_name, suffix)
 
+    import pandas as pd
+
+    # the ids are joined on through their keys
     if additional_join_column:
-        left_on.append(additional_join_column)
-        right_on.append(additional_join_column)
+        if id_key_column_name not in accumulating_df.columns:
+            accumulating_df[id_key_column_name] = id_keys(
+                accumulating_df[additional_join_column]
+            )
+        previous_possibly_edited_df[id_key_column_name] = id_keys(
+            previous_possibly_edited_df[additional_join_column]
+        )
+        ensure_no_id_key_collisions(
+            pd.concat(
+                [
+                    accumulating_df[additional_join_column],
+                    previous_possibly_edited_df[additional_join_column],
+                ]
+            ),
+            pd.concat(
+                [
+                    accumulating_df[id_key_column_name],
+                    previous_possibly_edited_df[id_key_column_name],
+                ]
+            ),
+        )
+        left_on.append(id_key_column_name)
+        right_on.append(id_key_column_name)
 
     suffixed_previous_possibly_edited_df = previous_possibly_edited_df.add_suffix(
         suffix
     )
 
-    import pandas as pd
-
     suffixed_right_on = [add_suffix(column_name) for column_name in right_on]
 
     merged_possibly_edited_df = pd.merge(
@@ -869,6 +1418,23 @@ def merge_changes_from_previous_possibly_edited_df(
         suffixes=(False, False),
     )
 
+    # with provenance, the previous rows that were not merged are returned separately
+    unmerged_previous_possibly_edited_df = None
+    if provenance:
+        unmerged_previous_possibly_edited_df = previous_possibly_edited_df[
+            ~pd.MultiIndex.from_frame(previous_possibly_edited_df[right_on]).isin(
+                pd.MultiIndex.from_frame(accumulating_df[left_on])
+            )
+        ].drop(
+            [
+                "selfquantifier_path",
+                "head_commit_corresponding_selfquantifier_path",
+                id_key_column_name,
+            ],
+            axis=1,
+            errors="ignore",
+        )
+
     # drop temporary merge columns
     merged_possibly_edited_df = merged_possibly_edited_df.drop(
         ["selfquantifier_path"], axis=1
@@ -882,6 +1448,7 @@ def merge_changes_from_previous_possibly_edited_df(
     return (
         merged_possibly_edited_df,
         columns_to_drop_after_propagation_of_previous_edits,
+        unmerged_previous_possibly_edited_df,
     )
 
 
@@ -889,152 +1456,374 @@ def set_where_nan():
     pass
 
 
-def propagate_previous_edits_from_across_columns(
+# in provenance mode, possibly_edited_df_util returns these along with the df:
+# edit_layers - the layer that supplied each editable value, keyed by the join columns
+# edit_layer_files - the edit file of each layer (layer 0 being the data that the edits
+# were merged into, which is an edit file itself if it is the head commit edit file)
+# unmerged_previous_edits - the rows of the edit files that were not merged, with their layer
+EditProvenance = namedtuple(
+    "EditProvenance", ["edit_layers", "edit_layer_files", "unmerged_previous_edits"]
+)
+
+
+def edit_provenance(
+    df,
+    record_type,
+    editable_columns,
+    winning_layers=None,
+    edit_layer_files=(None,),
+    unmerged_previous_edits_dfs=(),
+):
+    join_columns = edit_file_merge_columns(record_type, [])
+    if winning_layers is None:
+        winning_layers = pd.DataFrame(
+            0, index=df.index, columns=editable_columns, dtype="uint8"
+        )
+    edit_layers = pd.concat(
+        [df[[column for column in join_columns if column in df]], winning_layers],
+        axis=1,
+    ).set_index([column for column in join_columns if column in df])
+    unmerged_previous_edits = (
+        pd.concat(unmerged_previous_edits_dfs, ignore_index=True)
+        if len(unmerged_previous_edits_dfs) > 0
+        else pd.DataFrame(columns=[*join_columns, "Edit layer"])
+    )
+    return EditProvenance(edit_layers, list(edit_layer_files), unmerged_previous_edits)
+
+
+def previous_edit_layer(
+    df_with_previous_edits_across_columns, edit_file, editable_columns
+):
+    import numpy as np
+
+    # the values of the suffixed columns of an edit file, where it has a value for a
+    # cell (where it had a row and the column), and the suffixed columns it lacks
+    suffix = " ({} - {})".format(
+        edit_file["Related history reference"],
+        edit_file["File name"],
+    )
+    suffixed_column_names = [
+        "{}{}".format(column_name, suffix) for column_name in editable_columns
+    ]
+    columns_available = np.array(
+        [
+            suffixed_column_name in df_with_previous_edits_across_columns.columns
+            for suffixed_column_name in suffixed_column_names
+        ],
+        dtype=bool,
+    )
+    previous_edit_path_column_name = "selfquantifier_path%s" % (suffix)
+    if previous_edit_path_column_name in df_with_previous_edits_across_columns:
+        previous_edit_had_row = (
+            df_with_previous_edits_across_columns[previous_edit_path_column_name]
+            .notnull()
+            .to_numpy()
+        )
+    else:
+        previous_edit_had_row = np.zeros(
+            len(df_with_previous_edits_across_columns), dtype=bool
+        )
+    return (
+        df_with_previous_edits_across_columns.reindex(
+            columns=suffixed_column_names
+        ).to_numpy(dtype=object),
+        np.outer(previous_edit_had_row, columns_available),
+        list(np.array(suffixed_column_names, dtype=object)[~columns_available]),
+    )
+
+
+def stacked_edit_layers(
     df_with_previous_edits_across_columns, unmerged_edit_files, editable_columns
 ):
+    import numpy as np
 
+    # the current values and those of each edit file, stacked as layers in merge
+    # order, and where each layer has a value for a cell
+    layer_values = [
+        df_with_previous_edits_across_columns[editable_columns].to_numpy(dtype=object)
+    ]
+    layer_has_values = [
+        np.ones(
+            (len(df_with_previous_edits_across_columns), len(editable_columns)),
+            dtype=bool,
+        )
+    ]
+    missing_suffixed_column_names = []
     for index, edit_file in unmerged_edit_files.iterrows():
-        suffix = " ({} - {})".format(
-            edit_file["Related history reference"],
-            edit_file["File name"],
+        values, has_values, missing_column_names = previous_edit_layer(
+            df_with_previous_edits_across_columns, edit_file, editable_columns
         )
-        for column_name in editable_columns:
-            if column_name not in df_with_previous_edits_across_columns.columns:
-                # the editable column has not been seen before, make sure to initiate it
-                df_with_previous_edits_across_columns[column_name] = None
-            suffixed_column_name = "{}{}".format(column_name, suffix)
-            if (
-                suffixed_column_name
-                not in df_with_previous_edits_across_columns.columns
-            ):
-                print(
-                    ' - Merge info: "%s" was not found in the previous edit columns (maybe it is a column that has recently been added?)'
-                    % (suffixed_column_name)
-                )
-                pass
-            else:
-                if column_name in df_with_previous_edits_across_columns.columns:
-                    df_where_previous_edit_row_number_column_is_not_null_mask = (
-                        ~df_with_previous_edits_across_columns[
-                            "selfquantifier_path%s" % (suffix)
-                        ].isnull()
-                    )
-                    df_with_previous_edits_across_columns.loc[
-                        df_where_previous_edit_row_number_column_is_not_null_mask,
-                        column_name,
-                    ] = df_with_previous_edits_across_columns[suffixed_column_name]
-                    print(
-                        ' - Merge info: Propagated previous edits from "%s" to "%s" where previous edit had a row'
-                        % (suffixed_column_name, column_name)
-                    )
-                else:
-                    df_with_previous_edits_across_columns[
-                        column_name
-                    ] = df_with_previous_edits_across_columns[suffixed_column_name]
-        # print("df_with_previous_edits_across_columns.head()", df_with_previous_edits_across_columns.head())
+        layer_values.append(values)
+        layer_has_values.append(has_values)
+        missing_suffixed_column_names.extend(missing_column_names)
+
+    if len(missing_suffixed_column_names) > 0:
+        print(
+            " - Merge info: %s editable column(s) were not found in the previous edit columns (maybe they have recently been added?): %s"
+            % (
+                len(missing_suffixed_column_names),
+                ", ".join('"%s"' % name for name in missing_suffixed_column_names),
+            )
+        )
+    return np.stack(layer_values), np.stack(layer_has_values)
+
+
+def winning_edit_layers(layer_has_values):
+    import numpy as np
+
+    # the last layer with a value wins, even where that value is empty, since
+    # emptying a cell is an edit too
+    return len(layer_has_values) - 1 - np.argmax(layer_has_values[::-1], axis=0)
+
+
+def propagate_winning_layer_values(
+    df_with_previous_edits_across_columns,
+    editable_columns,
+    layer_values,
+    winning_layers,
+):
+    import numpy as np
+
+    resolved_values = np.take_along_axis(
+        layer_values, winning_layers[np.newaxis], axis=0
+    )[0]
+    propagated_cells = 0
+    for i, column_name in enumerate(editable_columns):
+        mask = winning_layers[:, i] > 0
+        if mask.any():
+            df_with_previous_edits_across_columns.loc[
+                mask, column_name
+            ] = resolved_values[mask, i]
+            propagated_cells += int(mask.sum())
+    return propagated_cells
 
+
+def propagate_previous_edits_from_across_columns(
+    df_with_previous_edits_across_columns,
+    unmerged_edit_files,
+    editable_columns,
+    provenance=False,
+):
+    import numpy as np
+
+    for column_name in editable_columns:
+        if column_name not in df_with_previous_edits_across_columns.columns:
+            # the editable column has not been seen before, make sure to initiate it
+            df_with_previous_edits_across_columns[column_name] = None
+
+    layer_values, layer_has_values = stacked_edit_layers(
+        df_with_previous_edits_across_columns, unmerged_edit_files, editable_columns
+    )
+    winning_layers = winning_edit_layers(layer_has_values)
+    if len(layer_values) > 1:
+        propagated_cells = propagate_winning_layer_values(
+            df_with_previous_edits_across_columns,
+            editable_columns,
+            layer_values,
+            winning_layers,
+        )
+        print(
+            " - Merge info: Propagated previous edits from %s edit file(s) to %s cell(s) where previous edits had a row"
+            % (len(layer_values) - 1, propagated_cells)
+        )
+
+    if provenance:
+        # the layer that supplied each value: 0 for the data that the edits were
+        # merged into, and n for the nth edit file
+        edit_layers = pd.DataFrame(
+            winning_layers.astype(np.min_scalar_type(len(layer_has_values))),
+            index=df_with_previous_edits_across_columns.index,
+            columns=editable_columns,
+        )
+        return df_with_previous_edits_across_columns, edit_layers
     return df_with_previous_edits_across_columns
 
 
-def is_ignored_file(filename):
-    if ".DS_Store" in filename:
-        return True
-    if ".gitignore" in filename:
-        return True
-    if "Icon" in filename:
-        if filename.encode("utf-8").hex() == "49636f6e0d":
-            return True
-    if ".~lock" in filename:
-        return True
-
-
-def sha256sum(filename):
-    h = hashlib.sha256()
-    b = bytearray(128 * 1024)
-    mv = memoryview(b)
-    with open(filename, "rb", buffering=0) as f:
-        for n in iter(lambda: f.readinto(mv), 0):
-            h.update(mv[:n])
-    return h.hexdigest()
-
-
-def sha1sum(filename):
-    h = hashlib.sha1()
-    b = bytearray(128 * 1024)
-    mv = memoryview(b)
-    with open(filename, "rb", buffering=0) as f:
-        for n in iter(lambda: f.readinto(mv), 0):
-            h.update(mv[:n])
-    return h.hexdigest()
-
-
-def list_files_in_folder(folder_path):
-    def is_not_ignored_file(filename):
-        return not is_ignored_file(filename)
-
-    full_hash_filesize_threshold = 1024 * 1024 * 1
-    all_files = []
-    for root, dirs, files in os.walk(folder_path):
-        # print(root, "consumes", end=" ")
-        # print(sum(getsize(join(root, name)) for name in files), end=" ")
-        # print("bytes in", len(files), "non-directory files")
-        if ".git" in dirs:
-            dirs.remove(".git")  # don't visit .git directories
-        files = filter(is_not_ignored_file, files)
-        # print(image_files)
-        for file in list(files):
-            full_path = join(root, file)
-            size = getsize(full_path)
-            file_sha256sum = (
-                sha256sum(full_path) if size < full_hash_filesize_threshold else False
-            )
-            file_sha1sum = (
-                sha1sum(full_path) if size < full_hash_filesize_threshold else False
-            )
-            imohash = hashfile(full_path, hexdigest=True)
-            all_files.append(
-                {
-                    "File name": file,
-                    "File path": root,
-                    "File metadata": {
-                        "size": size,
-                        "sha1sum": file_sha1sum,
-                        "sha256sum": file_sha256sum,
-                        "imohash": imohash,
-                    },
-                }
+def file_record(root, file_name, file_digests, selfquantifier_folder_path=None):
+    return {
+        "File name": file_name,
+        "File path": (
+            root.replace(selfquantifier_folder_path, "@")
+            if selfquantifier_folder_path is not None
+            else root
+        ),
+        "File metadata": file_metadata_from_digests(file_digests),
+    }
+
+
+def iter_files_in_folder(
+    folder_path,
+    file_fingerprint_index=None,
+    digests=default_file_digests,
+    hash_workers=None,
+    selfquantifier_folder_path=None,
+    additional_ignore_rules=None,
+    git_repo_path=None,
+    full_hash_large_files=False,
+    content_type_sniffer=None,
+):
+    from selfquantifier.file_walking import clerk_data_ignore_rules, walk_files
+
+    ignore_rules = [*(additional_ignore_rules or [])]
+    if selfquantifier_folder_path is not None:
+        ignore_rules = [*clerk_data_ignore_rules, *ignore_rules]
+
+    # only untracked or modified files need to be hashed to get their git blob hash
+    git_index = (
+        git_index_fingerprints(git_repo_path)
+        if git_repo_path is not None and "gitsha1" in digests
+        else None
+    )
+
+    def fingerprint(root_and_entry):
+        (root, entry) = root_and_entry
+        stat_result = entry.stat()
+        file_digests = fingerprint_file(
+            entry.path,
+            file_fingerprint_index,
+            digests,
+            stat_result=stat_result,
+            git_index_fingerprints=git_index,
+            full_hash_large_files=full_hash_large_files,
+        )
+        record = file_record(root, entry.name, file_digests, selfquantifier_folder_path)
+        if content_type_sniffer is not None:
+            record["Content type"] = content_type_sniffer.sniff_file(
+                entry.path, file_fingerprint_index, stat_result
             )
-    return all_files
+        return record
+
+    # files are stat'ed and hashed concurrently but yielded in walk order
+    yield from ordered_parallel_map(
+        fingerprint,
+        walk_files(
+            folder_path,
+            additional_ignore_rules=ignore_rules,
+            ignore_root_path=selfquantifier_folder_path,
+        ),
+        workers=hash_workers,
+    )
+    if file_fingerprint_index is not None:
+        file_fingerprint_index.save()
+
+
+def list_files_in_folder(
+    folder_path,
+    file_fingerprint_index=None,
+    digests=default_file_digests,
+    hash_workers=None,
+    additional_ignore_rules=None,
+    full_hash_large_files=False,
+    content_type_sniffer=None,
+):
+    return list(
+        iter_files_in_folder(
+            folder_path,
+            file_fingerprint_index=file_fingerprint_index,
+            digests=digests,
+            hash_workers=hash_workers,
+            additional_ignore_rules=additional_ignore_rules,
+            full_hash_large_files=full_hash_large_files,
+            content_type_sniffer=content_type_sniffer,
+        )
+    )
+
+
+files_df_chunk_size = 10000
 
 
-def list_files_in_clerk_subfolder(folder_path, selfquantifier_folder_path):
+def files_df_from_records(records, chunk_size=files_df_chunk_size):
+    import itertools
+
     import pandas as pd
 
-    _ = pd.DataFrame(list_files_in_folder(folder_path))
-    if len(_) > 0:
-        _["File path"] = _["File path"].apply(
-            lambda root: root.replace(selfquantifier_folder_path, "@")
+    # build the dataframe in chunks so that no list of all records is ever held in memory
+    records = iter(records)
+    chunks = []
+    while True:
+        chunk = list(itertools.islice(records, chunk_size))
+        if len(chunk) == 0:
+            break
+        chunks.append(pd.DataFrame(chunk))
+    if len(chunks) == 0:
+        return pd.DataFrame()
+    if len(chunks) == 1:
+        return chunks[0]
+    return pd.concat(chunks, ignore_index=True, copy=False)
+
+
+def list_files_in_clerk_subfolder(
+    folder_path,
+    selfquantifier_folder_path,
+    file_fingerprint_index=None,
+    digests=default_file_digests,
+    hash_workers=None,
+    additional_ignore_rules=None,
+    full_hash_large_files=False,
+    content_type_sniffer=None,
+):
+    return files_df_from_records(
+        iter_files_in_folder(
+            folder_path,
+            file_fingerprint_index=file_fingerprint_index,
+            digests=digests,
+            hash_workers=hash_workers,
+            selfquantifier_folder_path=selfquantifier_folder_path,
+            additional_ignore_rules=additional_ignore_rules,
+            full_hash_large_files=full_hash_large_files,
+            content_type_sniffer=content_type_sniffer,
         )
-        # ignore *_editable_data.csv
-        _ = _[~_["File name"].str.contains("_editable_data.csv$", regex=True)]
-        # ignore .~lock files
-        _ = _[~_["File name"].str.contains(".~lock")]
-    return _
+    )
 
 
-def list_files_in_clerk_input_subfolder(folder_path, selfquantifier_input_folder_path):
-    import pandas as pd
+def list_files_in_clerk_input_subfolder(
+    folder_path,
+    selfquantifier_input_folder_path,
+    file_fingerprint_index=None,
+    digests=default_file_digests,
+    hash_workers=None,
+    additional_ignore_rules=None,
+    full_hash_large_files=False,
+    content_type_sniffer=None,
+):
+    from selfquantifier.file_fingerprints import default_file_fingerprint_index
+    from selfquantifier.input_folder_watcher import running_input_folder_watcher
+
+    # a running watcher already knows which files changed since the last call
+    watcher = running_input_folder_watcher(folder_path)
+    if watcher is not None and additional_ignore_rules is None:
+        return files_df_from_records(
+            watcher.records(
+                digests=digests,
+                hash_workers=hash_workers,
+                full_hash_large_files=full_hash_large_files,
+                content_type_sniffer=content_type_sniffer,
+            )
+        )
 
-    _ = pd.DataFrame(list_files_in_folder(folder_path))
-    if len(_) > 0:
-        _["File path"] = _["File path"].apply(
-            lambda root: root.replace(selfquantifier_input_folder_path, "@")
+    if file_fingerprint_index is None:
+        file_fingerprint_index = default_file_fingerprint_index(
+            selfquantifier_input_folder_path
+        )
+    elif file_fingerprint_index is False:
+        file_fingerprint_index = None
+    return files_df_from_records(
+        iter_files_in_folder(
+            folder_path,
+            file_fingerprint_index=file_fingerprint_index,
+            digests=digests,
+            hash_workers=hash_workers,
+            selfquantifier_folder_path=selfquantifier_input_folder_path,
+            additional_ignore_rules=additional_ignore_rules,
+            git_repo_path=(
+                selfquantifier_input_folder_path
+                if os.path.isdir(os.path.join(selfquantifier_input_folder_path, ".git"))
+                else None
+            ),
+            full_hash_large_files=full_hash_large_files,
+            content_type_sniffer=content_type_sniffer,
         )
-        # ignore *_editable_data.csv
-        _ = _[~_["File name"].str.contains("_editable_data.csv$", regex=True)]
-        # ignore .~lock files
-        _ = _[~_["File name"].str.contains(".~lock")]
-    return _
+    )
 
 
 def is_nan(x):